@@ -0,0 +1,47 @@
+"""
+Benchmark of UnixDomainSocketRpc.call_many against one call per request.
+
+    python -m benchmarks.bench_call_many
+
+Runs against the stand-in lianad of the test suite, `--latency` is the time it
+waits each time it wakes up to read requests, to mimic the round trip cost of a
+loaded lianad.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from liana_rpc.utils.rpc import UnixDomainSocketRpc
+from tests.mock_lianad import MockLianad
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    address = {"address": "tb1qlmdc720pler50uhrf88xdt6chrqtuzrldfkw9727hqdr3e25r4csqc0m9x"}
+    with tempfile.TemporaryDirectory() as tmp:
+        handlers = {"getnewaddress": lambda params: address}
+        with MockLianad(os.path.join(tmp, "lianad_rpc"), handlers, latency=args.latency) as lianad:
+            rpc = UnixDomainSocketRpc(lianad.socket_path)
+
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                rpc.call("getnewaddress")
+            one_by_one = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rpc.call_many([("getnewaddress", {})] * args.calls)
+            batch = time.perf_counter() - start
+            rpc.close()
+
+    print(f"{args.calls} getnewaddress calls, {args.latency * 1000:.1f}ms per round trip")
+    print(f"one by one: {one_by_one:.3f}s")
+    print(f"call_many:  {batch:.3f}s ({one_by_one / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
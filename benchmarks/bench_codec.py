@@ -0,0 +1,61 @@
+"""
+Benchmark of the encoding of requests and the decoding of replies.
+
+    python -m benchmarks.bench_codec
+
+Compares each codec installed to encoding a fresh envelope with `json.dumps`,
+on `updatespend` requests carrying PSBTs of a few to a hundred kilobytes, and
+decoding `listcoins` replies.
+"""
+import base64
+import json
+import os
+import time
+
+from liana_rpc.utils import codec as codec_module
+from liana_rpc.utils.codec import get_codec
+
+PSBT_SIZES = (2000, 20000, 100000)
+COINS = (100, 10000)
+ROUNDS = 2000
+
+
+def legacy_encode(this_id, method, params):
+    return json.dumps({"jsonrpc": "2.0", "id": this_id, "method": method, "params": params}).encode() + b"\n"
+
+
+def per_call(f, rounds: int) -> float:
+    start = time.perf_counter()
+    for i in range(rounds):
+        f(i)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    codecs = [get_codec(name) for name, module in (("json", json), ("ujson", codec_module.ujson),
+                                                   ("orjson", codec_module.orjson)) if module is not None]
+    print(f"{'':<28} {'legacy':>10}" + "".join(f" {c.name:>10}" for c in codecs))
+
+    for size in PSBT_SIZES:
+        params = {"psbt": base64.b64encode(os.urandom(size * 3 // 4)).decode()}
+        line = f"{'updatespend ' + str(size) + 'B':<28}"
+        line += f" {per_call(lambda i: legacy_encode(i, 'updatespend', params), ROUNDS) * 1e6:>8.1f}us"
+        for c in codecs:
+            line += f" {per_call(lambda i: c.encode_request(i, 'updatespend', params), ROUNDS) * 1e6:>8.1f}us"
+        print(line)
+
+    coin = {"amount": 10000, "block_height": 142843, "spend_info": None,
+            "outpoint": "4450583c111e4a2974898e4b5068717f852c5b9e1803531ee2d006aedd2e9e39:0"}
+    for n in COINS:
+        reply = json.dumps({"jsonrpc": "2.0", "id": 0, "result": {"coins": [coin] * n}}).encode()
+        frame = memoryview(reply)
+        rounds = max(10, ROUNDS * 100 // n)
+        line = f"{'listcoins ' + str(n) + ' coins':<28}"
+        line += f" {per_call(lambda i: json.loads(frame.tobytes()), rounds) * 1e6:>8.1f}us"
+        for c in codecs:
+            line += f" {per_call(lambda i: c.loads(frame), rounds) * 1e6:>8.1f}us"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
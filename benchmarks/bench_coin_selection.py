@@ -0,0 +1,59 @@
+"""
+Benchmark of the coin selection over synthetic wallets of 10k to 100k coins.
+
+    python -m benchmarks.bench_coin_selection
+
+The coin amounts follow a log-uniform distribution between 1k and 10M sats,
+like a wallet receiving many small payments and a few large ones.
+"""
+import random
+import time
+
+from liana_rpc.utils.coin_selection import (KNAPSACK_ITERATIONS, branch_and_bound, input_weight, knapsack,
+                                            largest_first, select_coins)
+from tests.coin_selection_test import ADDRESS, DESCRIPTOR
+
+FEERATE = 5
+SIZES = (10000, 30000, 100000)
+PAYMENTS = (50000, 2000000, 100000000)
+
+
+def wallet(n, rng):
+    return [{"amount": int(10 ** rng.uniform(3, 7)), "block_height": 1, "outpoint": f"{i:064x}:0",
+             "spend_info": None} for i in range(n)]
+
+
+def timed(f):
+    start = time.perf_counter()
+    ret = f()
+    return ret, time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(42)
+    weight = input_weight(DESCRIPTOR)
+    print(f"{'coins':>7} {'payment':>10} {'algorithm':>13} {'inputs':>7} {'fee':>8} {'change':>9} {'time':>9}")
+    for n in SIZES:
+        coins = wallet(n, rng)
+        for payment in PAYMENTS:
+            selection, elapsed = timed(lambda: select_coins(coins, {ADDRESS: payment}, FEERATE,
+                                                            input_weight=weight, rng=rng))
+            print(f"{n:>7} {payment:>10} {selection['algorithm']:>13} {len(selection['coins']):>7} "
+                  f"{selection['fee']:>8} {selection['change']:>9} {elapsed * 1e3:>7.1f}ms")
+
+    print()
+    print("Each algorithm alone, over 100k effective values:")
+    values = sorted((c["amount"] - 600 for c in wallet(100000, rng)), reverse=True)
+    values = [v for v in values if v > 0]
+    target = 2000000
+    for name, f in [
+        ("branch_and_bound", lambda: branch_and_bound([v for v in values if v <= target + 1000], target, 1000)),
+        (f"knapsack ({KNAPSACK_ITERATIONS} it.)", lambda: knapsack(values, target, 5000, rng=rng)),
+        ("largest_first", lambda: largest_first(values, target)),
+    ]:
+        _, elapsed = timed(f)
+        print(f"{name:<24} {elapsed * 1e3:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of the in-process PSBT and transaction decoding against bitcoin-cli.
+
+    python -m benchmarks.bench_decode
+
+The bitcoin-cli path is only measured if bitcoin-cli is installed and a
+signet bitcoind is running.
+"""
+import shutil
+import time
+
+from liana_rpc.liana_rpc import decode_tx, psbt_to_txid, rawtx_to_txid
+from liana_rpc.utils.psbt import decode_psbt
+from tests.psbt_test import PSBT, RAWTX
+
+
+def timeit(f, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        f()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    cases = [
+        ("psbt_to_txid", lambda cli: psbt_to_txid(PSBT, network='signet', use_bitcoin_cli=cli)),
+        ("rawtx_to_txid", lambda cli: rawtx_to_txid(RAWTX, network='signet', use_bitcoin_cli=cli)),
+        ("decode_tx", lambda cli: decode_tx(RAWTX, network='signet', use_bitcoin_cli=cli)),
+    ]
+    use_cli = shutil.which("bitcoin-cli") is not None and not isinstance(cases[0][1](True), dict)
+
+    print(f"{'':<16} {'in-process':>12} {'bitcoin-cli':>12}")
+    for name, f in cases:
+        native = timeit(lambda: f(False), 2000)
+        line = f"{name:<16} {native * 1e6:>10.1f}us"
+        if use_cli:
+            cli = timeit(lambda: f(True), 20)
+            line += f" {cli * 1e6:>10.1f}us ({cli / native:.0f}x)"
+        else:
+            line += f" {'n/a':>12}"
+        print(line)
+    full = timeit(lambda: decode_psbt(PSBT, network='signet'), 500)
+    print(f"{'decode_psbt':<16} {full * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
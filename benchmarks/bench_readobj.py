@@ -0,0 +1,80 @@
+"""
+Benchmark of the reply reader of UnixDomainSocketRpc on multi-megabyte replies.
+
+    python -m benchmarks.bench_readobj
+
+The '\\n'-framed reader must decode a reply in a time proportional to its size,
+the legacy reader (grow a bytes buffer and retry json.loads after every short
+read) is shown for comparison.
+"""
+import json
+import socket
+import threading
+import time
+
+from liana_rpc.utils.rpc import LineBuffer, UnixDomainSocketRpc
+
+SIZES_MB = [1, 2, 4, 8, 16]
+LEGACY_MAX_MB = 8
+
+
+def listcoins_reply(size_mb):
+    coin = {
+        "amount": 10000,
+        "block_height": 142843,
+        "outpoint": "4450583c111e4a2974898e4b5068717f852c5b9e1803531ee2d006aedd2e9e39:0",
+        "spend_info": None,
+    }
+    n = size_mb * 1024 * 1024 // len(json.dumps(coin))
+    return json.dumps({"jsonrpc": "2.0", "id": 0, "result": {"coins": [coin] * n}}).encode() + b"\n"
+
+
+def legacy_readobj(sock):
+    buff = b""
+    while True:
+        n_to_read = max(2048, len(buff))
+        chunk = sock.recv(n_to_read)
+        buff += chunk
+        if len(chunk) != n_to_read:
+            try:
+                return json.loads(buff)
+            except json.JSONDecodeError:
+                continue
+
+
+def time_read(reply, read):
+    a, b = socket.socketpair()
+    writer = threading.Thread(target=b.sendall, args=(reply,))
+    start = time.perf_counter()
+    writer.start()
+    read(a)
+    elapsed = time.perf_counter() - start
+    writer.join()
+    a.close()
+    b.close()
+    return elapsed
+
+
+def framed_read(sock):
+    rpc = UnixDomainSocketRpc.__new__(UnixDomainSocketRpc)
+    rpc.sock = sock
+    rpc.recv_buffer = LineBuffer()
+    obj = rpc._readobj()
+    rpc.sock = None
+    return obj
+
+
+def main():
+    print(f"{'size':>6} {'framed (s)':>11} {'s/MB':>8} {'legacy (s)':>11} {'s/MB':>8}")
+    for size in SIZES_MB:
+        reply = listcoins_reply(size)
+        framed = time_read(reply, framed_read)
+        line = f"{size:>4}MB {framed:>11.3f} {framed / size:>8.4f}"
+        if size <= LEGACY_MAX_MB:
+            legacy = time_read(reply, legacy_readobj)
+            line += f" {legacy:>11.3f} {legacy / size:>8.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Latency and throughput of the LianaRPC wrappers against a stand-in lianad.
+
+    python -m benchmarks.bench_suite --save before.json
+    # ... change the code ...
+    python -m benchmarks.bench_suite --compare before.json
+
+Every method is called for `--duration` seconds (or `--calls` calls) against a
+synthetic wallet of each of the `--sizes`, from each number of client threads of
+`--concurrency` (sharing a pool of as many connections). The stand-in lianad
+serves pre-encoded replies, so that the timings are dominated by the client.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+
+from liana_rpc.liana_rpc import LianaRPC
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+ADDRESS = "tb1qlmdc720pler50uhrf88xdt6chrqtuzrldfkw9727hqdr3e25r4csqc0m9x"
+
+
+def scenarios(wallet):
+    """The calls to measure, as (name, function taking a LianaRPC) pairs."""
+    txids = list(wallet.txs)[:100]
+    outpoints = [c["outpoint"] for c in wallet.coins if not c["spend_info"]][:10]
+    return [
+        ("get_info", lambda liana: liana.get_info()),
+        ("list_coins", lambda liana: liana.list_coins()),
+        ("list_txs", lambda liana: liana.list_txs(txids)),
+        ("create_psbt", lambda liana: liana.create_psbt(outpoints, {ADDRESS: 10000}, 2)),
+    ]
+
+
+def percentile(latencies: list, q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+def measure(liana, call, concurrency: int, max_calls: int, duration: float) -> dict:
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+    deadline = []
+
+    def worker():
+        barrier.wait()
+        local = []
+        while time.perf_counter() < deadline[0] and len(local) * concurrency < max_calls:
+            start = time.perf_counter()
+            ret = call(liana)
+            local.append(time.perf_counter() - start)
+            if isinstance(ret, dict) and 'error' in ret:
+                raise RuntimeError(ret['error'])
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    deadline.append(time.perf_counter() + duration)
+    start = time.perf_counter()
+    barrier.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'p50_ms': percentile(latencies, 0.5) * 1e3,
+        'p99_ms': percentile(latencies, 0.99) * 1e3,
+        'calls_per_sec': len(latencies) / elapsed,
+    }
+
+
+def git_commit():
+    try:
+        ret = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, text=True, cwd=os.path.dirname(__file__))
+    except OSError:
+        return None
+    return ret.stdout.strip() or None
+
+
+def run(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            wallet = SyntheticWallet(size)
+            with MockLianad(os.path.join(tmp, "lianad_rpc"), wallet.handlers(), latency=args.latency) as lianad:
+                for concurrency in args.concurrency:
+                    liana = LianaRPC(lianad.socket_path, pool_size=concurrency if concurrency > 1 else None)
+                    for name, call in scenarios(wallet):
+                        if args.methods and name not in args.methods:
+                            continue
+                        key = f"{name}/coins={size}/threads={concurrency}"
+                        results[key] = measure(liana, call, concurrency, args.calls, args.duration)
+                        print_result(key, results[key])
+                    liana.rpc.close()
+    return results
+
+
+def print_result(key: str, result: dict, baseline: dict = None):
+    line = (f"{key:<40} {result['p50_ms']:>9.3f}ms {result['p99_ms']:>9.3f}ms "
+            f"{result['calls_per_sec']:>10.1f}/s")
+    if baseline is not None:
+        line += (f"   p50 {baseline['p50_ms'] / result['p50_ms']:>5.2f}x"
+                 f"  calls/s {result['calls_per_sec'] / baseline['calls_per_sec']:>5.2f}x")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=[1000, 10000],
+                        help="comma separated wallet sizes, in coins")
+    parser.add_argument("--concurrency", type=lambda s: [int(n) for n in s.split(",")], default=[1, 4],
+                        help="comma separated numbers of client threads")
+    parser.add_argument("--methods", type=lambda s: s.split(","), default=None,
+                        help="comma separated methods to measure, all by default")
+    parser.add_argument("--calls", type=int, default=2000, help="maximum number of calls per measure")
+    parser.add_argument("--duration", type=float, default=2.0, help="maximum duration of a measure, in seconds")
+    parser.add_argument("--latency", type=float, default=0, help="time lianad waits before reading requests")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results to the ones saved in this JSON file")
+    args = parser.parse_args()
+
+    print(f"{'':<40} {'p50':>11} {'p99':>11} {'throughput':>12}")
+    results = run(args)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'args': {'sizes': args.sizes, 'concurrency': args.concurrency, 'latency': args.latency},
+                'results': results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        print(f"Compared to {baseline.get('commit') or args.compare} (higher is better):")
+        for key, result in results.items():
+            if key in baseline['results']:
+                print_result(key, result, baseline['results'][key])
+
+
+if __name__ == "__main__":
+    main()
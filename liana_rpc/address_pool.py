@@ -0,0 +1,163 @@
+"""
+Receiving addresses generated ahead of time.
+
+An `AddressPool` keeps between `low` and `high` unused addresses in memory,
+fetched from lianad in batches (`call_many` of `getnewaddress`) by a background
+thread whenever it falls below `low`. `get()` hands them out without calling
+lianad, unless the pool ran dry.
+
+If a `path` is given, the pool is saved to an append-only file: a `+<address>`
+line for each address fetched, a `-<address>` line for each address handed out.
+On restart the addresses not handed out yet are loaded back, so none is lost or
+handed out twice, and the file is compacted.
+"""
+
+import collections
+import logging
+import os
+import threading
+
+log = logging.getLogger()
+
+# The first delay before fetching again after an error, doubled on each consecutive error.
+RETRY_BASE = 0.1
+
+
+class AddressPool(object):
+    """
+    A pool of new receiving addresses, refilled in the background.
+    """
+
+    def __init__(self, liana, low: int = 20, high: int = 100, batch_size: int = 50, path: str = None,
+                 retry_interval: float = 5.0):
+        """
+        :param liana: the LianaRPC of the wallet
+        :param low: the pool is refilled when it holds fewer addresses than this
+        :param high: the number of addresses the pool is refilled up to
+        :param batch_size: the maximum number of addresses fetched in a round trip
+        :param path: if set, the file the unused addresses are saved to, loaded back on start
+        :param retry_interval: the maximum time to wait before fetching again after lianad returned an error, in
+        seconds
+        """
+        if not 0 <= low <= high:
+            raise ValueError("The watermarks must be 0 <= low <= high")
+        self.liana = liana
+        self.low = low
+        self.high = high
+        self.batch_size = batch_size
+        self.path = os.path.expanduser(path) if path else None
+        self.retry_interval = retry_interval
+
+        self.addresses = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.failures = 0
+        self.file = None
+        if self.path is not None:
+            self._load()
+        self.thread = threading.Thread(target=self._refill, name="liana-address-pool", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def _load(self) -> None:
+        """Load the unused addresses of a previous run and compact the file."""
+        unused = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("+"):
+                        unused[line[1:]] = None
+                    elif line.startswith("-"):
+                        unused.pop(line[1:], None)
+        except FileNotFoundError:
+            pass
+        self.addresses.extend(unused)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(f"+{address}\n" for address in unused)
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "a")
+
+    def _record(self, lines: str) -> None:
+        if self.file is not None:
+            self.file.write(lines)
+            self.file.flush()
+
+    def get(self):
+        """
+        Hand out an unused receiving address, from the pool, or from lianad if the pool is empty or closed. The
+        addresses left in a closed pool are kept in its file for the next run.
+
+        return the address, or an `{'error': ...}` dict if the address was fetched from lianad and it returned an
+        error
+        """
+        with self.cond:
+            if self.addresses and not self.closed:
+                address = self.addresses.popleft()
+                self._record(f"-{address}\n")
+                if len(self.addresses) < self.low:
+                    self.cond.notify_all()
+                return address
+            self.cond.notify_all()
+        log.debug("The address pool is empty or closed, fetching an address from lianad")
+        return self.liana.get_new_address()
+
+    def wait(self, count: int = None, timeout: float = None) -> bool:
+        """
+        Wait for the pool to hold at least count addresses, `low` by default.
+
+        return whether it does
+        """
+        count = self.low if count is None else count
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.addresses) >= count or self.closed, timeout) \
+                and len(self.addresses) >= count
+
+    def _refill(self) -> None:
+        # Once below the low watermark, fetch batches until the high one is reached.
+        refilling = False
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.closed or len(self.addresses) < (self.high if refilling else self.low))
+                if self.closed:
+                    return
+                refilling = True
+                count = min(self.batch_size, self.high - len(self.addresses))
+            try:
+                rets = self.liana.get_new_addresses(count)
+            except Exception as e:
+                rets = [{'error': f"{type(e).__name__}: {e}"}]
+            addresses = [ret for ret in rets if isinstance(ret, str)]
+            with self.cond:
+                # Recorded even if the pool was closed meanwhile, they would be lost otherwise.
+                self._record("".join(f"+{address}\n" for address in addresses))
+                self.addresses.extend(addresses)
+                refilling = len(self.addresses) < self.high
+                self.cond.notify_all()
+                if len(addresses) < len(rets):
+                    log.warning(f"Fetching new addresses failed: {next(r for r in rets if not isinstance(r, str))}")
+                    self.failures += 1
+                    self.cond.wait_for(lambda: self.closed, min(self.retry_interval, RETRY_BASE * 2 ** self.failures))
+                else:
+                    self.failures = 0
+
+    def close(self) -> None:
+        """
+        Stop refilling the pool, and close its file.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
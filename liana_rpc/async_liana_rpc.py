@@ -0,0 +1,281 @@
+import time
+
+from liana_rpc.liana_rpc import find_socket_path
+from liana_rpc.utils.async_rpc import AsyncUnixDomainSocketRpc
+
+
+class AsyncLianaRPC:
+    """
+    asyncio counterpart of LianaRPC, with the same methods as coroutines.
+
+    All the calls share a single connection to lianad: requests are sent without waiting for the previous replies,
+    so concurrent coroutines don't wait in line behind each other.
+
+    The connection is opened on the first call, close it with `await liana.close()` or use the client as an
+    async context manager.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: the path to the socket file (usually  ~/.liana/<chain>/lianad_rpc), optional if only one
+        instance of lianad is running.
+        """
+        self.path = find_socket_path(path)
+        self.rpc = AsyncUnixDomainSocketRpc(self.path)
+
+    async def __aenter__(self):
+        await self.rpc.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self.rpc.close()
+
+    async def get_info(self):
+        """
+        Return general information about the daemon
+        """
+        ret = await self.rpc.call('getinfo')
+        if 'block_height' in ret.keys():
+            return ret
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def stop_lianad(self):
+        """
+        Stops liana daemon.
+        """
+        ret = await self.rpc.call('stop')
+        if ret == {}:
+            return {'ok': True}
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def get_new_address(self):
+        """
+        Get a new receiving address
+        """
+        ret = await self.rpc.call('getnewaddress')
+        if 'address' in ret.keys():
+            return ret['address']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def list_coins(self, statuses: list = None, outpoints: list = None):
+        """
+        List all wallet transaction outputs.
+
+        :param statuses: if set, only list the coins of these statuses, among 'unconfirmed', 'confirmed',
+        'spending' (spent by an unconfirmed transaction) and 'spent'
+        :param outpoints: if set, only list the coins at these outpoints
+        """
+        params = {}
+        if statuses:
+            params['statuses'] = statuses
+        if outpoints:
+            params['outpoints'] = outpoints
+        ret = await self.rpc.call('listcoins', params)
+        if 'coins' in ret.keys():
+            return ret['coins']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def list_unspent_coins(self):
+        """
+        Return the list of unspent coins
+        """
+        ret = await self.list_coins()
+        if type(ret) is not list:
+            return ret
+        return [i for i in ret if not i['spend_info']]
+
+    async def list_spent_coins(self):
+        """
+        Return the list of spent coins
+        """
+        ret = await self.list_coins()
+        if type(ret) is not list:
+            return ret
+        return [i for i in ret if i['spend_info']]
+
+    async def create_psbt(self, coins: [], outputs: {}, feerate: int):
+        """
+        Create a PSBT from unspend coins list.
+
+        :param coins: list of coins to spend in the form of [<tx_id_1>:<output_id>, <tx_id_2>:<output_id>, ]
+        :param outputs: dict of outputs in the form of {<address>:<amount>, <address>:<amount>,}
+        :param feerate: feerate in sats/VBytes
+
+        Return Base64 encoded PSBT.
+        """
+        params = {
+            'destinations': outputs,
+            'outpoints': coins,
+            'feerate': feerate,
+        }
+        ret = await self.rpc.call('createspend', params)
+        if 'psbt' in ret.keys():
+            return ret['psbt']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def upate_psbt(self, psbt: str):
+        """
+        Store the PSBT of a Spend transaction in database, updating it if it already exists.
+        :param psbt: Base64-encoded PSBT of a Spend transaction.
+        """
+        ret = await self.rpc.call('updatespend', {'psbt': psbt})
+        if ret == {}:
+            return {'ok': True}
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def list_psbt(self):
+        """
+        List PSBT stored in Liana DB.
+        """
+        ret = await self.rpc.call('listspendtxs')
+        if 'spend_txs' in ret.keys():
+            return ret['spend_txs']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def del_psbt(self, txid: str):
+        """
+        Delete a PSBT stored in lianad DB given is txid
+
+        :param txid: Transaction id in hexadecimal format
+        """
+        ret = await self.rpc.call('delspendtx', {'txid': txid})
+        if ret == {}:
+            return {'ok': True}
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def broadcast_psbt(self, txid: str):
+        """
+        Finalize a PSBT stored in liana DB, and broadcast it
+
+        :param txid: Transaction id in hexadecimal format
+        """
+        ret = await self.rpc.call('broadcastspend', {'txid': txid})
+        if ret == {}:
+            return {'ok': True}
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def start_rescan(self, timestamp: int):
+        """
+        Start rescanning the block chain from a given date
+
+        :param timestamp: Date to start rescanning from, as a UNIX timestamp
+        """
+        ret = await self.rpc.call('startrescan', {'timestamp': timestamp})
+        if 'error' in ret.keys() and ret['error']['message'] == 'There is already a rescan ongoing. Please wait for it to complete first.':
+            return {'rescanning': True}
+        else:
+            return {}
+
+    async def list_confirmed_tx(self, start: int = None, end: int = None, limit: int = 100):
+        """
+        Retrieves a paginated and ordered list of transactions that were confirmed within a given time window.
+        Confirmation time is based on the timestamp of blocks.
+
+        :param start: Inclusive lower bound of the time window
+        :param end: Inclusive upper bound of the time window
+        :param limit: Maximum number of transactions to retrieve
+
+        return a list of confirmed transactions resources
+        """
+        if not start:
+            start = 1231006505  # genesis block
+
+        if not end:
+            end = round(time.time())
+
+        params = {
+            'start': start,
+            'end': end,
+            'limit': limit,
+        }
+
+        ret = await self.rpc.call('listconfirmed', params)
+        if 'transactions' in ret.keys():
+            return ret['transactions']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def fetch_tx(self, txid: str):
+        """
+        Retrieve a single transaction given its txid.
+
+        :param txid: Transaction id in hexadecimal format
+        """
+        ret = await self.list_txs([txid])
+        if type(ret) is list:
+            return ret[0]
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def list_txs(self, txs: []):
+        """
+        Retrieves transactions with the given txids.
+
+        :param txs: List of txids in hexadecimal format in the form of [<txid>, <txid>, <txid>,]
+
+        return a List of transactions resources
+        """
+        ret = await self.rpc.call('listtransactions', {'txids': txs})
+        if 'transactions' in ret.keys():
+            return ret['transactions']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
+
+    async def create_recovery_psbt(self, address: str, feerate: int, timelock: int = 0):
+        """
+        Create a transaction that sweeps all coins for which a timelocked recovery path is currently available to a
+        provided address with the provided feerate.
+        See `LianaRPC.create_recovery_psbt`.
+
+        :param address: The Bitcoin address to sweep the coins to, in str format
+        :param feerate: Target feerate for the transaction, in satoshis per virtual byte in int foramt.
+        :param timelock: Recovery path to be used, identified by the number of blocks after which it is available, in int format.
+        """
+        params = {
+            'address': address,
+            'feerate': feerate,
+            'timelock': timelock,
+        }
+        ret = await self.rpc.call('createrecovery', params)
+        if 'psbt' in ret.keys():
+            return ret['psbt']
+        elif 'error' in ret.keys():
+            return {'error': ret['error']}
+        else:
+            return ret
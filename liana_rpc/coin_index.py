@@ -0,0 +1,127 @@
+import bisect
+import threading
+import time
+
+
+class CoinIndex(object):
+    """
+    Indexed view of the coins of a wallet, refetched only when they may have changed.
+
+    `refresh` asks lianad for its block height (a cheap `getinfo` call) and only calls `listcoins` again if the
+    height moved, if the index was invalidated (e.g. by a local broadcast) or if the last fetch is older than
+    `max_age` seconds. Coins received in the mempool don't move the block height: set `max_age` to bound how long
+    they can go unnoticed.
+
+    The coins are indexed by outpoint, by txid and by spend status, and the unspent confirmed coins are sorted by
+    block height, so that lookups don't scan the whole wallet.
+    """
+
+    def __init__(self, liana, max_age: float = None):
+        """
+        :param liana: the LianaRPC instance to fetch the coins with
+        :param max_age: if set, refetch the coins when the last fetch is older than this many seconds
+        """
+        self.liana = liana
+        self.max_age = max_age
+        self.block_height = None
+        self.fetched_at = None
+        self.stale = True
+        self.lock = threading.Lock()
+
+        self.coins = {}
+        self.unspent = {}
+        self.spent = {}
+        self.txids = {}
+        # Unspent confirmed coins sorted by block height, and their heights.
+        self.confirmed_unspent = []
+        self.confirmed_heights = []
+
+    def invalidate(self):
+        """
+        Mark the index as stale, the coins will be refetched on the next refresh.
+        """
+        self.stale = True
+
+    def refresh(self, force: bool = False):
+        """
+        Refetch the coins if they may have changed since the last fetch.
+
+        :param force: refetch the coins whatever the block height
+
+        return None, or an `{'error': ...}` dict if lianad returned an error
+        """
+        with self.lock:
+            info = self.liana.get_info()
+            if 'error' in info.keys():
+                return {'error': info['error']}
+            expired = self.max_age is not None and (self.fetched_at is None
+                                                    or time.monotonic() - self.fetched_at > self.max_age)
+            if not (force or self.stale or expired or info['block_height'] != self.block_height):
+                return None
+
+            # Reset the flag first, so an invalidation during the call is not lost.
+            self.stale = False
+            coins = self.liana.list_coins()
+            if type(coins) is not list:
+                self.stale = True
+                return coins
+            self._build(coins)
+            self.block_height = info['block_height']
+            self.fetched_at = time.monotonic()
+            return None
+
+    def _build(self, coins: list):
+        by_outpoint, unspent, spent, txids = {}, {}, {}, {}
+        for coin in coins:
+            outpoint = coin['outpoint']
+            by_outpoint[outpoint] = coin
+            if coin['spend_info']:
+                spent[outpoint] = coin
+            else:
+                unspent[outpoint] = coin
+            txids.setdefault(outpoint.split(':')[0], []).append(coin)
+        confirmed = sorted((c for c in unspent.values() if c['block_height'] is not None),
+                           key=lambda c: c['block_height'])
+
+        # Swap the indexes at once, readers don't take the lock.
+        self.coins, self.unspent, self.spent, self.txids = by_outpoint, unspent, spent, txids
+        self.confirmed_unspent = confirmed
+        self.confirmed_heights = [c['block_height'] for c in confirmed]
+
+    def get(self, outpoint: str):
+        """
+        Return the coin at the given outpoint (<txid>:<vout>), or None.
+        """
+        return self.coins.get(outpoint)
+
+    def by_txid(self, txid: str):
+        """
+        Return the list of the coins created by the given transaction.
+        """
+        return list(self.txids.get(txid, []))
+
+    def unspent_coins(self):
+        return list(self.unspent.values())
+
+    def spent_coins(self):
+        return list(self.spent.values())
+
+    def unspent_confirmed_before(self, height: int):
+        """
+        Return the unspent coins confirmed in a block strictly below the given height.
+        """
+        return self.confirmed_unspent[:bisect.bisect_left(self.confirmed_heights, height)]
+
+    def unspent_confirmed_between(self, low: int, high: int):
+        """
+        Return the unspent coins confirmed in a block between the given heights, inclusive.
+        """
+        lo = bisect.bisect_left(self.confirmed_heights, low)
+        hi = bisect.bisect_right(self.confirmed_heights, high)
+        return self.confirmed_unspent[lo:hi]
+
+    def unconfirmed_coins(self):
+        """
+        Return the unspent coins not confirmed yet.
+        """
+        return [c for c in self.unspent.values() if c['block_height'] is None]
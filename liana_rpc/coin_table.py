@@ -0,0 +1,330 @@
+import array
+import bisect
+import itertools
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The height of the unconfirmed coins and spends in the height columns.
+UNCONFIRMED = -1
+
+_NO_TXID = bytes(32)
+_INVERT = bytes.maketrans(b"\0\1", b"\1\0")
+
+
+class CoinRow(object):
+    """
+    A coin of a `CoinTable`, read from its columns on access.
+    """
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index: int):
+        self.table = table
+        self.index = index
+
+    @property
+    def amount(self) -> int:
+        return self.table.amounts[self.index]
+
+    @property
+    def block_height(self):
+        height = self.table.heights[self.index]
+        return None if height == UNCONFIRMED else height
+
+    @property
+    def txid(self) -> str:
+        return bytes(self.table.txids[32 * self.index:32 * (self.index + 1)]).hex()
+
+    @property
+    def vout(self) -> int:
+        return self.table.vouts[self.index]
+
+    @property
+    def outpoint(self) -> str:
+        return f"{self.txid}:{self.vout}"
+
+    @property
+    def spend_info(self):
+        if not self.table.spent[self.index]:
+            return None
+        height = self.table.spend_heights[self.index]
+        return {
+            'txid': bytes(self.table.spend_txids[32 * self.index:32 * (self.index + 1)]).hex(),
+            'height': None if height == UNCONFIRMED else height,
+        }
+
+    def to_dict(self) -> dict:
+        """
+        return the coin as returned by `listcoins`
+        """
+        return {
+            'amount': self.amount,
+            'block_height': self.block_height,
+            'outpoint': self.outpoint,
+            'spend_info': self.spend_info,
+        }
+
+    def __eq__(self, other):
+        if isinstance(other, CoinRow):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return f"CoinRow({self.to_dict()})"
+
+
+class CoinTable(object):
+    """
+    Columnar storage of the coins of a wallet, for computing over hundreds of thousands of them.
+
+    Each field of the coins is stored in a column: amounts and heights in `array`s, txids packed as 32 bytes each
+    next to an array of the output indexes, and spend statuses as bytes. A coin takes about a hundred bytes instead
+    of the kilobyte of its dict. Rows are read as `CoinRow` views, e.g. `table[0].amount`.
+
+    The aggregates (balances, histograms, filters) run over whole columns. If NumPy is installed they are
+    vectorized over views of the columns, without copying them, otherwise they use the standard library.
+
+    Only the fields of `listcoins` documented in the README are kept: amount, block_height, outpoint and
+    spend_info.
+    """
+
+    def __init__(self, coins=(), use_numpy: bool = None):
+        """
+        :param coins: iterable of coins as returned by `list_coins` or `iter_coins`
+        :param use_numpy: whether to compute with NumPy, by default if it is installed
+        """
+        if use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed")
+        self.np = numpy if use_numpy is not False else None
+        self.amounts = array.array("q")
+        self.heights = array.array("q")
+        self.txids = bytearray()
+        self.vouts = array.array("I")
+        # 1 for the spent coins, 0 for the unspent ones.
+        self.spent = bytearray()
+        self.spend_txids = bytearray()
+        self.spend_heights = array.array("q")
+        # 1 for the confirmed coins, 0 for the unconfirmed ones.
+        self.confirmed = bytearray()
+        for coin in coins:
+            self.append(coin)
+
+    def append(self, coin: dict) -> None:
+        """
+        Add a coin, as returned by `listcoins`, to the table.
+        """
+        self.amounts.append(coin['amount'])
+        height = coin['block_height']
+        self.heights.append(UNCONFIRMED if height is None else height)
+        self.confirmed.append(height is not None)
+        txid, vout = coin['outpoint'].split(':')
+        self.txids += bytes.fromhex(txid)
+        self.vouts.append(int(vout))
+        spend_info = coin['spend_info']
+        if spend_info:
+            self.spent.append(1)
+            self.spend_txids += bytes.fromhex(spend_info['txid'])
+            height = spend_info.get('height')
+            self.spend_heights.append(UNCONFIRMED if height is None else height)
+        else:
+            self.spent.append(0)
+            self.spend_txids += _NO_TXID
+            self.spend_heights.append(UNCONFIRMED)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, index: int) -> CoinRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("CoinTable index out of range")
+        return CoinRow(self, index)
+
+    def __iter__(self):
+        return (CoinRow(self, i) for i in range(len(self)))
+
+    def to_list(self) -> list:
+        """
+        return the coins as a list of dicts, as returned by `list_coins`
+        """
+        return [row.to_dict() for row in self]
+
+    def _view(self, column, dtype):
+        return self.np.frombuffer(column, dtype=dtype)
+
+    def _take(self, indexes):
+        """Return a table of the coins at the given indexes."""
+        table = CoinTable(use_numpy=self.np is not None)
+        if self.np is not None:
+            np = self.np
+            table.amounts.frombytes(self._view(self.amounts, np.int64)[indexes].tobytes())
+            table.heights.frombytes(self._view(self.heights, np.int64)[indexes].tobytes())
+            table.vouts.frombytes(self._view(self.vouts, np.uint32)[indexes].tobytes())
+            table.spend_heights.frombytes(self._view(self.spend_heights, np.int64)[indexes].tobytes())
+            table.spent = bytearray(self._view(self.spent, np.uint8)[indexes].tobytes())
+            table.confirmed = bytearray(self._view(self.confirmed, np.uint8)[indexes].tobytes())
+            table.txids = bytearray(self._view(self.txids, np.uint8).reshape(-1, 32)[indexes].tobytes())
+            table.spend_txids = bytearray(self._view(self.spend_txids, np.uint8).reshape(-1, 32)[indexes].tobytes())
+            return table
+        for name in ("amounts", "heights", "vouts", "spend_heights", "spent", "confirmed"):
+            column = getattr(self, name)
+            getattr(table, name).extend(column[i] for i in indexes)
+        table.txids = bytearray().join(self.txids[32 * i:32 * (i + 1)] for i in indexes)
+        table.spend_txids = bytearray().join(self.spend_txids[32 * i:32 * (i + 1)] for i in indexes)
+        return table
+
+    def _select(self, mask):
+        """Return a table of the coins for which mask, a NumPy boolean array or a bytes-like of 0 and 1, is set."""
+        if self.np is not None:
+            return self._take(self.np.flatnonzero(mask))
+        return self._take(list(itertools.compress(range(len(self)), mask)))
+
+    def _unspent_mask(self):
+        if self.np is not None:
+            return self._view(self.spent, self.np.uint8) == 0
+        return self.spent.translate(_INVERT)
+
+    def _confirmed_mask(self):
+        if self.np is not None:
+            return self._view(self.confirmed, self.np.uint8) == 1
+        return self.confirmed
+
+    def _sum(self, mask) -> int:
+        if self.np is not None:
+            return int(self._view(self.amounts, self.np.int64)[mask].sum())
+        return sum(itertools.compress(self.amounts, mask))
+
+    def balance(self) -> int:
+        """
+        return the sum of the amounts of the unspent coins, in sats
+        """
+        return self._sum(self._unspent_mask())
+
+    def confirmed_balance(self) -> int:
+        """
+        return the sum of the amounts of the unspent confirmed coins, in sats
+        """
+        if self.np is not None:
+            return self._sum(self._unspent_mask() & self._confirmed_mask())
+        return self._sum(map(operator.and_, self._unspent_mask(), self.confirmed))
+
+    def unconfirmed_balance(self) -> int:
+        """
+        return the sum of the amounts of the unspent unconfirmed coins, in sats
+        """
+        return self.balance() - self.confirmed_balance()
+
+    def unspent(self) -> "CoinTable":
+        return self._select(self._unspent_mask())
+
+    def spent_coins(self) -> "CoinTable":
+        if self.np is not None:
+            return self._select(self._view(self.spent, self.np.uint8) == 1)
+        return self._select(self.spent)
+
+    def dust(self, threshold: int) -> "CoinTable":
+        """
+        return the table of the coins worth less than threshold sats
+        """
+        if self.np is not None:
+            return self._select(self._view(self.amounts, self.np.int64) < threshold)
+        return self._select(bytes(amount < threshold for amount in self.amounts))
+
+    def without_dust(self, threshold: int) -> "CoinTable":
+        """
+        return the table of the coins worth at least threshold sats
+        """
+        if self.np is not None:
+            return self._select(self._view(self.amounts, self.np.int64) >= threshold)
+        return self._select(bytes(amount >= threshold for amount in self.amounts))
+
+    def confirmations(self, block_height: int):
+        """
+        Return the number of confirmations of each coin at the given block height, 0 for the unconfirmed ones.
+
+        return a NumPy array if NumPy is used, an `array` otherwise
+        """
+        if self.np is not None:
+            heights = self._view(self.heights, self.np.int64)
+            return self.np.where(heights == UNCONFIRMED, 0, self.np.maximum(block_height - heights + 1, 0))
+        return array.array("q", (0 if h == UNCONFIRMED else max(block_height - h + 1, 0) for h in self.heights))
+
+    def _mature_mask(self, block_height: int, confirmations: int):
+        # A coin has at least `confirmations` confirmations if it was confirmed at or below this height.
+        last = block_height - confirmations + 1
+        if self.np is not None:
+            return self._confirmed_mask() & (self._view(self.heights, self.np.int64) <= last)
+        return bytes(h != UNCONFIRMED and h <= last for h in self.heights)
+
+    def mature(self, block_height: int, confirmations: int) -> "CoinTable":
+        """
+        return the table of the coins with at least the given number of confirmations at block_height, e.g. the
+        ones whose relative timelock of that many blocks expired
+        """
+        return self._select(self._mature_mask(block_height, confirmations))
+
+    def immature(self, block_height: int, confirmations: int) -> "CoinTable":
+        """
+        return the table of the coins with fewer than the given number of confirmations at block_height,
+        including the unconfirmed ones
+        """
+        mask = self._mature_mask(block_height, confirmations)
+        if self.np is not None:
+            return self._select(~mask)
+        return self._select(mask.translate(_INVERT))
+
+    def histogram_by_height(self, bucket_size: int = 1) -> dict:
+        """
+        Count the confirmed coins and sum their amounts by block height.
+
+        :param bucket_size: number of blocks per bucket
+
+        return a dict of the first height of each non-empty bucket to a `(count, amount)` tuple, sorted by height
+        """
+        if self.np is not None:
+            np = self.np
+            confirmed = self._confirmed_mask()
+            keys = self._view(self.heights, np.int64)[confirmed] // bucket_size
+            starts, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(starts))
+            amounts = np.zeros(len(starts), dtype=np.int64)
+            np.add.at(amounts, inverse, self._view(self.amounts, np.int64)[confirmed])
+            return {int(start) * bucket_size: (int(count), int(amount))
+                    for start, count, amount in zip(starts, counts, amounts)}
+        buckets = {}
+        for height, amount in zip(itertools.compress(self.heights, self.confirmed),
+                                  itertools.compress(self.amounts, self.confirmed)):
+            start = height // bucket_size * bucket_size
+            count, total = buckets.get(start, (0, 0))
+            buckets[start] = (count + 1, total + amount)
+        return dict(sorted(buckets.items()))
+
+    def histogram_by_value(self, bounds: list) -> list:
+        """
+        Count the coins and sum their amounts by ranges of value.
+
+        :param bounds: increasing amounts in sats, separating the ranges
+
+        return a `(count, amount)` tuple for each of the `len(bounds) + 1` ranges: the coins worth less than
+        bounds[0], the ones worth at least bounds[0] and less than bounds[1], ..., the ones worth at least
+        bounds[-1]
+        """
+        if self.np is not None:
+            np = self.np
+            amounts = self._view(self.amounts, np.int64)
+            indexes = np.searchsorted(np.asarray(bounds, dtype=np.int64), amounts, side="right")
+            counts = np.bincount(indexes, minlength=len(bounds) + 1)
+            sums = np.zeros(len(bounds) + 1, dtype=np.int64)
+            np.add.at(sums, indexes, amounts)
+            return [(int(count), int(amount)) for count, amount in zip(counts, sums)]
+        counts = [0] * (len(bounds) + 1)
+        sums = [0] * (len(bounds) + 1)
+        for i, amount in zip(map(bisect.bisect_right, itertools.repeat(bounds), self.amounts), self.amounts):
+            counts[i] += 1
+            sums[i] += amount
+        return list(zip(counts, sums))
@@ -0,0 +1,184 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from liana_rpc.liana_rpc import LianaRPC, get_liana_instances
+from liana_rpc.utils.rpc import METHOD_TIMEOUTS
+
+log = logging.getLogger()
+
+
+class LianaFleet:
+    """
+    A client to several lianad at once, e.g. one per vault on a host.
+
+    Each query is sent to all the wallets concurrently, each over its own connection, and the results are merged
+    and tagged with the name of the wallet they come from. A wallet that can't be reached or that returned an error
+    is reported in the `errors` of the result, by wallet name, without failing the query on the other wallets.
+
+    The clients are connected on the first query. A wallet that could not be connected to is tried again on the
+    next query.
+    """
+
+    def __init__(self, paths=None, timeout: float = None, max_workers: int = None, **kwargs):
+        """
+        :param paths: the sockets of the lianad to query, as a list of paths or as a dict of wallet names to paths.
+        By default all the running instances of lianad. Wallets listed as paths are named after their path.
+        :param timeout: if set, wallets that did not answer a query within this many seconds are reported as failed,
+        and it is the longest deadline of each call to lianad
+        :param max_workers: the number of wallets queried at once, all of them by default
+        :param kwargs: passed to the LianaRPC of each wallet, e.g. `timeouts`
+        """
+        if paths is None:
+            paths = get_liana_instances(refresh=True)
+        if not isinstance(paths, dict):
+            paths = {path: path for path in paths}
+        self.paths = {name: os.path.expanduser(path) for name, path in paths.items()}
+        self.timeout = timeout
+        if timeout is not None:
+            # A call that outlived its query must not hold its worker thread for the default deadline.
+            timeouts = dict(METHOD_TIMEOUTS, **kwargs.get('timeouts', {}))
+            kwargs = dict(kwargs, timeout=min(kwargs.get('timeout', timeout), timeout),
+                          timeouts={method: min(t, timeout) for method, t in timeouts.items()})
+        self.kwargs = kwargs
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or max(len(self.paths), 1),
+                                           thread_name_prefix="liana-fleet")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def wallets(self) -> list:
+        return list(self.paths)
+
+    def _client(self, name: str) -> LianaRPC:
+        with self.lock:
+            client = self.clients.get(name)
+        if client is None:
+            client = LianaRPC(self.paths[name], **self.kwargs)
+            with self.lock:
+                client = self.clients.setdefault(name, client)
+        return client
+
+    def _drop(self, name: str) -> None:
+        with self.lock:
+            client = self.clients.pop(name, None)
+        if client is not None:
+            client.rpc.close()
+
+    def _run(self, name: str, query):
+        return query(self._client(name))
+
+    def map(self, query) -> tuple:
+        """
+        Run a function on the LianaRPC of each wallet concurrently.
+
+        :param query: function taking a LianaRPC
+
+        return a `(results, errors)` tuple of dicts by wallet name: the results of the wallets that succeeded and
+        the errors of the ones that failed, either the error object returned by lianad or a description of the
+        exception raised
+        """
+        futures = {name: self.executor.submit(self._run, name, query) for name in self.paths}
+        done, _ = wait(futures.values(), timeout=self.timeout)
+        results, errors = {}, {}
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()
+                errors[name] = f"No reply within {self.timeout}s"
+                # Closing the connection wakes up a call still reading from it. A call on a connection of a pool is
+                # not, its worker is only freed by the deadline of the call, capped to the timeout.
+                self._drop(name)
+                continue
+            try:
+                ret = future.result()
+            except Exception as e:
+                log.debug(f"Query to wallet {name} failed: {e!r}")
+                errors[name] = f"{type(e).__name__}: {e}"
+                # The connection may be in an unknown state, reconnect on the next query.
+                self._drop(name)
+                continue
+            if isinstance(ret, dict) and 'error' in ret.keys():
+                errors[name] = ret['error']
+            else:
+                results[name] = ret
+        return results, errors
+
+    def _merge(self, key: str, query) -> dict:
+        results, errors = self.map(query)
+        merged = [dict(item, wallet=name) for name, items in results.items() for item in items]
+        return {key: merged, 'errors': errors}
+
+    def get_info(self):
+        """
+        Return the general information of each daemon
+
+        return `{'wallets': {<wallet>: <info>}, 'errors': {<wallet>: <error>}}`
+        """
+        results, errors = self.map(LianaRPC.get_info)
+        return {'wallets': results, 'errors': errors}
+
+    def list_coins(self):
+        """
+        List the transaction outputs of all the wallets, each tagged with a `wallet` key.
+
+        return `{'coins': [<coin>], 'errors': {<wallet>: <error>}}`
+        """
+        return self._merge('coins', LianaRPC.list_coins)
+
+    def list_unspent_coins(self):
+        """
+        List the unspent coins of all the wallets, each tagged with a `wallet` key.
+
+        return `{'coins': [<coin>], 'errors': {<wallet>: <error>}}`
+        """
+        return self._merge('coins', LianaRPC.list_unspent_coins)
+
+    def list_confirmed_tx(self, start: int = None, end: int = None, limit: int = 100):
+        """
+        Retrieves the transactions of all the wallets confirmed within a given time window, each tagged with a
+        `wallet` key, ordered by confirmation time.
+
+        :param start: Inclusive lower bound of the time window
+        :param end: Inclusive upper bound of the time window
+        :param limit: Maximum number of transactions to retrieve per wallet
+
+        return `{'transactions': [<transaction>], 'errors': {<wallet>: <error>}}`
+        """
+        ret = self._merge('transactions', lambda liana: liana.list_confirmed_tx(start, end, limit))
+        ret['transactions'].sort(key=lambda tx: tx.get('time') or 0)
+        return ret
+
+    def balances(self):
+        """
+        Return the balance of each wallet and of the whole fleet, in sats.
+
+        return `{'wallets': {<wallet>: {'confirmed': <sats>, 'unconfirmed': <sats>}}, 'confirmed': <sats>,
+        'unconfirmed': <sats>, 'errors': {<wallet>: <error>}}`
+        """
+        def balance(liana):
+            table = liana.coin_table()
+            if isinstance(table, dict):
+                return table
+            return {'confirmed': table.confirmed_balance(), 'unconfirmed': table.unconfirmed_balance()}
+
+        results, errors = self.map(balance)
+        return {
+            'wallets': results,
+            'confirmed': sum(b['confirmed'] for b in results.values()),
+            'unconfirmed': sum(b['unconfirmed'] for b in results.values()),
+            'errors': errors,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        with self.lock:
+            clients, self.clients = self.clients, {}
+        for client in clients.values():
+            client.rpc.close()
@@ -0,0 +1,333 @@
+"""
+A local SQLite copy of the history of a wallet.
+
+A `HistoryStore` keeps the confirmed transactions, the coins and the spend
+transactions (PSBTs) of a wallet in a database file, indexed by block height and
+time, so that a process can query the history without listing it from lianad
+first. `sync()` brings it up to date:
+
+ - transactions: only the `listconfirmed` window since the last synced block
+   time is fetched. The transactions of the last `reorg_depth` blocks are
+   fetched again, so that the ones reorganized out are dropped.
+ - coins: the coins not spent yet are listed, and the ones that were stored as
+   unspent but are not anymore are fetched by outpoint. The spent coins are
+   only listed on the first sync.
+ - spend transactions: the stored PSBTs are replaced by the ones of
+   `listspendtxs`, decoding only the new or updated ones.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from liana_rpc.utils.psbt import DecodeError, psbt_txid, transaction_txid
+from liana_rpc.utils.rpc import RpcError
+from liana_rpc.watcher import UNSPENT_STATUSES
+
+log = logging.getLogger()
+
+# Block times are only loosely ordered: a block can be timestamped up to two hours before the previous one, and
+# two hours in the future.
+MAX_TIME_DRIFT = 2 * 60 * 60
+GENESIS_TIME = 1231006505
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    txid TEXT PRIMARY KEY,
+    tx TEXT NOT NULL,
+    height INTEGER,
+    time INTEGER
+);
+CREATE INDEX IF NOT EXISTS transactions_height ON transactions (height);
+CREATE INDEX IF NOT EXISTS transactions_time ON transactions (time);
+CREATE TABLE IF NOT EXISTS coins (
+    outpoint TEXT PRIMARY KEY,
+    amount INTEGER NOT NULL,
+    block_height INTEGER,
+    address TEXT,
+    derivation_index INTEGER,
+    is_change INTEGER,
+    spend_txid TEXT,
+    spend_height INTEGER,
+    -- 1 while spent by an unconfirmed transaction or not spent, 0 once spent by a confirmed one.
+    unspent INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coins_block_height ON coins (block_height);
+CREATE INDEX IF NOT EXISTS coins_unspent ON coins (unspent);
+CREATE TABLE IF NOT EXISTS spend_txs (
+    txid TEXT PRIMARY KEY,
+    psbt TEXT NOT NULL,
+    psbt_hash BLOB NOT NULL,
+    updated_at INTEGER
+);
+"""
+
+
+def _coin_row(coin: dict) -> tuple:
+    spend_info = coin['spend_info'] or {}
+    return (coin['outpoint'], coin['amount'], coin['block_height'], coin.get('address'),
+            coin.get('derivation_index'), coin.get('is_change'), spend_info.get('txid'), spend_info.get('height'),
+            spend_info.get('height') is None)
+
+
+def _coin(row) -> dict:
+    outpoint, amount, block_height, address, derivation_index, is_change, spend_txid, spend_height = row
+    return {
+        'outpoint': outpoint,
+        'amount': amount,
+        'block_height': block_height,
+        'address': address,
+        'derivation_index': derivation_index,
+        'is_change': None if is_change is None else bool(is_change),
+        'spend_info': None if spend_txid is None else {'txid': spend_txid, 'height': spend_height},
+    }
+
+
+def _transaction(row) -> dict:
+    txid, tx, height, time = row
+    return {'txid': txid, 'tx': tx, 'height': height, 'time': time}
+
+
+class HistoryStore(object):
+    """
+    Confirmed transactions, coins and spend transactions of a wallet, stored in SQLite and synced from lianad.
+    """
+
+    def __init__(self, liana, path: str = ":memory:", reorg_depth: int = 6, page_size: int = 500):
+        """
+        :param liana: the LianaRPC of the wallet to sync from, may be None to only query the store
+        :param path: the database file, created if needed. By default the store is kept in memory.
+        :param reorg_depth: the number of blocks below the last synced block height whose transactions are fetched
+        again on sync, in case they were reorganized
+        :param page_size: the number of transactions per `listconfirmed` call
+        """
+        self.liana = liana
+        self.path = os.path.expanduser(path)
+        self.reorg_depth = reorg_depth
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        with self.db:
+            self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _meta(self, key: str):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def block_height(self):
+        """
+        The block height of lianad at the last sync, None if never synced
+        """
+        with self.lock:
+            return self._meta('block_height')
+
+    def sync(self):
+        """
+        Fetch the changes to the history of the wallet since the last sync.
+
+        return a dict of the number of transactions, coins and spend transactions added or updated, or an
+        `{'error': ...}` dict if lianad returned an error. Nothing is stored if the sync failed.
+        """
+        info = self.liana.get_info()
+        if 'error' in info.keys():
+            return {'error': info['error']}
+        wallet = hashlib.sha256(json.dumps(info.get('descriptors'), sort_keys=True).encode()).hexdigest()
+        with self.lock, self.db:
+            stored_wallet = self._meta('wallet')
+            if stored_wallet is not None and stored_wallet != wallet:
+                return {'error': f"{self.path} holds the history of another wallet"}
+            try:
+                counts = {
+                    'transactions': self._sync_transactions(),
+                    'coins': self._sync_coins(),
+                    'spend_txs': self._sync_spend_txs(),
+                }
+            except RpcError as e:
+                self.db.rollback()
+                return {'error': e.error}
+            self._set_meta('wallet', wallet)
+            self._set_meta('block_height', info['block_height'])
+            self._set_meta('synced_at', int(time.time()))
+        return counts
+
+    def _sync_transactions(self) -> int:
+        synced_height, last_time = self._meta('block_height'), self._meta('last_time')
+        start, floor = GENESIS_TIME, None
+        if synced_height is not None and last_time is not None:
+            # Fetch the transactions of the last blocks again: the ones reorganized out won't come back.
+            floor = synced_height - self.reorg_depth
+            first = self.db.execute("SELECT MIN(time) FROM transactions WHERE height > ?", (floor,)).fetchone()[0]
+            start = max(min(last_time, first if first is not None else last_time) - MAX_TIME_DRIFT, GENESIS_TIME)
+        stale = {txid for (txid,) in self.db.execute("SELECT txid FROM transactions WHERE height > ? OR time >= ?",
+                                                     (floor, start))} if floor is not None else set()
+
+        fetched, rows = set(), []
+        for tx in self.liana.iter_confirmed_txs(start=start, end=int(time.time()) + MAX_TIME_DRIFT,
+                                                page_size=self.page_size):
+            try:
+                txid = transaction_txid(tx['tx'])
+            except DecodeError as e:
+                log.warning(f"Cannot decode a transaction listed by lianad, not storing it: {e}")
+                continue
+            fetched.add(txid)
+            rows.append((txid, tx['tx'], tx['height'], tx['time']))
+            last_time = tx['time'] if last_time is None else max(last_time, tx['time'])
+            if len(rows) >= self.page_size:
+                self._insert_transactions(rows)
+                rows = []
+        self._insert_transactions(rows)
+        self.db.executemany("DELETE FROM transactions WHERE txid = ?", [(txid,) for txid in stale - fetched])
+        self._set_meta('last_time', last_time)
+        return len(fetched - stale)
+
+    def _insert_transactions(self, rows: list) -> None:
+        self.db.executemany("INSERT OR REPLACE INTO transactions (txid, tx, height, time) VALUES (?, ?, ?, ?)", rows)
+
+    def _list_coins(self, **params) -> list:
+        coins = self.liana.list_coins(**params)
+        if type(coins) is not list:
+            raise RpcError('listcoins', params, coins.get('error', coins))
+        return coins
+
+    def _sync_coins(self) -> int:
+        if self._meta('block_height') is None:
+            coins = self._list_coins()
+        else:
+            coins = self._list_coins(statuses=UNSPENT_STATUSES)
+            listed = {coin['outpoint'] for coin in coins}
+            missing = [outpoint for (outpoint,) in self.db.execute("SELECT outpoint FROM coins WHERE unspent = 1")
+                       if outpoint not in listed]
+            if missing:
+                coins += self._list_coins(outpoints=missing)
+                listed = {coin['outpoint'] for coin in coins}
+                # Dropped from the wallet, e.g. by a reorg or a replacement of the transaction.
+                self.db.executemany("DELETE FROM coins WHERE outpoint = ?",
+                                    [(outpoint,) for outpoint in missing if outpoint not in listed])
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT INTO coins (outpoint, amount, block_height, address, derivation_index, is_change, spend_txid, "
+            "spend_height, unspent) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (outpoint) DO UPDATE SET block_height = excluded.block_height, "
+            "spend_txid = excluded.spend_txid, spend_height = excluded.spend_height, unspent = excluded.unspent "
+            "WHERE (block_height, spend_txid, spend_height) IS NOT "
+            "(excluded.block_height, excluded.spend_txid, excluded.spend_height)",
+            [_coin_row(coin) for coin in coins])
+        return self.db.total_changes - before
+
+    def _sync_spend_txs(self) -> int:
+        ret = self.liana.list_psbt()
+        if type(ret) is not list:
+            raise RpcError('listspendtxs', {}, ret.get('error', ret))
+        stored = {psbt_hash: txid for txid, psbt_hash in self.db.execute("SELECT txid, psbt_hash FROM spend_txs")}
+        keep, rows = set(), []
+        for spend in ret:
+            psbt_hash = hashlib.sha256(spend['psbt'].encode()).digest()
+            txid = stored.get(psbt_hash)
+            if txid is None:
+                try:
+                    txid = psbt_txid(spend['psbt'])
+                except DecodeError as e:
+                    log.warning(f"Cannot decode a spend transaction stored in lianad, not storing it: {e}")
+                    continue
+                rows.append((txid, spend['psbt'], psbt_hash, spend.get('updated_at')))
+            keep.add(txid)
+        self.db.executemany("DELETE FROM spend_txs WHERE txid = ?",
+                            [(txid,) for txid in stored.values() if txid not in keep])
+        self.db.executemany("INSERT OR REPLACE INTO spend_txs (txid, psbt, psbt_hash, updated_at) VALUES (?, ?, ?, ?)",
+                            rows)
+        return len(rows)
+
+    def transactions(self, start: int = None, end: int = None, min_height: int = None, max_height: int = None,
+                     limit: int = None) -> list:
+        """
+        List the stored confirmed transactions, ordered by block time.
+
+        :param start: Inclusive lower bound of the block time
+        :param end: Inclusive upper bound of the block time
+        :param min_height: Inclusive lower bound of the block height
+        :param max_height: Inclusive upper bound of the block height
+        :param limit: Maximum number of transactions to return
+
+        return a list of `{'txid', 'tx', 'height', 'time'}` dicts
+        """
+        query, params = "SELECT txid, tx, height, time FROM transactions WHERE 1", []
+        for clause, value in (("time >= ?", start), ("time <= ?", end), ("height >= ?", min_height),
+                              ("height <= ?", max_height)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY time, height, txid"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [_transaction(row) for row in self.db.execute(query, params)]
+
+    def transaction(self, txid: str):
+        """
+        return the stored transaction with this txid, or None
+        """
+        with self.lock:
+            row = self.db.execute("SELECT txid, tx, height, time FROM transactions WHERE txid = ?",
+                                  (txid,)).fetchone()
+        return None if row is None else _transaction(row)
+
+    def coins(self, spent: bool = None, min_height: int = None, max_height: int = None) -> list:
+        """
+        List the stored coins, ordered by block height.
+
+        :param spent: if set, only list the coins spent by a confirmed transaction (True) or the other ones (False)
+        :param min_height: Inclusive lower bound of the block height of the coins
+        :param max_height: Inclusive upper bound of the block height of the coins
+
+        return a list of coins, as returned by `list_coins`
+        """
+        query = ("SELECT outpoint, amount, block_height, address, derivation_index, is_change, spend_txid, "
+                 "spend_height FROM coins WHERE 1")
+        params = []
+        for clause, value in (("unspent = ?", None if spent is None else int(not spent)),
+                              ("block_height >= ?", min_height), ("block_height <= ?", max_height)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY block_height IS NULL, block_height, outpoint"
+        with self.lock:
+            return [_coin(row) for row in self.db.execute(query, params)]
+
+    def coin(self, outpoint: str):
+        """
+        return the stored coin at this outpoint, or None
+        """
+        with self.lock:
+            row = self.db.execute("SELECT outpoint, amount, block_height, address, derivation_index, is_change, "
+                                  "spend_txid, spend_height FROM coins WHERE outpoint = ?", (outpoint,)).fetchone()
+        return None if row is None else _coin(row)
+
+    def spend_txs(self) -> list:
+        """
+        return the stored spend transactions as `{'txid', 'psbt', 'updated_at'}` dicts
+        """
+        with self.lock:
+            return [{'txid': txid, 'psbt': psbt, 'updated_at': updated_at} for txid, psbt, updated_at
+                    in self.db.execute("SELECT txid, psbt, updated_at FROM spend_txs ORDER BY txid")]
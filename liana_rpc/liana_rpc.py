@@ -2,45 +2,53 @@ import logging
 import subprocess
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from liana_rpc.utils.rpc import UnixDomainSocketRpc
+from liana_rpc.coin_index import CoinIndex
+from liana_rpc.coin_table import CoinTable
+from liana_rpc.recovery import RecoveryPlanner
+from liana_rpc.tx_cache import TxCache
+from liana_rpc.utils import coin_selection
+from liana_rpc.utils.discovery import find_lianad_sockets
+from liana_rpc.utils.pool import UnixDomainSocketRpcPool
+from liana_rpc.utils.psbt import DecodeError, decode_transaction, psbt_txid, transaction_txid
+from liana_rpc.utils.rpc import RpcError, UnixDomainSocketRpc
 
 log = logging.getLogger()
 
 
-def get_liana_instances():
+def get_liana_instances(refresh=False):
     """
     return a list of lianad running sockets
+    
+    :param refresh: ignore the results cached from previous calls
     """
-    command = 'ps -aux | grep lianad'
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True)
-    if result.returncode == 0:
-        out = result.stdout
-        out = out.splitlines()
-        
-        if len(out) > 2:
-            liana_sockets = []
-            out = out[:-2]
-            for i in out:
-                liana_sockets.append("/".join(i.split(' ')[-1].split('/')[:-1]) + '/lianad_rpc')
-            return liana_sockets
+    return find_lianad_sockets(refresh)
+
 
-    return []
+def _cli_network(network):
+    if network == 'main':
+        return ''
+    elif network in ['testnet', 'regtest', 'signet']:
+        return f'-{network}'
+    return network
 
 
-def psbt_to_txid(psbt, network='main'):
+def psbt_to_txid(psbt, network='main', use_bitcoin_cli=False):
     """
-    Extract txid from a Base64 PSBT using bitcoin-core trough a "bitcoin-cli decodepsbt" call
+    Extract txid from a Base64 PSBT
     
     :param psbt: Base64 encoded psbt
+    :param use_bitcoin_cli: decode the PSBT with a "bitcoin-cli decodepsbt" call instead of in-process
     
     return txid in hexadecimal encoded format
     """
-    if network == 'main':
-        network = ''
-    elif network in ['testnet', 'regtest', 'signet']:
-        network = f'-{network}'
-    command = f"bitcoin-cli {network} decodepsbt {psbt}"
+    if not use_bitcoin_cli:
+        try:
+            return psbt_txid(psbt)
+        except DecodeError:
+            return {'error': f'Cannot decode psbt: {psbt}'}
+    command = f"bitcoin-cli {_cli_network(network)} decodepsbt {psbt}"
     result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True)
     if result.returncode == 0:
         txid = json.loads(result.stdout)['tx']['txid']
@@ -50,19 +58,21 @@ def psbt_to_txid(psbt, network='main'):
         return data
    
     
-def rawtx_to_txid(rawtx, network='main'):
+def rawtx_to_txid(rawtx, network='main', use_bitcoin_cli=False):
     """
-    Extract txid from a raw transaction (hex format) using bitcoin-core trough a "bitcoin-cli decoderawtransaction" call
+    Extract txid from a raw transaction (hex format)
 
     :param rawtx: raw tx in hexadecimal format
+    :param use_bitcoin_cli: decode the transaction with a "bitcoin-cli decoderawtransaction" call instead of in-process
 
     return txid in hexadecimal encoded format
     """
-    if network == 'main':
-        network = ''
-    elif network in ['testnet', 'regtest', 'signet']:
-        network = f'-{network}'
-    command = f"bitcoin-cli {network} decoderawtransaction {rawtx}"
+    if not use_bitcoin_cli:
+        try:
+            return transaction_txid(rawtx)
+        except DecodeError:
+            return {'error': f'Cannot decode rawtx: {rawtx}'}
+    command = f"bitcoin-cli {_cli_network(network)} decoderawtransaction {rawtx}"
     result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True)
     if result.returncode == 0:
         txid = json.loads(result.stdout)['txid']
@@ -72,19 +82,21 @@ def rawtx_to_txid(rawtx, network='main'):
         return data
     
     
-def decode_tx(rawtx, network='main'):
+def decode_tx(rawtx, network='main', use_bitcoin_cli=False):
     """
-    Decode a raw transaction (hex format) using bitcoin-core trough a "bitcoin-cli decoderawtransaction" call
+    Decode a raw transaction (hex format), in the same format as bitcoin-core "decoderawtransaction"
 
     :param rawtx: raw tx in hexadecimal format
+    :param use_bitcoin_cli: decode the transaction with a "bitcoin-cli decoderawtransaction" call instead of in-process
 
     return a decoded tx
     """
-    if network == 'main':
-        network = ''
-    elif network in ['testnet', 'regtest', 'signet']:
-        network = f'-{network}'
-    command = f"bitcoin-cli {network} decoderawtransaction {rawtx}"
+    if not use_bitcoin_cli:
+        try:
+            return decode_transaction(rawtx, network)
+        except DecodeError:
+            return {'error': f'Cannot decode rawtx: {rawtx}'}
+    command = f"bitcoin-cli {_cli_network(network)} decoderawtransaction {rawtx}"
     result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True)
     if result.returncode == 0:
         tx = json.loads(result.stdout)
@@ -94,36 +106,75 @@ def decode_tx(rawtx, network='main'):
         return data
 
 
+def find_socket_path(path=None):
+    """
+    Return `path` if given, else the socket of the only running lianad instance.
+    """
+    if path is not None:
+        return path
+    sockets = get_liana_instances()
+    if len(sockets) == 1:
+        return sockets[0]
+    elif len(sockets) == 0:
+        raise Exception("We don't find a running instance of lianad, you might start it prior to instantiate the class or supply the path to socket")
+    else:
+        msg = "There is several running instances of lianad, you might specify the socket you want to connect, " \
+              "or query them all with liana_rpc.fleet.LianaFleet:\n"
+        for i in sockets:
+            msg += f"{i}\n"
+        raise Exception(msg)
+
+
 class LianaRPC:
     """
     This class is a RPC client for connect to Liana daemon (lianad) from wizarsardine
     https://github.com/wizardsardine/liana/blob/master/doc/API.md
     """
     
-    def __init__(self, path=None):
+    def __init__(self, path=None, pool_size: int = None, tx_cache_size: int = None, instrumentation=None,
+                 timeouts: dict = None, timeout: float = None):
         """
         :param path: the path to the socket file (usually  ~/.liana/<chain>/lianad_rpc), lianad might to be already
         running before start LianaRPC instance. If only one instance of lianad is runnig this arg is optionnal, __init__
         function should automaticaly find the socket path, else if several instances of lianad running, you might specify
         the socket path.
+        :param pool_size: if set, calls are spread over a pool of up to `pool_size` connections to lianad, opened
+        lazily, so that concurrent calls from several threads are served in parallel.
+        :param tx_cache_size: if set, `list_txs` and `fetch_tx` are served from a `TxCache` of up to this many
+        transactions.
+        :param instrumentation: an `Instrumentation` recording statistics of the calls to lianad, see
+        `liana_rpc.utils.instrumentation`.
+        :param timeouts: deadlines in seconds of the calls to some lianad methods, by method name, overriding the
+        defaults of `liana_rpc.utils.rpc.METHOD_TIMEOUTS`.
+        :param timeout: deadline in seconds of the calls to the other methods, `liana_rpc.utils.rpc.TIMEOUT` by
+        default.
         """
         
         logger = logging.getLogger()
         
-        if path is None:
-            sockets = get_liana_instances()
-            if len(sockets) == 1:
-                self.path = sockets[0]
-            elif len(sockets) == 0:
-                raise Exception("We don't find a running instance of lianad, you might start it prior to instantiate the class or supply the path to socket")
-            else:
-                msg = "There is several running instances of lianad, you might specify the socket you want to connect:\n"
-                for i in sockets:
-                    msg += f"{i}\n"
-                raise Exception(msg)
+        self.path = find_socket_path(path)
+        self.instrumentation = instrumentation
+        rpc_kwargs = {'timeout': timeout} if timeout is not None else {}
+        if pool_size:
+            self.rpc = UnixDomainSocketRpcPool(self.path, size=pool_size, instrumentation=instrumentation,
+                                               timeouts=timeouts, **rpc_kwargs)
         else:
-            self.path = path
-        self.rpc = UnixDomainSocketRpc(self.path)
+            self.rpc = UnixDomainSocketRpc(self.path, instrumentation=instrumentation, timeouts=timeouts,
+                                           **rpc_kwargs)
+        self._coin_index = None
+        self._input_weight = None
+        self.tx_cache = None
+        if tx_cache_size:
+            self.tx_cache = TxCache(self._list_txs, get_block_height=self._block_height, maxsize=tx_cache_size)
+
+    @property
+    def coin_index(self):
+        """
+        The CoinIndex of this wallet, created on first use.
+        """
+        if self._coin_index is None:
+            self._coin_index = CoinIndex(self)
+        return self._coin_index
         
     def get_info(self):
         """
@@ -131,6 +182,8 @@ class LianaRPC:
         """
         ret = self.rpc.call('getinfo')
         if 'block_height' in ret.keys():
+            if self.tx_cache is not None:
+                self.tx_cache.set_block_height(ret['block_height'])
             return ret
         elif 'error' in ret.keys():
             return {'error': ret['error']}
@@ -161,11 +214,29 @@ class LianaRPC:
         else:
             return ret
 
-    def list_coins(self):
+    def get_new_addresses(self, count: int):
         """
-        List all wallet transaction outputs.
+        Get several new receiving addresses in a single round trip
+        
+        :param count: number of addresses to generate
+        """
+        rets = self.rpc.call_many([('getnewaddress', {})] * count)
+        return [ret['address'] if 'address' in ret.keys() else ret for ret in rets]
+
+    def list_coins(self, statuses: list = None, outpoints: list = None):
         """
-        ret = self.rpc.call('listcoins')
+        List all wallet transaction outputs.
+        
+        :param statuses: if set, only list the coins of these statuses, among 'unconfirmed', 'confirmed',
+        'spending' (spent by an unconfirmed transaction) and 'spent'
+        :param outpoints: if set, only list the coins at these outpoints
+        """
+        params = {}
+        if statuses:
+            params['statuses'] = statuses
+        if outpoints:
+            params['outpoints'] = outpoints
+        ret = self.rpc.call('listcoins', params)
         if 'coins' in ret.keys():
             return ret['coins']
         elif 'error' in ret.keys():
@@ -173,10 +244,43 @@ class LianaRPC:
         else:
             return ret
     
-    def list_unspent_coins(self):
+    def iter_coins(self, filter=None, spent: bool = None, min_amount: int = None):
+        """
+        Iterate over the wallet transaction outputs as the reply of lianad is received, without holding them all
+        in memory. Raise an RpcError if lianad returned an error.
+        
+        :param filter: a function taking a coin and returning whether to yield it
+        :param spent: if set, only yield the spent (True) or the unspent (False) coins
+        :param min_amount: only yield the coins of at least this amount, in sats
+        """
+        def keep(coin):
+            if spent is not None and bool(coin['spend_info']) != spent:
+                return False
+            if min_amount is not None and coin['amount'] < min_amount:
+                return False
+            return filter is None or filter(coin)
+
+        return self.rpc.stream('listcoins', 'coins', filter=keep)
+
+    def coin_table(self, use_numpy: bool = None):
+        """
+        Return the wallet transaction outputs as a `CoinTable`, built as the reply of lianad is received.
+        
+        :param use_numpy: whether the table computes with NumPy, by default if it is installed
+        """
+        try:
+            return CoinTable(self.iter_coins(), use_numpy=use_numpy)
+        except RpcError as e:
+            return {'error': e.error}
+
+    def list_unspent_coins(self, cached: bool = False):
         """
         Return the list of unspent coins
+        
+        :param cached: serve the coins from the `coin_index`, only refetched if the block height changed
         """
+        if cached:
+            return self._cached_coins(CoinIndex.unspent_coins)
         ret = self.list_coins()
         if type(ret) is not list:
             return ret
@@ -186,10 +290,14 @@ class LianaRPC:
                 unspent_coins.append(i)
         return unspent_coins
     
-    def list_spent_coins(self):
+    def list_spent_coins(self, cached: bool = False):
         """
         Return the list of spent coins
+        
+        :param cached: serve the coins from the `coin_index`, only refetched if the block height changed
         """
+        if cached:
+            return self._cached_coins(CoinIndex.spent_coins)
         ret = self.list_coins()
         if type(ret) is not list:
             return ret
@@ -199,6 +307,12 @@ class LianaRPC:
                 spend_coins.append(i)
         return spend_coins
 
+    def _cached_coins(self, view):
+        ret = self.coin_index.refresh()
+        if ret is not None:
+            return ret
+        return view(self.coin_index)
+
     def create_psbt(self, coins: [], outputs: {}, feerate: int):
         """
         Create a PSBT from unspend coins list.
@@ -222,6 +336,38 @@ class LianaRPC:
         else:
             return ret
     
+    def create_psbt_auto(self, outputs: {}, feerate: int, cached: bool = False,
+                         time_budget: float = coin_selection.TIME_BUDGET):
+        """
+        Create a PSBT paying the outputs, choosing the coins to spend among the unspent ones (see
+        `liana_rpc.utils.coin_selection.select_coins`).
+        
+        :param outputs: dict of outputs in the form of {<address>:<amount>, <address>:<amount>,}
+        :param feerate: feerate in sats/VBytes
+        :param cached: choose among the coins of the `coin_index` instead of fetching them
+        :param time_budget: time in seconds given to the search of a selection without change
+        
+        Return Base64 encoded PSBT.
+        """
+        coins = self.list_unspent_coins(cached)
+        if type(coins) is not list:
+            return coins
+        if self._input_weight is None:
+            info = self.get_info()
+            if 'error' in info.keys():
+                return {'error': info['error']}
+            try:
+                self._input_weight = coin_selection.input_weight(info['descriptors']['main']['multi_desc'])
+            except (KeyError, coin_selection.SelectionError):
+                log.warning("Cannot estimate the input weight of the descriptor, using a default value")
+                self._input_weight = coin_selection.DEFAULT_INPUT_WEIGHT
+        try:
+            selection = coin_selection.select_coins(coins, outputs, feerate, input_weight=self._input_weight,
+                                                    time_budget=time_budget)
+        except coin_selection.SelectionError as e:
+            return {'error': str(e)}
+        return self.create_psbt(selection['outpoints'], outputs, feerate)
+    
     def upate_psbt(self, psbt: str):
         """
         Store the PSBT of a Spend transaction in database, updating it if it already exists.
@@ -235,6 +381,17 @@ class LianaRPC:
         else:
             return ret
     
+    def update_psbts(self, psbts: []):
+        """
+        Store several PSBTs of Spend transactions in database in a single round trip, see `upate_psbt`.
+        
+        :param psbts: list of Base64-encoded PSBTs
+        
+        return a list with the result for each PSBT, in the same order
+        """
+        rets = self.rpc.call_many([('updatespend', {'psbt': psbt}) for psbt in psbts])
+        return [{'ok': True} if ret == {} else ret for ret in rets]
+
     def list_psbt(self):
         """
         List PSBT stored in Liana DB.
@@ -261,6 +418,17 @@ class LianaRPC:
         else:
             return ret
     
+    def del_psbts(self, txids: []):
+        """
+        Delete several PSBTs stored in lianad DB given their txids, in a single round trip.
+        
+        :param txids: list of transaction ids in hexadecimal format
+        
+        return a list with the result for each txid, in the same order
+        """
+        rets = self.rpc.call_many([('delspendtx', {'txid': txid}) for txid in txids])
+        return [{'ok': True} if ret == {} else ret for ret in rets]
+
     def broadcast_psbt(self, txid: str):
         """
         Finalize a PSBT stored in liana DB, and broadcast it
@@ -268,6 +436,8 @@ class LianaRPC:
         :param txid: Transaction id in hexadecimal format
         """
         ret = self.rpc.call('broadcastspend', {'txid': txid})
+        if self._coin_index is not None:
+            self._coin_index.invalidate()
         if ret == {}:
             return {'ok': True}
         elif 'error' in ret.keys():
@@ -275,6 +445,19 @@ class LianaRPC:
         else:
             return ret
     
+    def broadcast_psbts(self, txids: []):
+        """
+        Finalize and broadcast several PSBTs stored in liana DB, in a single round trip.
+        
+        :param txids: list of transaction ids in hexadecimal format
+        
+        return a list with the result for each txid, in the same order
+        """
+        rets = self.rpc.call_many([('broadcastspend', {'txid': txid}) for txid in txids])
+        if self._coin_index is not None:
+            self._coin_index.invalidate()
+        return [{'ok': True} if ret == {} else ret for ret in rets]
+
     def start_rescan(self, timestamp: int):
         """
         Start rescanning the block chain from a given date
@@ -318,6 +501,72 @@ class LianaRPC:
         else:
             return ret
         
+    def iter_confirmed_txs(self, start: int = None, end: int = None, page_size: int = 100, prefetch: bool = False):
+        """
+        Iterate over all the transactions confirmed within a given time window, fetching them lazily page by page.
+        
+        Each page narrows the time window to the block time of its last transaction, so the window moves backward
+        or forward depending on the order lianad returns transactions in. Transactions at the boundary time, which
+        the next page returns again, are skipped. Only the current page is kept in memory.
+        
+        :param start: Inclusive lower bound of the time window
+        :param end: Inclusive upper bound of the time window
+        :param page_size: Number of transactions to retrieve per `listconfirmed` call
+        :param prefetch: fetch the next page in a background thread while the current one is consumed
+        
+        yield confirmed transactions resources, raise RpcError if lianad returns an error
+        """
+        if not start:
+            start = 1231006505  # genesis block
+            
+        if not end:
+            end = round(time.time())
+        
+        def fetch(params):
+            ret = self.rpc.call('listconfirmed', params)
+            if 'transactions' in ret.keys():
+                return ret['transactions']
+            raise RpcError('listconfirmed', params, ret.get('error', ret))
+        
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        params = {'start': start, 'end': end, 'limit': page_size}
+        descending = True
+        boundary, seen = None, set()
+        try:
+            page = fetch(params)
+            while True:
+                new = [tx for tx in page if tx['tx'] not in seen]
+                if len(page) < params['limit']:
+                    yield from new
+                    return
+                
+                if page[0]['time'] != page[-1]['time']:
+                    descending = page[0]['time'] > page[-1]['time']
+                last_time = page[-1]['time']
+                if last_time != boundary:
+                    boundary, seen = last_time, set()
+                seen.update(tx['tx'] for tx in page if tx['time'] == boundary)
+                
+                params = dict(params)
+                if descending:
+                    params['end'] = boundary
+                else:
+                    params['start'] = boundary
+                # A page full of transactions we already returned: more than a page of them share the boundary
+                # time, the next page must be larger to get past it.
+                params['limit'] = page_size if new else params['limit'] * 2
+                
+                if executor is not None:
+                    next_page = executor.submit(fetch, params)
+                    yield from new
+                    page = next_page.result()
+                else:
+                    yield from new
+                    page = fetch(params)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     def fetch_tx(self, txid: str):
         """
         Retrieve a single transaction given its txid.
@@ -332,6 +581,31 @@ class LianaRPC:
         else:
             return ret
     
+    def fetch_txs(self, txids: []):
+        """
+        Retrieve several transactions given their txids, in a single round trip.
+        
+        :param txids: list of transaction ids in hexadecimal format
+        
+        return a list with the transaction resource for each txid, or `{'error': ...}` if it could not be fetched
+        """
+        if self.tx_cache is not None:
+            ret = self.tx_cache.get_many(txids)
+            if 'error' in ret.keys():
+                return [ret] * len(txids)
+            return [ret.get(txid, {'error': f'Transaction not found: {txid}'}) for txid in txids]
+        rets = self.rpc.call_many([('listtransactions', {'txids': [txid]}) for txid in txids])
+        txs = []
+        for txid, ret in zip(txids, rets):
+            if 'transactions' in ret.keys():
+                if ret['transactions']:
+                    txs.append(ret['transactions'][0])
+                else:
+                    txs.append({'error': f'Transaction not found: {txid}'})
+            else:
+                txs.append(ret)
+        return txs
+
     def list_txs(self, txs: []):
         """
         Retrieves transactions with the given txids.
@@ -340,7 +614,14 @@ class LianaRPC:
         
         return a List of transactions resources
         """
-        
+        if self.tx_cache is not None:
+            ret = self.tx_cache.get_many(txs)
+            if 'error' in ret.keys():
+                return ret
+            return list(ret.values())
+        return self._list_txs(txs)
+    
+    def _list_txs(self, txs: []):
         ret = self.rpc.call('listtransactions', {'txids': txs})
         if 'transactions' in ret.keys():
             return ret['transactions']
@@ -349,7 +630,29 @@ class LianaRPC:
         else:
             return ret
     
-    def create_recovery_psbt(self, address: str, feerate: int, timelock: int = 0):
+    def _block_height(self):
+        ret = self.get_info()
+        return ret.get('block_height')
+    
+    def recovery_planner(self):
+        """
+        Fetch the confirmed coins and the descriptor of the wallet to plan recovery transactions locally, see
+        `liana_rpc.recovery.RecoveryPlanner`.
+        
+        return a RecoveryPlanner, or an `{'error': ...}` dict
+        """
+        info = self.get_info()
+        if 'error' in info.keys():
+            return {'error': info['error']}
+        coins = self.list_coins(statuses=['confirmed'])
+        if type(coins) is not list:
+            return coins
+        try:
+            return RecoveryPlanner(coins, info['block_height'], info['descriptors']['main']['multi_desc'])
+        except (KeyError, coin_selection.SelectionError) as e:
+            return {'error': f'Cannot read the recovery paths of the descriptor: {e}'}
+
+    def create_recovery_psbt(self, address: str, feerate: int, timelock: int = 0, check: bool = False):
         """
         Create a transaction that sweeps all coins for which a timelocked recovery path is currently available to a
         provided address with the provided feerate.
@@ -364,7 +667,23 @@ class LianaRPC:
         :param address: The Bitcoin address to sweep the coins to, in str format
         :param feerate: Target feerate for the transaction, in satoshis per virtual byte in int foramt.
         :param timelock: Recovery path to be used, identified by the number of blocks after which it is available, in int format.
-        """
+        :param check: plan the recovery locally first (see `recovery_planner`), and only call lianad if it can
+        succeed
+        """
+        if check:
+            planner = self.recovery_planner()
+            if isinstance(planner, dict):
+                return planner
+            try:
+                plan = planner.plan(feerate, timelock, address)
+            except ValueError as e:
+                return {'error': str(e)}
+            if not plan['possible']:
+                error = (f"Cannot sweep the {plan['coins']} coins recoverable through the recovery path of timelock "
+                         f"{plan['timelock']}: {plan['amount']} sats for {plan['fee']} sats of fees")
+                if plan['next_height'] is not None:
+                    error += f", more coins will be recoverable from block {plan['next_height']}"
+                return {'error': error}
         params = {
             'address': address,
             'feerate': feerate,
@@ -0,0 +1,175 @@
+"""
+Bulk processing of signed PSBTs: store them in lianad, broadcast them and delete them from its database.
+
+A `PsbtPipeline` splits the PSBTs in batches. The txid of each PSBT is computed
+in-process, then each stage of a batch is sent as one pipelined round trip
+(`call_many`) instead of a call per PSBT. Several batches are processed at
+once, each at its own stage, so lianad always has requests to work on.
+
+A stage that failed to reach lianad (connection failure, timeout) is retried
+for the PSBTs of that batch, without running the previous stages again. The
+broadcast is not idempotent: it is only retried if the connection to lianad
+could not be established, since after a timeout or a broken connection some of
+the PSBTs may have been broadcast already. A PSBT that lianad rejected at some
+stage stops there, and the error is reported in its `PsbtResult`.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from liana_rpc.utils.psbt import DecodeError, psbt_txid
+from liana_rpc.utils.retry import IDEMPOTENT_METHODS, CircuitOpenError, backoff_delay
+
+log = logging.getLogger()
+
+# Raised before any request of a batch was sent: retrying these never sends a request twice.
+NOT_SENT_ERRORS = (ConnectionRefusedError, FileNotFoundError, CircuitOpenError)
+
+
+class PsbtResult(object):
+    """
+    The outcome of the processing of a PSBT.
+
+    `stage` is the last stage the PSBT went through: None if its txid could not be computed, "txid", "update",
+    "broadcast" or "delete". If `error` is set, the next stage failed with this error, either the error object
+    returned by lianad or a description of the connection failure. A PSBT whose broadcast failed after it was sent
+    (timeout, broken connection) is reported at the "update" stage with `broadcast_unknown` set: it may have been
+    broadcast, and it is kept in the database of lianad.
+    """
+
+    __slots__ = ("psbt", "txid", "stage", "error", "retries", "broadcast_unknown")
+
+    def __init__(self, psbt: str):
+        self.psbt = psbt
+        self.txid = None
+        self.stage = None
+        self.error = None
+        # The number of attempts at its stages that failed to reach lianad.
+        self.retries = 0
+        self.broadcast_unknown = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> dict:
+        ret = {'txid': self.txid, 'stage': self.stage, 'error': self.error, 'retries': self.retries}
+        if self.broadcast_unknown:
+            ret['broadcast_unknown'] = True
+        return ret
+
+    def __repr__(self):
+        return f"PsbtResult({self.to_dict()})"
+
+
+def _batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PsbtPipeline(object):
+    """
+    Stores, broadcasts and deletes many signed PSBTs, with bounded concurrency.
+    """
+
+    def __init__(self, liana, broadcast: bool = True, delete: bool = True, batch_size: int = 20,
+                 concurrency: int = 4, max_attempts: int = 3):
+        """
+        :param liana: the LianaRPC of the wallet, give it a `pool_size` to spread the batches over several
+        connections
+        :param broadcast: broadcast the PSBTs once stored, otherwise only store them
+        :param delete: delete the PSBTs from the database of lianad once broadcast
+        :param batch_size: the number of PSBTs sent to lianad in a round trip
+        :param concurrency: the number of batches processed at once
+        :param max_attempts: the number of times a stage is tried when lianad can't be reached. The broadcast is
+        only tried again if the connection could not be established.
+        """
+        self.liana = liana
+        self.broadcast = broadcast
+        self.delete = delete
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+    def run(self, psbts) -> list:
+        """
+        Process PSBTs.
+
+        :param psbts: iterable of Base64-encoded signed PSBTs, consumed as the batches are processed
+
+        return a list with the `PsbtResult` of each PSBT, in the same order
+        """
+        results = []
+        futures, pending = [], set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="liana-psbt") as executor:
+            for batch in _batches(psbts, self.batch_size):
+                if len(pending) >= 2 * self.concurrency:
+                    # Don't read the PSBTs faster than lianad processes them.
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                batch = [PsbtResult(psbt) for psbt in batch]
+                results.extend(batch)
+                future = executor.submit(self._process, batch)
+                futures.append(future)
+                pending.add(future)
+        for future in futures:
+            future.result()
+        return results
+
+    def _process(self, batch: list) -> None:
+        for result in batch:
+            try:
+                result.txid = psbt_txid(result.psbt)
+                result.stage = "txid"
+            except DecodeError as e:
+                result.error = f"Cannot decode psbt: {e}"
+        batch = [result for result in batch if result.ok]
+        batch = self._stage("update", "updatespend", self.liana.update_psbts, [result.psbt for result in batch],
+                            batch)
+        if self.broadcast:
+            batch = self._stage("broadcast", "broadcastspend", self.liana.broadcast_psbts,
+                                [result.txid for result in batch], batch)
+            if self.delete:
+                self._stage("delete", "delspendtx", self.liana.del_psbts, [result.txid for result in batch], batch)
+
+    def _stage(self, stage: str, method: str, call, args: list, batch: list) -> list:
+        """Run a stage on a batch, return the results of the PSBTs that went through it."""
+        if not batch:
+            return []
+        rets, error = None, None
+        for attempt in range(self.max_attempts):
+            try:
+                rets = call(args)
+                break
+            except (OSError, ValueError) as e:
+                log.debug(f"Stage {stage} of {len(batch)} PSBTs failed: {e!r}")
+                error = f"{type(e).__name__}: {e}"
+                for result in batch:
+                    result.retries += 1
+                if method not in IDEMPOTENT_METHODS and not isinstance(e, NOT_SENT_ERRORS):
+                    # Some of the requests may have been processed, sending them again could act twice.
+                    if stage == "broadcast":
+                        for result in batch:
+                            result.broadcast_unknown = True
+                    break
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(backoff_delay(attempt))
+        if rets is None:
+            for result in batch:
+                result.error = error
+            return []
+
+        done = []
+        for result, ret in zip(batch, rets):
+            if isinstance(ret, dict) and 'error' in ret.keys():
+                result.error = ret['error']
+            else:
+                result.stage = stage
+                done.append(result)
+        return done
@@ -0,0 +1,288 @@
+"""
+A local proxy to lianad for many short-lived clients.
+
+The proxy listens on a Unix socket of its own and speaks the same JSON-RPC as
+lianad, so any client (LianaRPC, or a `lianad_rpc` path given to another tool)
+can use it in place of lianad. It forwards the requests over a few persistent
+connections to lianad, and:
+
+ - identical read-only requests in flight at the same time are sent to lianad
+   once, all the clients get the same reply,
+ - the replies to read-only requests are cached for `max_age` seconds, and
+   dropped as soon as the block height changes or a request that may modify the
+   wallet (anything but the read-only methods) goes through.
+
+The block height is checked with a `getinfo` at most every
+`height_check_interval` seconds, and only when requests come in.
+
+    liana-rpc-proxy --socket ~/.liana/bitcoin/lianad_rpc --listen /tmp/lianad_proxy
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import stat
+
+from liana_rpc.liana_rpc import find_socket_path
+from liana_rpc.utils.async_rpc import READ_SIZE, AsyncUnixDomainSocketRpc
+from liana_rpc.utils.codec import get_codec
+from liana_rpc.utils.rpc import METHOD_TIMEOUTS, TIMEOUT, LineBuffer
+
+# The methods that don't modify the wallet, whose replies are shared and cached.
+READ_ONLY_METHODS = frozenset([
+    "getinfo",
+    "listcoins",
+    "listspendtxs",
+    "listconfirmed",
+    "listtransactions",
+])
+PROXY_SOCKET_NAME = "lianad_rpc_proxy"
+MAX_CACHE_ENTRIES = 1024
+
+# JSON-RPC error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+INTERNAL_ERROR = -32603
+
+
+class LianaProxy(object):
+    """
+    Serves the JSON-RPC of the lianad at `upstream_path` on `listen_path`, over `connections` connections to lianad.
+    """
+
+    def __init__(self, upstream_path: str, listen_path: str, connections: int = 2, max_age: float = 2.0,
+                 height_check_interval: float = 1.0, logger=None, codec=None):
+        self.upstream_path = upstream_path
+        self.listen_path = listen_path
+        if not logger:
+            self.logger = logging.getLogger()
+        else:
+            self.logger = logger
+        self.codec = codec if codec is not None else get_codec()
+        self.max_age = max_age
+        self.height_check_interval = height_check_interval
+        self.upstreams = [AsyncUnixDomainSocketRpc(upstream_path, self.logger, self.codec)
+                          for _ in range(connections)]
+        self._next_upstream = 0
+        self.server = None
+
+        # The encoded result of the read-only requests, with the time they were fetched, by request.
+        self.cache = collections.OrderedDict()
+        # The futures of the read-only requests sent to lianad, by request.
+        self.inflight = {}
+        # Incremented when the cache is invalidated, so that replies to requests sent before are not cached.
+        self.generation = 0
+        self.block_height = None
+        self.checked_at = None
+        self._height_check = None
+        self.stats = collections.Counter()
+
+    async def start(self) -> None:
+        """Start listening for clients."""
+        try:
+            if stat.S_ISSOCK(os.stat(self.listen_path).st_mode):
+                # Left over by a previous run.
+                os.unlink(self.listen_path)
+        except FileNotFoundError:
+            pass
+        self.server = await asyncio.start_unix_server(self._handle_client, path=self.listen_path)
+        self.logger.info(f"Proxying {self.upstream_path} on {self.listen_path}")
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+            if os.path.exists(self.listen_path):
+                os.unlink(self.listen_path)
+        for upstream in self.upstreams:
+            await upstream.close()
+
+    def invalidate(self) -> None:
+        """Drop the cached replies."""
+        self.cache.clear()
+        self.inflight = {}
+        self.generation += 1
+
+    async def _call_upstream(self, method: str, params):
+        upstream = self.upstreams[self._next_upstream]
+        self._next_upstream = (self._next_upstream + 1) % len(self.upstreams)
+        self.stats['upstream_calls'] += 1
+        return await asyncio.wait_for(upstream.call(method, params), METHOD_TIMEOUTS.get(method, TIMEOUT))
+
+    async def _refresh_height(self) -> None:
+        try:
+            info = await self._call_upstream("getinfo", {})
+            if 'block_height' not in info:
+                return
+            if info['block_height'] != self.block_height:
+                if self.block_height is not None:
+                    self.logger.debug(f"Block height moved to {info['block_height']}, dropping the cache")
+                self.invalidate()
+                self.block_height = info['block_height']
+            now = asyncio.get_running_loop().time()
+            self._store(("getinfo", b"{}"), self.codec.dumps(info), now)
+            self.checked_at = now
+        finally:
+            self._height_check = None
+
+    async def _check_height(self) -> None:
+        """Drop the cache if the block height changed, checking it at most every height_check_interval."""
+        now = asyncio.get_running_loop().time()
+        if self.checked_at is not None and now - self.checked_at < self.height_check_interval:
+            return
+        if self._height_check is None:
+            self._height_check = asyncio.ensure_future(self._refresh_height())
+        await asyncio.shield(self._height_check)
+
+    def _store(self, key: tuple, result: bytes, now: float) -> None:
+        self.cache[key] = (result, now)
+        self.cache.move_to_end(key)
+        while len(self.cache) > MAX_CACHE_ENTRIES:
+            self.cache.popitem(last=False)
+
+    async def _fetch(self, key: tuple, method: str, params, fut) -> None:
+        generation = self.generation
+        try:
+            result = await self._call_upstream(method, params)
+            if isinstance(result, dict) and 'error' in result:
+                fut.set_result((None, result['error']))
+            else:
+                encoded = self.codec.dumps(result)
+                if generation == self.generation:
+                    self._store(key, encoded, asyncio.get_running_loop().time())
+                fut.set_result((encoded, None))
+        except Exception as e:
+            if not fut.done():
+                fut.set_result(self._failure(e))
+        finally:
+            if self.inflight.get(key) is fut:
+                del self.inflight[key]
+            # Never leave the coalesced clients waiting.
+            if not fut.done():
+                fut.cancel()
+
+    async def _read_only_call(self, method: str, params) -> tuple:
+        key = (method, json.dumps(params or {}, sort_keys=True).encode())
+        try:
+            await self._check_height()
+        except Exception as e:
+            return self._failure(e)
+        entry = self.cache.get(key)
+        if entry is not None and asyncio.get_running_loop().time() - entry[1] < self.max_age:
+            self.stats['cache_hits'] += 1
+            return entry[0], None
+        fut = self.inflight.get(key)
+        if fut is not None:
+            self.stats['coalesced'] += 1
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self.inflight[key] = fut
+            asyncio.ensure_future(self._fetch(key, method, params, fut))
+        return await asyncio.shield(fut)
+
+    async def _forward(self, method: str, params) -> tuple:
+        try:
+            result = await self._call_upstream(method, params)
+            if isinstance(result, dict) and 'error' in result:
+                return None, result['error']
+            return self.codec.dumps(result), None
+        except Exception as e:
+            return self._failure(e)
+        finally:
+            # The call may have modified the wallet, whether it succeeded or not.
+            self.invalidate()
+
+    def _failure(self, e: Exception) -> tuple:
+        self.logger.warning(f"Call to lianad failed: {e!r}")
+        return None, {"code": INTERNAL_ERROR, "message": f"Call to lianad failed: {type(e).__name__}: {e}"}
+
+    def _reply(self, this_id, result: bytes = None, error=None) -> bytes:
+        envelope = b'{"jsonrpc":"2.0","id":' + self.codec.dumps(this_id)
+        if error is not None:
+            return envelope + b',"error":' + self.codec.dumps(error) + b"}\n"
+        return envelope + b',"result":' + result + b"}\n"
+
+    async def _handle_request(self, line: bytes, writer) -> None:
+        try:
+            request = self.codec.loads(line)
+        except ValueError as e:
+            writer.write(self._reply(None, error={"code": PARSE_ERROR, "message": f"Parse error: {e}"}))
+            return
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            writer.write(self._reply(request.get("id") if isinstance(request, dict) else None,
+                                     error={"code": INVALID_REQUEST, "message": "Invalid request"}))
+            return
+        method, params = request["method"], request.get("params", {})
+        self.stats['requests'] += 1
+        if method in READ_ONLY_METHODS:
+            result, error = await self._read_only_call(method, params)
+        else:
+            result, error = await self._forward(method, params)
+        if not writer.is_closing():
+            writer.write(self._reply(request.get("id"), result, error))
+
+    async def _handle_client(self, reader, writer) -> None:
+        buffer = LineBuffer()
+        tasks = set()
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer.feed(data)
+                frame = buffer.pop_frame()
+                while frame is not None:
+                    # Requests are served concurrently, their replies written as they are ready.
+                    task = asyncio.ensure_future(self._handle_request(frame.tobytes(), writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    frame = buffer.pop_frame()
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the RPC of lianad to many clients over a few connections.")
+    parser.add_argument("--socket", help="the socket of lianad, optional if only one instance of lianad is running")
+    parser.add_argument("--listen", help=f"the socket to listen on, by default {PROXY_SOCKET_NAME} next to the "
+                                         f"socket of lianad")
+    parser.add_argument("--connections", type=int, default=2, help="number of connections to lianad")
+    parser.add_argument("--max-age", type=float, default=2.0,
+                        help="how long replies to read-only requests are cached, in seconds")
+    parser.add_argument("--height-check-interval", type=float, default=1.0,
+                        help="how often the block height is checked while requests come in, in seconds")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    upstream = find_socket_path(os.path.expanduser(args.socket) if args.socket else None)
+    listen = args.listen or os.path.join(os.path.dirname(upstream), PROXY_SOCKET_NAME)
+    proxy = LianaProxy(upstream, os.path.expanduser(listen), connections=args.connections, max_age=args.max_age,
+                       height_check_interval=args.height_check_interval)
+    try:
+        asyncio.run(proxy.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
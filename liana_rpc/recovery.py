@@ -0,0 +1,180 @@
+"""
+Local planning of recovery transactions.
+
+The coins of a Liana wallet become spendable through a recovery path once they
+have as many confirmations as its timelock, the `N` of its `older(N)`. Since
+coins are received at different heights, `createrecovery` only succeeds for some
+timelocks at a given height, and errors for the other ones. A `RecoveryPlanner`
+computes locally, from the coins and the descriptor of the wallet, which coins
+each recovery path can sweep at the current height, when the other ones will be
+sweepable, and how much a sweep would pay at a given feerate, so that
+`createrecovery` is only called when it can succeed.
+
+The fee is estimated with the weight of an input through the heaviest spending
+path of the descriptor, an upper bound of the one lianad will use.
+"""
+
+import bisect
+import itertools
+import math
+
+from liana_rpc.utils import coin_selection
+
+
+def recovery_timelocks(descriptor: str) -> list:
+    """
+    Return the timelocks of the recovery paths of a descriptor, in blocks, sorted.
+
+    :param descriptor: a wsh() or tr() Liana descriptor
+    """
+    try:
+        node, _ = coin_selection._parse(descriptor.split("#")[0])
+    except (IndexError, TypeError, ValueError):
+        raise coin_selection.SelectionError(f"Cannot parse descriptor: {descriptor}")
+    timelocks, stack = set(), [node]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, tuple):
+            continue
+        name, args = node
+        if name.rpartition(":")[2] == "older":
+            timelocks.add(int(args[0]))
+        else:
+            stack.extend(args)
+    return sorted(timelocks)
+
+
+class RecoveryPlanner(object):
+    """
+    Which confirmed coins of a wallet each recovery path can sweep, and when.
+
+    The coins are sorted by block height once, the sums of their amounts are precomputed, and each query is then a
+    binary search: planning for many timelocks and heights doesn't go over the coins again.
+    """
+
+    def __init__(self, coins: list, block_height: int, descriptor: str = None, timelocks: list = None,
+                 input_weight: int = None):
+        """
+        :param coins: the coins of the wallet, as returned by `list_coins`. Only the confirmed unspent ones can be
+        recovered, the other ones are ignored.
+        :param block_height: the current block height
+        :param descriptor: the descriptor of the wallet, to get the timelocks of the recovery paths and estimate the
+        weight of the inputs
+        :param timelocks: the timelocks of the recovery paths, by default the ones of the descriptor
+        :param input_weight: the weight of an input of the recovery transaction, by default estimated from the
+        descriptor
+        """
+        self.block_height = block_height
+        if timelocks is None:
+            timelocks = recovery_timelocks(descriptor) if descriptor else []
+        self.timelocks = sorted(timelocks)
+        if input_weight is None:
+            input_weight = coin_selection.input_weight(descriptor, primary_path=False) if descriptor \
+                else coin_selection.DEFAULT_INPUT_WEIGHT
+        self.input_weight = input_weight
+
+        self.coins = sorted((c for c in coins if c['block_height'] is not None and not c['spend_info']),
+                            key=lambda c: c['block_height'])
+        self.heights = [c['block_height'] for c in self.coins]
+        # amounts[i] is the sum of the amounts of the first i coins.
+        self.amounts = [0] + list(itertools.accumulate(c['amount'] for c in self.coins))
+
+    def _recoverable_count(self, timelock: int, block_height: int) -> int:
+        # A coin confirmed at height h can be spent with an older(timelock) in the block at height h + timelock.
+        return bisect.bisect_right(self.heights, block_height + 1 - timelock)
+
+    def _timelock(self, timelock: int) -> int:
+        if not timelock:
+            if not self.timelocks:
+                raise ValueError("The descriptor has no recovery path")
+            return self.timelocks[0]
+        return timelock
+
+    def recoverable(self, timelock: int = 0, block_height: int = None) -> list:
+        """
+        :param timelock: the timelock of the recovery path, by default the first one
+        :param block_height: the block height, by default the current one
+
+        return the coins that the recovery path can sweep at this block height, by block height
+        """
+        if block_height is None:
+            block_height = self.block_height
+        return self.coins[:self._recoverable_count(self._timelock(timelock), block_height)]
+
+    def recoverable_at(self, coin: dict, timelock: int = 0) -> int:
+        """
+        return the block height from which the recovery path can sweep this coin
+        """
+        return coin['block_height'] + self._timelock(timelock) - 1
+
+    def fee(self, count: int, feerate: int, address: str = None) -> int:
+        """
+        Estimate the fee of a recovery transaction.
+
+        :param count: the number of coins swept
+        :param feerate: feerate in sats/vbyte
+        :param address: the address swept to, to size its output. A P2WSH address is assumed by default.
+        """
+        output_weight = coin_selection.output_weight(address) if address else coin_selection.CHANGE_OUTPUT_WEIGHT
+        weight = coin_selection.BASE_WEIGHT + count * self.input_weight + output_weight
+        return math.ceil(feerate * weight / 4)
+
+    def plan(self, feerate: int, timelock: int = 0, address: str = None, block_height: int = None) -> dict:
+        """
+        Plan the sweep of a recovery path.
+
+        :param feerate: feerate in sats/vbyte
+        :param timelock: the timelock of the recovery path, by default the first one
+        :param address: the address swept to
+        :param block_height: the block height, by default the current one
+
+        return a dict with the 'timelock', the number of 'coins' that can be swept and their 'amount', the estimated
+        'fee' and 'sweep_amount' that the swept address would receive, whether the sweep is 'possible', and for the
+        coins that can't be swept yet their 'pending_coins' count, 'pending_amount' and the 'next_height' at which
+        the first of them will be
+        """
+        timelock = self._timelock(timelock)
+        if block_height is None:
+            block_height = self.block_height
+        count = self._recoverable_count(timelock, block_height)
+        amount = self.amounts[count]
+        fee = self.fee(count, feerate, address)
+        return {
+            'timelock': timelock,
+            'coins': count,
+            'amount': amount,
+            'fee': fee,
+            'sweep_amount': max(amount - fee, 0),
+            'possible': count > 0 and amount - fee >= coin_selection.DUST,
+            'pending_coins': len(self.coins) - count,
+            'pending_amount': self.amounts[-1] - amount,
+            'next_height': self.recoverable_at(self.coins[count], timelock) if count < len(self.coins) else None,
+        }
+
+    def plans(self, feerate: int, address: str = None, block_height: int = None) -> list:
+        """
+        return the `plan` of each recovery path, by timelock
+        """
+        return [self.plan(feerate, timelock, address, block_height) for timelock in self.timelocks]
+
+    def schedule(self, timelock: int = 0, block_height: int = None) -> list:
+        """
+        List when the coins not recoverable yet will be.
+
+        :param timelock: the timelock of the recovery path, by default the first one
+        :param block_height: the block height, by default the current one
+
+        return a list of `(height, count, amount)` tuples: the block heights at which coins become recoverable, and
+        the number and amount of these coins, by height
+        """
+        timelock = self._timelock(timelock)
+        if block_height is None:
+            block_height = self.block_height
+        schedule = []
+        start = self._recoverable_count(timelock, block_height)
+        while start < len(self.coins):
+            height = self.heights[start]
+            end = bisect.bisect_right(self.heights, height, start)
+            schedule.append((height + timelock - 1, end - start, self.amounts[end] - self.amounts[start]))
+            start = end
+        return schedule
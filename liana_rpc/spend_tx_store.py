@@ -0,0 +1,178 @@
+"""
+An index of the spend transactions stored in lianad.
+
+`list_psbt` returns the base64 PSBT of every spend transaction, tens of
+kilobytes each, which callers keep around even when they only need the txids.
+A `SpendTxStore` lists them as a stream and keeps each PSBT as its raw bytes,
+three quarters of the size of its base64 encoding, indexed by txid. PSBTs are
+only decoded when accessed.
+
+Each PSBT is identified by a hash of its content: on the next `refresh`, the
+PSBTs that did not change are recognized by their hash and skipped, only the
+new or updated ones are decoded to get their txid. A PSBT that cannot be decoded
+has no txid to be indexed by: it is kept aside in `invalid` with its error.
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import threading
+
+from liana_rpc.utils.psbt import DecodeError, decode_psbt, psbt_txid
+from liana_rpc.utils.rpc import RpcError
+
+log = logging.getLogger()
+
+
+def _content_hash(psbt: str) -> bytes:
+    return hashlib.blake2b(psbt.encode(), digest_size=16).digest()
+
+
+class SpendTx(object):
+    """
+    A spend transaction stored in lianad, its PSBT kept as raw bytes.
+    """
+
+    __slots__ = ("txid", "raw", "content_hash", "updated_at")
+
+    def __init__(self, txid: str, raw: bytes, content_hash: bytes, updated_at: int = None):
+        self.txid = txid
+        self.raw = raw
+        self.content_hash = content_hash
+        self.updated_at = updated_at
+
+    @property
+    def psbt(self) -> str:
+        """
+        The Base64-encoded PSBT, as returned by `list_psbt`
+        """
+        return base64.b64encode(self.raw).decode()
+
+    def decode(self, network: str = "main") -> dict:
+        """
+        Decode the PSBT, see `liana_rpc.utils.psbt.decode_psbt`. The result is not kept.
+        """
+        return decode_psbt(self.raw, network)
+
+    def to_dict(self) -> dict:
+        """
+        return the spend transaction as returned by `list_psbt`
+        """
+        ret = {'psbt': self.psbt}
+        if self.updated_at is not None:
+            ret['updated_at'] = self.updated_at
+        return ret
+
+    def __repr__(self):
+        return f"SpendTx({self.txid}, {len(self.raw)} bytes)"
+
+
+class SpendTxStore(object):
+    """
+    The spend transactions stored in lianad, indexed by txid and refreshed incrementally.
+    """
+
+    def __init__(self, liana):
+        """
+        :param liana: the LianaRPC of the wallet
+        """
+        self.liana = liana
+        self.lock = threading.Lock()
+        self.spend_txs = {}
+        # The txids of the stored spend transactions, by hash of their Base64 PSBT.
+        self.hashes = {}
+        # The spend transactions whose PSBT could not be decoded, with the error, by hash of their Base64 PSBT.
+        self._invalid = {}
+
+    def refresh(self):
+        """
+        List the spend transactions stored in lianad, decoding only the ones that are new or changed since the
+        previous refresh.
+
+        return the `{'added': [<txid>], 'updated': [<txid>], 'removed': [<txid>], 'invalid': <count>}` changes,
+        `invalid` being the number of PSBTs that could not be decoded (see `invalid`), or an `{'error': ...}` dict if
+        lianad returned an error
+        """
+        with self.lock:
+            spend_txs, hashes, invalid = {}, {}, {}
+            added, updated = [], []
+            try:
+                for spend in self.liana.rpc.stream('listspendtxs', 'spend_txs'):
+                    content_hash = _content_hash(spend['psbt'])
+                    txid = self.hashes.get(content_hash)
+                    if txid is not None:
+                        spend_tx = self.spend_txs[txid]
+                        spend_tx.updated_at = spend.get('updated_at')
+                    elif content_hash in self._invalid:
+                        invalid[content_hash] = dict(self._invalid[content_hash], updated_at=spend.get('updated_at'))
+                        continue
+                    else:
+                        try:
+                            raw = base64.b64decode(spend['psbt'], validate=True)
+                            txid = psbt_txid(raw)
+                        except (binascii.Error, DecodeError) as e:
+                            log.warning(f"Cannot decode a spend transaction stored in lianad: {e}")
+                            invalid[content_hash] = {'psbt': spend['psbt'], 'updated_at': spend.get('updated_at'),
+                                                     'error': f"Cannot decode psbt: {e}"}
+                            continue
+                        spend_tx = SpendTx(txid, raw, content_hash, spend.get('updated_at'))
+                        (updated if txid in self.spend_txs else added).append(txid)
+                    spend_txs[txid] = spend_tx
+                    hashes[content_hash] = txid
+            except RpcError as e:
+                return {'error': e.error}
+            removed = [txid for txid in self.spend_txs if txid not in spend_txs]
+            self.spend_txs, self.hashes, self._invalid = spend_txs, hashes, invalid
+        return {'added': added, 'updated': updated, 'removed': removed, 'invalid': len(invalid)}
+
+    def __len__(self) -> int:
+        return len(self.spend_txs)
+
+    def __contains__(self, txid: str) -> bool:
+        return txid in self.spend_txs
+
+    def __iter__(self):
+        return iter(list(self.spend_txs.values()))
+
+    @property
+    def txids(self) -> list:
+        return list(self.spend_txs)
+
+    @property
+    def invalid(self) -> list:
+        """
+        The spend transactions listed by lianad whose PSBT could not be decoded, as `{'psbt': <psbt>, 'updated_at':
+        <timestamp>, 'error': <error>}` dicts. They are not indexed, and can't be deleted without their txid.
+        """
+        return list(self._invalid.values())
+
+    def get(self, txid: str):
+        """
+        return the SpendTx with this txid, or None
+        """
+        return self.spend_txs.get(txid)
+
+    def get_many(self, txids: list) -> list:
+        """
+        return the SpendTx of each txid, or None for the unknown ones, in the same order
+        """
+        spend_txs = self.spend_txs
+        return [spend_txs.get(txid) for txid in txids]
+
+    def delete(self, txids: list) -> list:
+        """
+        Delete spend transactions from the database of lianad, in a single round trip.
+
+        :param txids: list of transaction ids in hexadecimal format
+
+        return a list with the result for each txid, in the same order, see `LianaRPC.del_psbts`
+        """
+        rets = self.liana.del_psbts(txids)
+        with self.lock:
+            for txid, ret in zip(txids, rets):
+                if 'error' not in ret.keys():
+                    spend_tx = self.spend_txs.pop(txid, None)
+                    if spend_tx is not None:
+                        self.hashes.pop(spend_tx.content_hash, None)
+        return rets
@@ -0,0 +1,164 @@
+import collections
+import threading
+
+from liana_rpc.utils.psbt import DecodeError, transaction_txid
+
+
+class TxCache(object):
+    """
+    Size-bounded LRU cache of transaction resources (as returned by `listtransactions`), keyed by txid.
+
+    Confirmed transactions don't change, they stay in the cache until evicted. Unconfirmed ones are dropped when
+    the block height moves, since they may have been confirmed since.
+
+    Missing transactions are fetched in chunks of `chunk_size` txids. A txid requested several times, or by
+    several threads at once, is only fetched once.
+    """
+
+    def __init__(self, fetch, get_block_height=None, maxsize: int = 10000, chunk_size: int = 100):
+        """
+        :param fetch: function taking a list of txids and returning the list of their transaction resources, or
+        an `{'error': ...}` dict
+        :param get_block_height: function returning the current block height, called to check whether cached
+        unconfirmed transactions are still valid
+        :param maxsize: maximum number of transactions kept
+        :param chunk_size: maximum number of txids per `fetch` call
+        """
+        self.fetch = fetch
+        self.get_block_height = get_block_height
+        self.maxsize = maxsize
+        self.chunk_size = chunk_size
+        self.block_height = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.unconfirmed = set()
+        # Events of the txids being fetched, set once they are.
+        self.inflight = {}
+
+    def stats(self):
+        """
+        Return the hit/miss counters and the size of the cache.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.unconfirmed.clear()
+
+    def set_block_height(self, height: int):
+        """
+        Record the current block height, dropping the unconfirmed transactions if it moved.
+        """
+        with self.lock:
+            if height == self.block_height:
+                return
+            self.block_height = height
+            for txid in self.unconfirmed:
+                self.entries.pop(txid, None)
+            self.unconfirmed.clear()
+
+    def _store(self, txid: str, tx: dict):
+        """Must be called with the lock."""
+        self.entries[txid] = tx
+        self.entries.move_to_end(txid)
+        if tx.get('height') is None:
+            self.unconfirmed.add(txid)
+        else:
+            self.unconfirmed.discard(txid)
+        while len(self.entries) > self.maxsize:
+            evicted, _ = self.entries.popitem(last=False)
+            self.unconfirmed.discard(evicted)
+            self.evictions += 1
+
+    def _fetch(self, txids: list):
+        """Fetch transactions by chunks, return a dict by txid or an error dict."""
+        fetched = {}
+        for i in range(0, len(txids), self.chunk_size):
+            ret = self.fetch(txids[i:i + self.chunk_size])
+            if type(ret) is not list:
+                return ret
+            for tx in ret:
+                try:
+                    fetched[transaction_txid(tx['tx'])] = tx
+                except DecodeError:
+                    continue
+        return fetched
+
+    def get_many(self, txids: list):
+        """
+        Return the transactions with the given txids, from the cache or from lianad.
+
+        return a dict of transaction resources by txid, without the unknown txids, or an `{'error': ...}` dict
+        """
+        txids = list(dict.fromkeys(txids))
+        with self.lock:
+            # The height must be known before fetching unconfirmed transactions to tell later whether it moved.
+            check_height = self.get_block_height is not None and (
+                self.block_height is None or not self.unconfirmed.isdisjoint(txids))
+        if check_height:
+            height = self.get_block_height()
+            if height is not None:
+                self.set_block_height(height)
+
+        found, missing, waiting = {}, [], {}
+        with self.lock:
+            for txid in txids:
+                if txid in self.entries:
+                    self.entries.move_to_end(txid)
+                    found[txid] = self.entries[txid]
+                    self.hits += 1
+                    continue
+                self.misses += 1
+                if txid in self.inflight:
+                    waiting[txid] = self.inflight[txid]
+                else:
+                    self.inflight[txid] = threading.Event()
+                    missing.append(txid)
+
+        fetched = {}
+        try:
+            fetched = self._fetch(missing) if missing else {}
+        finally:
+            with self.lock:
+                if 'error' not in fetched:
+                    for txid, tx in fetched.items():
+                        self._store(txid, tx)
+                for txid in missing:
+                    self.inflight.pop(txid).set()
+        if 'error' in fetched:
+            return fetched
+        requested = set(missing)
+        found.update((txid, tx) for txid, tx in fetched.items() if txid in requested)
+
+        retry = []
+        for txid, event in waiting.items():
+            event.wait()
+            with self.lock:
+                tx = self.entries.get(txid)
+            if tx is None:
+                # The other fetch failed or the cache already evicted it.
+                retry.append(txid)
+            else:
+                found[txid] = tx
+        if retry:
+            fetched = self._fetch(retry)
+            if 'error' in fetched:
+                return fetched
+            found.update(fetched)
+
+        return {txid: found[txid] for txid in txids if txid in found}
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+from liana_rpc.utils.codec import get_codec
+from liana_rpc.utils.rpc import LineBuffer, RpcError, parse_response
+
+READ_SIZE = 65536
+
+
+class AsyncUnixDomainSocketRpc(object):
+    """An asyncio JSON-RPC client to lianad over its Unix socket.
+
+    Each request gets its own id and is written as soon as it is made, without
+    waiting for the replies to the previous ones. A background task reads the
+    replies and hands each of them to the coroutine waiting for its id, so any
+    number of coroutines can share the connection.
+    """
+
+    codec = get_codec()
+
+    def __init__(self, socket_path, logger=None, codec=None):
+        self.socket_path = socket_path
+        if not logger:
+            self.logger = logging.getLogger()
+        else:
+            self.logger = logger
+        if codec is not None:
+            self.codec = codec
+        self.next_id = 0
+        self.reader = None
+        self.writer = None
+        self._reader_task = None
+        self._connect_lock = None
+        # Futures of the requests waiting for a reply, by request id.
+        self._pending = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self) -> None:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self.reader, self.writer = await asyncio.open_unix_connection(self.socket_path)
+            self._reader_task = asyncio.ensure_future(self._read_loop(self.reader))
+
+    async def _read_loop(self, reader) -> None:
+        buffer = LineBuffer()
+        error = ConnectionError("Connection closed by lianad")
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer.feed(data)
+                frame = buffer.pop_frame()
+                while frame is not None:
+                    self._dispatch(self.codec.loads(frame))
+                    frame = buffer.pop_frame()
+        except asyncio.CancelledError:
+            error = ConnectionError("Connection closed")
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self._fail_pending(error)
+
+    def _dispatch(self, resp) -> None:
+        resp_id = resp.get("id") if isinstance(resp, dict) else None
+        fut = self._pending.pop(resp_id, None)
+        if fut is None:
+            self.logger.warning(f"Received a response to no pending request: {resp}")
+        elif not fut.done():
+            fut.set_result(resp)
+
+    def _fail_pending(self, error: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(error)
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    def __getattr__(self, name):
+        """Intercept any call that is not explicitly defined and call @call."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def wrapper(*args, **kwargs):
+            if len(args) != 0 and len(kwargs) != 0:
+                raise RpcError(
+                    name, {}, "Cannot mix positional and non-positional arguments"
+                )
+            return await self.call(name, params=args or kwargs)
+
+        return wrapper
+
+    async def call(self, method, params={}):
+        if not self.connected:
+            await self.connect()
+        self.logger.debug(f"Calling {method} with params {params}")
+
+        this_id = self.next_id
+        self.next_id += 1
+        chunks = self.codec.encode_request(this_id, method, params)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[this_id] = fut
+        try:
+            self.writer.writelines(chunks)
+            await self.writer.drain()
+            resp = await fut
+        finally:
+            self._pending.pop(this_id, None)
+
+        self.logger.debug(f"Received response for {method} call: {resp}")
+        return parse_response(resp, this_id)
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+            self._reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
@@ -0,0 +1,142 @@
+"""
+JSON encoding of the requests to lianad and decoding of its replies.
+
+The fastest JSON library installed is used: orjson, then ujson, then the
+standard library. Whatever the library, requests are encoded as a list of
+chunks to be written with a single scatter-gather write:
+
+ - the constant part of the envelope of each method is encoded once,
+ - large string params that don't contain anything JSON escapes, e.g. base64
+   PSBTs, are put in as they are, instead of being escaped into a new string
+   by the JSON library and concatenated with the rest.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# String params at least this long are sent without going through the JSON library.
+RAW_STRING_SIZE = 1024
+# Caching the envelope of any method name would let a caller grow the cache
+# without bound, lianad has much fewer methods than this.
+MAX_ENVELOPES = 256
+
+# The characters JSON strings can hold as they are.
+_UNESCAPED = bytes(c for c in range(0x20, 0x7f) if c not in b'"\\')
+
+
+def _raw_string(value: str):
+    """Return value encoded as bytes if it needs no escaping in JSON, None otherwise."""
+    if not value.isascii():
+        return None
+    data = value.encode("ascii")
+    return data if not data.translate(None, _UNESCAPED) else None
+
+
+class Codec(object):
+    """Encodes requests and decodes replies with the standard library."""
+
+    name = "json"
+
+    def __init__(self):
+        self._envelopes = {}
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def loads(self, data):
+        """Decode a JSON document from bytes or a memoryview."""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def _envelope(self, method: str) -> bytes:
+        envelope = self._envelopes.get(method)
+        if envelope is None:
+            envelope = b'{"jsonrpc":"2.0","method":' + self.dumps(method) + b',"params":'
+            if len(self._envelopes) < MAX_ENVELOPES:
+                self._envelopes[method] = envelope
+        return envelope
+
+    def _encode_params(self, params, chunks: list) -> None:
+        if isinstance(params, dict):
+            raw = {}
+            for key, value in params.items():
+                if isinstance(value, str) and len(value) >= RAW_STRING_SIZE:
+                    data = _raw_string(value)
+                    if data is not None:
+                        raw[key] = data
+            if raw:
+                # Encode the small params as usual and append the large ones.
+                rest = {key: value for key, value in params.items() if key not in raw}
+                chunks.append(self.dumps(rest)[:-1])
+                sep = b"," if rest else b""
+                for key, data in raw.items():
+                    chunks.append(sep + self.dumps(key) + b':"')
+                    chunks.append(data)
+                    chunks.append(b'"')
+                    sep = b","
+                chunks.append(b"}")
+                return
+        chunks.append(self.dumps(params))
+
+    def encode_request(self, this_id: int, method: str, params) -> list:
+        """
+        return the '\\n'-terminated JSON-RPC request as a list of bytes chunks
+        """
+        chunks = [self._envelope(method)]
+        self._encode_params(params, chunks)
+        chunks.append(b',"id":%d}\n' % this_id)
+        return chunks
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(Codec):
+    name = "ujson"
+
+    def dumps(self, obj) -> bytes:
+        return ujson.dumps(obj, escape_forward_slashes=False).encode()
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return ujson.loads(data)
+
+
+CODECS = {
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+    "json": Codec,
+}
+
+
+def get_codec(name: str = None) -> Codec:
+    """
+    Return a codec using the given JSON library, or the fastest one installed.
+
+    :param name: "orjson", "ujson" or "json"
+    """
+    if name is None:
+        name = "orjson" if orjson is not None else "ujson" if ujson is not None else "json"
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name}, expected one of {', '.join(CODECS)}")
+    if (name == "orjson" and orjson is None) or (name == "ujson" and ujson is None):
+        raise ValueError(f"{name} is not installed")
+    return CODECS[name]()
@@ -0,0 +1,444 @@
+"""
+Coin selection for Spend transactions.
+
+Coins are the resources returned by `listcoins`. A selection is first searched
+for with branch-and-bound, which only accepts sets of coins paying the outputs
+and the fees without a change output. If there is none, or the search ran out of
+time, the knapsack solver picks a set of coins leaving a change output, and
+largest-first is used when no time is left at all.
+
+Amounts are in satoshis, weights in weight units and feerates in sats/vbyte, as
+for `createspend`. The weight of an input depends on the wallet descriptor and
+is estimated from its miniscript policy with `input_weight`.
+"""
+
+import math
+import random
+import time
+
+# Weight of the transaction fields other than the inputs and the outputs:
+# version, locktime, input and output counts, and the segwit marker and flag.
+BASE_WEIGHT = (4 + 4 + 1 + 1) * 4 + 2
+# Weight of a P2WSH (or P2TR) change output.
+CHANGE_OUTPUT_WEIGHT = (8 + 1 + 34) * 4
+# Weight of an input spending a 2-of-3 P2WSH multisig, used when the descriptor is unknown.
+DEFAULT_INPUT_WEIGHT = (36 + 1 + 4) * 4 + 1 + 1 + 73 * 2 + 1 + 105
+# lianad doesn't create change outputs below this amount.
+DUST = 5000
+
+MAX_TRIES = 100000
+TIME_BUDGET = 0.5
+KNAPSACK_ITERATIONS = 1000
+
+
+class SelectionError(ValueError):
+    pass
+
+
+def _varint_size(n: int) -> int:
+    return 1 if n < 0xFD else 3 if n <= 0xFFFF else 5
+
+
+def _push_num_size(n: int) -> int:
+    """Size of the minimal push of a script number."""
+    if n <= 16:
+        return 1
+    return 1 + (n.bit_length() + 8) // 8
+
+
+def script_pubkey_size(address: str) -> int:
+    """
+    Return the size of the scriptPubKey paying to the given address.
+    """
+    if "1" in address and address.lower().startswith(("bc1", "tb1", "bcrt1")):
+        # Witness version, then the program: 5 bits per character, without the version and the checksum.
+        data = address[address.rindex("1") + 1:]
+        return 2 + (len(data) - 7) * 5 // 8
+    if address[:1] in ("1", "m", "n"):
+        return 25
+    return 23
+
+
+def output_weight(address: str) -> int:
+    spk_size = script_pubkey_size(address)
+    return (8 + _varint_size(spk_size) + spk_size) * 4
+
+
+# Miniscript input weight estimation.
+
+
+def _parse(desc: str, i: int = 0):
+    """Parse a descriptor into nested (name, [args]) tuples, keys and numbers being plain strings."""
+    if desc[i] == "{":
+        left, i = _parse(desc, i + 1)
+        right, i = _parse(desc, i + 1)
+        return ("{", [left, right]), i + 1
+    j = i
+    while j < len(desc) and desc[j] not in "(),{}":
+        j += 1
+    name = desc[i:j]
+    if j == len(desc) or desc[j] != "(":
+        return name, j
+    args = []
+    j += 1
+    while True:
+        arg, j = _parse(desc, j)
+        args.append(arg)
+        if desc[j] == ")":
+            return (name, args), j + 1
+        j += 1
+
+
+def _add(*sizes):
+    return None if None in sizes else sum(sizes)
+
+
+def _max(*sizes):
+    sizes = [s for s in sizes if s is not None]
+    return max(sizes) if sizes else None
+
+
+def _fragment_sizes(node, tap: bool, primary_path: bool):
+    """
+    Return the script size, the maximum satisfaction size and the maximum dissatisfaction size of a miniscript
+    fragment. The (dis)satisfaction sizes count the length prefix of each witness element, and are None if there
+    is no such (dis)satisfaction.
+    """
+    key = 33 if tap else 34
+    sig = 66 if tap else 73
+    name, args = node if isinstance(node, tuple) else (node, [])
+    wrappers, _, name = name.rpartition(":")
+    if name == "pk":
+        wrappers, name = wrappers + "c", "pk_k"
+    elif name == "pkh":
+        wrappers, name = wrappers + "c", "pk_h"
+
+    if name == "0":
+        sizes = (1, None, 0)
+    elif name == "1":
+        sizes = (1, 0, None)
+    elif name == "pk_k":
+        sizes = (key, sig, 1)
+    elif name == "pk_h":
+        sizes = (24, sig + 34, 1 + 34)
+    elif name in ("older", "after"):
+        sizes = (_push_num_size(int(args[0])) + 1, None if primary_path else 0, None)
+    elif name in ("sha256", "hash256"):
+        sizes = (39, 33, 33)
+    elif name in ("ripemd160", "hash160"):
+        sizes = (27, 33, 33)
+    elif name == "multi":
+        k, n = int(args[0]), len(args) - 1
+        sizes = (_push_num_size(k) + 34 * n + _push_num_size(n) + 1, 1 + k * sig, 1 + k)
+    elif name == "multi_a":
+        k, n = int(args[0]), len(args) - 1
+        sizes = (34 * n + _push_num_size(k) + 1, k * sig + (n - k), n)
+    elif name == "thresh":
+        k = int(args[0])
+        subs = [_fragment_sizes(a, tap, primary_path) for a in args[1:]]
+        if len([s for s in subs if s[1] is not None]) < k:
+            sat = None
+        else:
+            sat = sum(_max(s[1], s[2]) or 0 for s in subs)
+        sizes = (sum(s[0] for s in subs) + len(subs) - 1 + _push_num_size(k) + 1, sat, _add(*(s[2] for s in subs)))
+    else:
+        subs = [_fragment_sizes(a, tap, primary_path) for a in args]
+        if name == "and_n":
+            name, subs = "andor", subs + [(1, None, 0)]
+        if name == "and_v":
+            (x, sx, _), (y, sy, _) = subs
+            sizes = (x + y, _add(sx, sy), None)
+        elif name == "and_b":
+            (x, sx, dx), (y, sy, dy) = subs
+            sizes = (x + y + 1, _add(sx, sy), _add(dx, dy))
+        elif name == "andor":
+            (x, sx, dx), (y, sy, _), (z, sz, dz) = subs
+            sizes = (x + y + z + 3, _max(_add(sx, sy), _add(dx, sz)), _add(dx, dz))
+        elif name == "or_b":
+            (x, sx, dx), (z, sz, dz) = subs
+            sizes = (x + z + 1, _max(_add(sx, dz), _add(dx, sz)), _add(dx, dz))
+        elif name == "or_c":
+            (x, sx, dx), (z, sz, _) = subs
+            sizes = (x + z + 2, _max(sx, _add(dx, sz)), None)
+        elif name == "or_d":
+            (x, sx, dx), (z, sz, dz) = subs
+            sizes = (x + z + 3, _max(sx, _add(dx, sz)), _add(dx, dz))
+        elif name == "or_i":
+            (x, sx, dx), (z, sz, dz) = subs
+            sizes = (x + z + 3, _max(_add(sx, 2), _add(sz, 1)), _max(_add(dx, 2), _add(dz, 1)))
+        else:
+            raise SelectionError(f"Unsupported miniscript fragment: {name}")
+
+    script, sat, dissat = sizes
+    for i, wrapper in enumerate(reversed(wrappers)):
+        if wrapper == "a":
+            script += 2
+        elif wrapper in ("s", "n"):
+            script += 1
+        elif wrapper == "c":
+            script += 1
+        elif wrapper == "d":
+            script, sat, dissat = script + 3, _add(sat, 2), 1
+        elif wrapper == "v":
+            # The VERIFY is merged into the last opcode of CHECKSIG, CHECKMULTISIG, EQUAL...
+            merged = (i > 0 and wrappers[-i] == "c") or (i == 0 and name in ("multi", "multi_a", "thresh",
+                                                                              "sha256", "hash256",
+                                                                              "ripemd160", "hash160"))
+            script, dissat = script + (0 if merged else 1), None
+        elif wrapper == "j":
+            script, dissat = script + 4, 1
+        elif wrapper == "t":
+            script, dissat = script + 1, None
+        elif wrapper == "l":
+            script, sat, dissat = script + 4, _add(sat, 1), _max(_add(dissat, 1), 2)
+        elif wrapper == "u":
+            script, sat, dissat = script + 4, _add(sat, 2), _max(_add(dissat, 2), 1)
+        else:
+            raise SelectionError(f"Unsupported miniscript wrapper: {wrapper}")
+    return script, sat, dissat
+
+
+def _tap_leaves(node, depth=0):
+    if isinstance(node, tuple) and node[0] == "{":
+        for child in node[1]:
+            yield from _tap_leaves(child, depth + 1)
+    else:
+        yield node, depth
+
+
+def _input_weight(node, primary_path: bool) -> int:
+    non_witness = 36 + 1 + 4
+    if node[0] == "sh":
+        # P2SH-wrapped segwit: the scriptSig pushes the witness program.
+        node = node[1][0]
+        non_witness += 23 if node[0] == "wpkh" else 35
+    name, args = node
+    if name == "wpkh":
+        witness = 1 + 73 + 34
+    elif name == "wsh":
+        script, sat, _ = _fragment_sizes(args[0], False, primary_path)
+        witness = None if sat is None else 1 + sat + _varint_size(script) + script
+    elif name == "tr":
+        # Key path spend, or script path spend of the heaviest leaf.
+        witness = 1 + 66 if len(args) == 1 else None
+        for leaf, depth in _tap_leaves(args[1]) if len(args) > 1 else ():
+            script, sat, _ = _fragment_sizes(leaf, True, primary_path)
+            if sat is not None:
+                control_block = 33 + 32 * depth
+                witness = _max(witness, 1 + sat + _varint_size(script) + script + 1 + control_block)
+    else:
+        raise SelectionError(f"Unsupported descriptor type: {name}")
+    if witness is None:
+        raise SelectionError("The descriptor has no spending path")
+    return non_witness * 4 + witness
+
+
+def input_weight(descriptor: str, primary_path: bool = True) -> int:
+    """
+    Estimate the maximum weight of an input spending a coin of the given descriptor.
+
+    :param descriptor: a wsh() or tr() Liana descriptor, or a wpkh() descriptor
+    :param primary_path: only consider the spending paths without timelocks, as for `createspend`. Set it to
+    False to estimate the weight of a recovery input.
+    """
+    try:
+        node, _ = _parse(descriptor.split("#")[0])
+        return _input_weight(node, primary_path)
+    except SelectionError:
+        raise
+    except (IndexError, TypeError, ValueError):
+        raise SelectionError(f"Cannot parse descriptor: {descriptor}")
+
+
+# Selection algorithms. They work on effective values, i.e. the amounts minus the fee to spend them, sorted in
+# decreasing order, and return the indexes of the selected values or None.
+
+
+def branch_and_bound(values: list, target: int, cost_of_change: int, waste_per_input: int = 0,
+                     max_tries: int = MAX_TRIES, deadline: float = None):
+    """
+    Search the set of values summing between target and target + cost_of_change with the least waste, i.e. the
+    excess over target plus waste_per_input for each value.
+    """
+    available = sum(values)
+    if available < target:
+        return None
+    selection = []
+    value = waste = 0
+    best, best_waste = None, math.inf
+    index = 0
+    for tries in range(max_tries):
+        if not tries & 0xFFF and deadline is not None and time.monotonic() > deadline:
+            break
+        backtrack = False
+        if value + available < target or value > target + cost_of_change or (
+                waste > best_waste and waste_per_input > 0):
+            backtrack = True
+        elif value >= target:
+            backtrack = True
+            if waste + value - target <= best_waste:
+                best, best_waste = list(selection), waste + value - target
+                if best_waste == 0:
+                    break
+        if backtrack:
+            if not selection:
+                break
+            # Give back the values skipped since the last included one, then try without it.
+            index -= 1
+            while index > selection[-1]:
+                available += values[index]
+                index -= 1
+            value -= values[index]
+            waste -= waste_per_input
+            selection.pop()
+        else:
+            available -= values[index]
+            # Excluding a value equal to the previous excluded one would explore the same sums again.
+            if not selection or index - 1 == selection[-1] or values[index] != values[index - 1]:
+                selection.append(index)
+                value += values[index]
+                waste += waste_per_input
+        index += 1
+    return best
+
+
+def _approximate_best_subset(values: list, total: int, target: int, iterations: int, deadline: float, rng):
+    best, best_value = range(len(values)), total
+    for it in range(iterations):
+        if best_value == target or (it and time.monotonic() > deadline):
+            break
+        # The selected indexes, as a list only ever appended to and as flags for the second pass.
+        chosen, included = [], [False] * len(values)
+        value = 0
+        # An improvement is recorded as a length of chosen and an index, the list is copied once at the end.
+        improved, reached = None, False
+        for npass in range(2):
+            if reached:
+                break
+            for i, v in enumerate(values):
+                # The first pass picks values at random, the second one tries the values left out.
+                if (rng.random() < 0.5 if npass == 0 else not included[i]):
+                    if value + v >= target:
+                        reached = True
+                        if value + v < best_value:
+                            improved, best_value = (len(chosen), i), value + v
+                    else:
+                        value += v
+                        chosen.append(i)
+                        included[i] = True
+        if improved is not None:
+            best = chosen[:improved[0]] + [improved[1]]
+    return list(best), best_value
+
+
+def knapsack(values: list, target: int, min_change: int, iterations: int = KNAPSACK_ITERATIONS,
+             deadline: float = None, rng=None):
+    """
+    Select values summing to target, or to at least target + min_change, using a stochastic approximation of the
+    smallest such sum.
+    """
+    if deadline is None:
+        deadline = math.inf
+    rng = rng or random.Random()
+    lower, lower_indexes, lowest_larger = [], [], None
+    for i, v in enumerate(values):
+        if v == target:
+            return [i]
+        if v < target + min_change:
+            lower.append(v)
+            lower_indexes.append(i)
+        elif lowest_larger is None or v < values[lowest_larger]:
+            lowest_larger = i
+
+    total_lower = sum(lower)
+    if total_lower == target:
+        return lower_indexes
+    if total_lower < target:
+        return None if lowest_larger is None else [lowest_larger]
+
+    best, best_value = _approximate_best_subset(lower, total_lower, target, iterations, deadline, rng)
+    if best_value != target and total_lower >= target + min_change:
+        best, best_value = _approximate_best_subset(lower, total_lower, target + min_change, iterations, deadline,
+                                                    rng)
+    # A single larger value is better than a set leaving too little change, or than a larger set.
+    if lowest_larger is not None and (
+            (best_value != target and best_value < target + min_change) or values[lowest_larger] <= best_value):
+        return [lowest_larger]
+    return [lower_indexes[i] for i in best]
+
+
+def largest_first(values: list, target: int):
+    """
+    Select the largest values until they sum to at least target.
+    """
+    total = 0
+    for i, v in enumerate(values):
+        total += v
+        if total >= target:
+            return list(range(i + 1))
+    return None
+
+
+def select_coins(coins: list, outputs: dict, feerate: int, input_weight: int = DEFAULT_INPUT_WEIGHT,
+                 change_weight: int = CHANGE_OUTPUT_WEIGHT, long_term_feerate: int = None, dust: int = DUST,
+                 time_budget: float = TIME_BUDGET, max_tries: int = MAX_TRIES, rng=None):
+    """
+    Choose coins to pay the outputs at the given feerate.
+
+    :param coins: the coins to choose from, as returned by `listcoins`
+    :param outputs: dict of outputs in the form of {<address>:<amount>, <address>:<amount>,}
+    :param feerate: feerate in sats/VBytes
+    :param input_weight: weight of an input spending one of the coins, see `input_weight`
+    :param change_weight: weight of the change output
+    :param long_term_feerate: feerate at which a change output would be spent later, defaults to feerate
+    :param dust: minimum amount of a change output
+    :param time_budget: time in seconds after which the search for a changeless selection is given up
+    :param max_tries: maximum number of steps of the search for a changeless selection
+    :param rng: random.Random instance used by the knapsack solver
+
+    return a dict with the selected 'coins', their 'outpoints', the 'algorithm' used, and the estimated 'fee' and
+    'change' amount. Raise SelectionError if the coins can't pay for the outputs.
+    """
+    deadline = time.monotonic() + time_budget
+    if long_term_feerate is None:
+        long_term_feerate = feerate
+    input_fee = math.ceil(feerate * input_weight / 4)
+    change_fee = math.ceil(feerate * change_weight / 4)
+    outputs_weight = BASE_WEIGHT + sum(output_weight(address) for address in outputs)
+    target = sum(outputs.values()) + math.ceil(feerate * outputs_weight / 4)
+    cost_of_change = change_fee + math.ceil(long_term_feerate * input_weight / 4)
+
+    pool = sorted((c for c in coins if c['amount'] > input_fee and not c.get('is_immature')),
+                  key=lambda c: c['amount'], reverse=True)
+    values = [c['amount'] - input_fee for c in pool]
+    if sum(values) < target:
+        raise SelectionError(f"Insufficient funds: {sum(values)} sats available after fees, {target} needed")
+
+    # Values above the changeless window can't be part of a changeless selection.
+    first = 0
+    while first < len(values) and values[first] > target + cost_of_change:
+        first += 1
+    waste_per_input = input_fee - math.ceil(long_term_feerate * input_weight / 4)
+    selected = branch_and_bound(values[first:], target, cost_of_change, waste_per_input, max_tries, deadline)
+    if selected is not None:
+        algorithm, selected = 'bnb', [first + i for i in selected]
+    elif time.monotonic() < deadline:
+        algorithm = 'knapsack'
+        selected = knapsack(values, target + change_fee, dust, deadline=deadline, rng=rng)
+    else:
+        algorithm = 'largest_first'
+        selected = largest_first(values, target + change_fee + dust) or largest_first(values, target)
+
+    chosen = [pool[i] for i in selected]
+    amount = sum(c['amount'] for c in chosen)
+    weight = outputs_weight + input_weight * len(chosen)
+    change = amount - sum(outputs.values()) - math.ceil(feerate * (weight + change_weight) / 4)
+    if change < dust:
+        change = 0
+    return {
+        'coins': chosen,
+        'outpoints': [c['outpoint'] for c in chosen],
+        'algorithm': algorithm,
+        'fee': amount - sum(outputs.values()) - change,
+        'change': change,
+    }
@@ -0,0 +1,188 @@
+"""
+Discovery of the running lianad instances and of their RPC socket.
+
+On Linux the processes are found by reading /proc directly. For each lianad the
+configuration file passed with `--conf` is read to find its data directory and
+network, and so its `<data_dir>/<network>/lianad_rpc` socket, which must accept
+connections. Results are cached per PID so that, as long as no process started
+or exited, a lookup only costs a listing of /proc.
+"""
+
+import os
+import re
+import socket
+import stat
+import subprocess
+import threading
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+PROC = "/proc"
+SOCKET_NAME = "lianad_rpc"
+DEFAULT_NETWORK = "bitcoin"
+CONNECT_TIMEOUT = 0.5
+
+
+def _read_config(path: str) -> dict:
+    """Return the `data_dir` and `network` set in a lianad configuration file."""
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except OSError:
+        return {}
+    if tomllib is not None:
+        try:
+            config = tomllib.loads(content.decode())
+            return {
+                "data_dir": config.get("data_dir"),
+                "network": config.get("bitcoin_config", {}).get("network"),
+            }
+        except (ValueError, UnicodeDecodeError):
+            return {}
+    text = content.decode(errors="replace")
+    data_dir = re.search(r'^\s*data_dir\s*=\s*"([^"]*)"', text, re.M)
+    network = re.search(r'^\s*network\s*=\s*"([^"]*)"', text, re.M)
+    return {
+        "data_dir": data_dir.group(1) if data_dir else None,
+        "network": network.group(1) if network else None,
+    }
+
+
+def _conf_arg(argv: list):
+    for i, arg in enumerate(argv):
+        if arg == "--conf" and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith("--conf="):
+            return arg[len("--conf="):]
+    return None
+
+
+def socket_from_cmdline(argv: list, cwd: str = None):
+    """
+    Return the path to the RPC socket of a lianad started with the given arguments, or None if it can't be
+    worked out.
+
+    :param argv: the command line of the lianad process
+    :param cwd: the working directory of the process, to resolve a relative configuration path
+    """
+    conf = _conf_arg(argv)
+    if conf is None:
+        return None
+    if cwd is not None:
+        conf = os.path.join(cwd, os.path.expanduser(conf))
+    config = _read_config(conf)
+    if config.get("data_dir"):
+        data_dir = os.path.expanduser(config["data_dir"])
+        if cwd is not None:
+            data_dir = os.path.join(cwd, data_dir)
+        return os.path.join(data_dir, config.get("network") or DEFAULT_NETWORK, SOCKET_NAME)
+    # The configuration is usually in the network directory, next to the socket.
+    return os.path.join(os.path.dirname(conf), SOCKET_NAME)
+
+
+def is_socket_alive(path: str, timeout: float = CONNECT_TIMEOUT) -> bool:
+    """Check that path is a Unix socket accepting connections."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return False
+    except OSError:
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class LianadDiscovery(object):
+    """
+    Finds the sockets of the running lianad instances, caching the results per PID.
+    """
+
+    def __init__(self, proc: str = PROC, check_connect: bool = True):
+        self.proc = proc
+        self.check_connect = check_connect
+        self.lock = threading.Lock()
+        # The socket of each PID we looked at, None for processes that are not a lianad.
+        self.known = {}
+        self.pids = None
+        self.sockets = []
+
+    def _process_socket(self, pid: str):
+        try:
+            with open(os.path.join(self.proc, pid, "cmdline"), "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            return None
+        argv = [arg.decode(errors="replace") for arg in cmdline.split(b"\0") if arg]
+        if not argv or os.path.basename(argv[0]) != "lianad":
+            return None
+        try:
+            cwd = os.readlink(os.path.join(self.proc, pid, "cwd"))
+        except OSError:
+            cwd = None
+        return socket_from_cmdline(argv, cwd)
+
+    def _discover_ps(self) -> list:
+        # No /proc, e.g. on MacOS.
+        try:
+            result = subprocess.run(["ps", "-axo", "args="], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True)
+        except OSError:
+            return []
+        sockets = []
+        for line in result.stdout.splitlines():
+            argv = line.split()
+            if argv and os.path.basename(argv[0]) == "lianad":
+                path = socket_from_cmdline(argv)
+                if path is not None:
+                    sockets.append(path)
+        return sockets
+
+    def find(self, refresh: bool = False) -> list:
+        """
+        Return the RPC socket paths of the running lianad instances.
+
+        :param refresh: ignore the cached results
+        """
+        if not os.path.isdir(self.proc):
+            sockets = self._discover_ps()
+        else:
+            pids = frozenset(d for d in os.listdir(self.proc) if d.isdigit())
+            with self.lock:
+                if pids == self.pids and not refresh:
+                    return list(self.sockets)
+                if refresh:
+                    self.known = {}
+                self.known = {pid: self.known[pid] if pid in self.known else self._process_socket(pid)
+                              for pid in pids}
+                sockets = [path for path in self.known.values() if path is not None]
+
+        sockets = list(dict.fromkeys(sockets))
+        alive = sockets
+        if self.check_connect:
+            alive = [path for path in sockets if is_socket_alive(path)]
+        # Don't cache a lianad whose socket is not up yet, it may be starting.
+        if os.path.isdir(self.proc) and len(alive) == len(sockets):
+            with self.lock:
+                self.pids, self.sockets = pids, alive
+        return list(alive)
+
+
+_discovery = LianadDiscovery()
+
+
+def find_lianad_sockets(refresh: bool = False) -> list:
+    """
+    Return the RPC socket paths of the running lianad instances.
+
+    :param refresh: ignore the results cached from previous calls
+    """
+    return _discovery.find(refresh)
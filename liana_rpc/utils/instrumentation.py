@@ -0,0 +1,199 @@
+"""
+Instrumentation of the calls to lianad.
+
+An `Instrumentation` attached to a UnixDomainSocketRpc (or a pool of them)
+records, for each JSON-RPC method, histograms of the phases of its calls:
+
+ - encode: serializing the request,
+ - send: writing it to the socket,
+ - first_byte: from the end of the write to the first byte of the reply,
+ - parse: decoding the reply,
+ - total: from the start of the call to its reply,
+
+along with the size of the requests and replies and the number of reads a reply
+took. Clients without an instrumentation don't measure anything.
+"""
+
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))
+COUNT_BUCKETS = tuple(2 ** i for i in range(11))
+
+PHASES = ("encode", "send", "first_byte", "parse", "total")
+
+
+class Histogram(object):
+    """A histogram over fixed buckets, as Prometheus' ones."""
+
+    def __init__(self, buckets: tuple):
+        self.bounds = buckets
+        # One more bucket for the values above the last bound.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Return the upper bound of the bucket holding the q-quantile, or None if nothing was observed."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class CallStats(object):
+    """The measures of a call, handed to the post-call hooks. Durations are in seconds, None if the call did not
+    reach the phase."""
+
+    __slots__ = ("method", "started_at", "sent_at", "encode", "send", "first_byte", "parse", "total",
+                 "request_bytes", "response_bytes", "recv_calls", "error")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.started_at = time.perf_counter()
+        self.sent_at = None
+        self.encode = None
+        self.send = None
+        self.first_byte = None
+        self.parse = None
+        self.total = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.recv_calls = 0
+        self.error = False
+
+
+class MethodStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.phases = {phase: Histogram(LATENCY_BUCKETS) for phase in PHASES}
+        self.request_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.recv_calls = Histogram(COUNT_BUCKETS)
+
+    def record(self, stats: CallStats) -> None:
+        self.calls += 1
+        if stats.error:
+            self.errors += 1
+        for phase, histogram in self.phases.items():
+            value = getattr(stats, phase)
+            if value is not None:
+                histogram.observe(value)
+        self.request_bytes.observe(stats.request_bytes)
+        if stats.response_bytes:
+            self.response_bytes.observe(stats.response_bytes)
+            self.recv_calls.observe(stats.recv_calls)
+
+
+class Instrumentation(object):
+    """
+    Per-method statistics of the calls to lianad, and hooks run around each of them.
+
+    Pre-call hooks are called with the method and the params of each call, post-call hooks with its `CallStats`,
+    including for calls that failed. Hooks run in the calling thread, they should be fast.
+    """
+
+    def __init__(self, pre_hooks: list = None, post_hooks: list = None):
+        self.pre_hooks = list(pre_hooks or [])
+        self.post_hooks = list(post_hooks or [])
+        self.lock = threading.Lock()
+        self.methods = {}
+
+    def add_pre_hook(self, hook) -> None:
+        self.pre_hooks.append(hook)
+
+    def add_post_hook(self, hook) -> None:
+        self.post_hooks.append(hook)
+
+    def before_call(self, method: str, params) -> None:
+        for hook in self.pre_hooks:
+            hook(method, params)
+
+    def record(self, stats: CallStats) -> None:
+        with self.lock:
+            if stats.method not in self.methods:
+                self.methods[stats.method] = MethodStats()
+            self.methods[stats.method].record(stats)
+        for hook in self.post_hooks:
+            hook(stats)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.methods = {}
+
+    def snapshot(self) -> dict:
+        """
+        return the statistics of each method, as a dict by method
+        """
+        with self.lock:
+            return {
+                method: {
+                    'calls': s.calls,
+                    'errors': s.errors,
+                    'phases': {phase: h.snapshot() for phase, h in s.phases.items()},
+                    'request_bytes': s.request_bytes.snapshot(),
+                    'response_bytes': s.response_bytes.snapshot(),
+                    'recv_calls': s.recv_calls.snapshot(),
+                }
+                for method, s in self.methods.items()
+            }
+
+    def to_prometheus(self, prefix: str = "liana_rpc") -> str:
+        """
+        return the statistics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for labels, h in series:
+                for bound, count in h['buckets']:
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{prefix}_{name}_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"{prefix}_{name}_sum{{{labels}}} {h['sum']}")
+                lines.append(f"{prefix}_{name}_count{{{labels}}} {h['count']}")
+
+        histogram("phase_seconds", "Time spent in each phase of the calls to lianad.",
+                  [(f'method="{m}",phase="{p}"', s['phases'][p]) for m, s in snapshot.items() for p in PHASES])
+        histogram("request_bytes", "Size of the requests to lianad.",
+                  [(f'method="{m}"', s['request_bytes']) for m, s in snapshot.items()])
+        histogram("response_bytes", "Size of the replies of lianad.",
+                  [(f'method="{m}"', s['response_bytes']) for m, s in snapshot.items()])
+        histogram("recv_calls", "Number of socket reads per reply of lianad.",
+                  [(f'method="{m}"', s['recv_calls']) for m, s in snapshot.items()])
+        for name, key, help_text in (("calls_total", 'calls', "Calls to lianad."),
+                                     ("errors_total", 'errors', "Calls to lianad that failed or returned an error.")):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for m, s in snapshot.items():
+                lines.append(f'{prefix}_{name}{{method="{m}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
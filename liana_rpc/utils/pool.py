@@ -0,0 +1,189 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+from liana_rpc.utils.retry import MAX_RETRIES, CircuitBreaker
+from liana_rpc.utils.rpc import TIMEOUT, UnixDomainSocketRpc
+
+
+class UnixDomainSocketRpcPool(object):
+    """A thread-safe pool of connections to lianad.
+
+    lianad answers the requests received on a connection one after the other,
+    so concurrent calls sharing a connection wait in line. The pool hands each
+    caller its own connection instead:
+
+     - connections are opened lazily, up to `size` of them,
+     - a connection idle for more than `health_check_interval` seconds is
+       checked before being handed out and replaced if lianad closed it,
+     - connections idle for more than `idle_timeout` seconds are closed,
+     - when all connections are in use, `checkout` waits up to
+       `checkout_timeout` seconds for one to be returned.
+
+    It exposes the same `call` and `call_many` methods as `UnixDomainSocketRpc`.
+    All its connections share the `instrumentation`, if set, and the circuit
+    `breaker`, so that once lianad looks down calls fail fast on all of them.
+    The `timeout`, `timeouts`, `max_retries` and `codec` are those of each
+    connection.
+    """
+
+    def __init__(self, socket_path, size: int = 4, logger=None, checkout_timeout: float = TIMEOUT,
+                 idle_timeout: float = 60, health_check_interval: float = 5, instrumentation=None,
+                 timeout: float = TIMEOUT, timeouts: dict = None, max_retries: int = MAX_RETRIES, breaker=None,
+                 codec=None):
+        self.socket_path = socket_path
+        self.size = size
+        if not logger:
+            self.logger = logging.getLogger()
+        else:
+            self.logger = logger
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.instrumentation = instrumentation
+        self.timeout = timeout
+        self.timeouts = timeouts
+        self.max_retries = max_retries
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.codec = codec
+
+        # Idle connections along with the time they were returned, most recently
+        # returned last.
+        self._idle = collections.deque()
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        if size < 1:
+            raise ValueError("The pool size must be at least 1")
+
+    def __del__(self):
+        self.close()
+
+    def _evict_idle(self, now: float) -> list:
+        """Pop the connections idle for too long. Must be called with the lock."""
+        evicted = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            evicted.append(self._idle.popleft()[0])
+            self._created -= 1
+        if evicted:
+            self._cond.notify(len(evicted))
+        return evicted
+
+    def _connect(self) -> UnixDomainSocketRpc:
+        try:
+            self.breaker.check()
+            try:
+                return UnixDomainSocketRpc(self.socket_path, logger=self.logger, instrumentation=self.instrumentation,
+                                           timeout=self.timeout, timeouts=self.timeouts,
+                                           max_retries=self.max_retries, breaker=self.breaker,
+                                           codec=self.codec)
+            except OSError:
+                self.breaker.record_failure()
+                raise
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def checkout(self, timeout: float = None) -> UnixDomainSocketRpc:
+        """Take a connection out of the pool. It must be given back with `checkin`.
+
+        :param timeout: how long to wait for a connection if they are all in use,
+        defaults to `checkout_timeout`.
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ConnectionError("The connection pool is closed")
+                now = time.monotonic()
+                evicted = self._evict_idle(now)
+                if self._idle:
+                    rpc, last_used = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    rpc, last_used = None, now
+                    break
+                if now >= deadline:
+                    raise TimeoutError(f"No connection to {self.socket_path} available after {timeout}s")
+                self._cond.wait(deadline - now)
+        for conn in evicted:
+            conn.close()
+
+        if rpc is None:
+            return self._connect()
+        if now - last_used > self.health_check_interval and not self._is_healthy(rpc):
+            self.logger.debug(f"Replacing broken connection to {self.socket_path}")
+            rpc.close()
+            return self._connect()
+        rpc.instrumentation = self.instrumentation
+        return rpc
+
+    def checkin(self, rpc: UnixDomainSocketRpc, discard: bool = False) -> None:
+        """Give a connection back to the pool.
+
+        :param discard: close the connection instead of reusing it, e.g. because
+        a call failed on it and its state is unknown.
+        """
+        with self._cond:
+            if discard or self._closed:
+                self._created -= 1
+                evicted = [rpc]
+            else:
+                now = time.monotonic()
+                self._idle.append((rpc, now))
+                evicted = self._evict_idle(now)
+            self._cond.notify()
+        for conn in evicted:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self, timeout: float = None):
+        """Context manager checking out a connection and returning it on exit.
+        The connection is discarded if an exception is raised."""
+        rpc = self.checkout(timeout)
+        try:
+            yield rpc
+        except BaseException:
+            self.checkin(rpc, discard=True)
+            raise
+        self.checkin(rpc)
+
+    @staticmethod
+    def _is_healthy(rpc: UnixDomainSocketRpc) -> bool:
+        return rpc.sock is not None and len(rpc.recv_buffer) == 0 and rpc.sock.is_alive()
+
+    def call(self, method, params={}, timeout: float = None):
+        with self.connection() as rpc:
+            return rpc.call(method, params, timeout)
+
+    def call_many(self, calls, timeout: float = None) -> list:
+        with self.connection() as rpc:
+            return rpc.call_many(calls, timeout)
+
+    def stream(self, method: str, key: str, params={}, timeout: float = None, filter=None):
+        """See `UnixDomainSocketRpc.stream`. A connection of the pool is held
+        for the duration of the iteration, bounding the concurrent streams."""
+        rpc = self.checkout()
+        try:
+            yield from rpc.stream(method, key, params, timeout, filter)
+        finally:
+            self.checkin(rpc)
+
+    def close(self) -> None:
+        """Close the idle connections, the ones in use are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = [rpc for rpc, _ in self._idle]
+            self._created -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for rpc in idle:
+            rpc.close()
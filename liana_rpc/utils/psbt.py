@@ -0,0 +1,599 @@
+"""
+In-process decoding of Bitcoin transactions and BIP-174 PSBTs.
+
+The decoded objects have the same shape as the output of bitcoind's
+`decoderawtransaction` and `decodepsbt` RPCs. Parsing works on memoryview slices
+of the serialized data: nothing is copied until it is rendered as hex, and the
+txid is computed by hashing slices of the original serialization.
+"""
+
+import base64
+import binascii
+import functools
+import hashlib
+import operator
+import struct
+
+PSBT_MAGIC = b"psbt\xff"
+
+# Human readable part of segwit addresses, and base58 version bytes of P2PKH
+# and P2SH addresses, per network.
+NETWORKS = {
+    "main": ("bc", 0x00, 0x05),
+    "testnet": ("tb", 0x6F, 0xC4),
+    "signet": ("tb", 0x6F, 0xC4),
+    "regtest": ("bcrt", 0x6F, 0xC4),
+}
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class ByteReader(object):
+    """Reads Bitcoin-serialized fields from a buffer without copying it."""
+
+    def __init__(self, data):
+        self.view = memoryview(data).cast("B")
+        self.pos = 0
+
+    def remaining(self) -> int:
+        return len(self.view) - self.pos
+
+    def read(self, n: int) -> memoryview:
+        if n > self.remaining():
+            raise DecodeError(f"Unexpected end of data, {n} bytes wanted at {self.pos}")
+        chunk = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+    def read_u8(self) -> int:
+        return self.read(1)[0]
+
+    def read_u32(self) -> int:
+        return struct.unpack_from("<I", self.read(4))[0]
+
+    def read_i32(self) -> int:
+        return struct.unpack_from("<i", self.read(4))[0]
+
+    def read_u64(self) -> int:
+        return struct.unpack_from("<Q", self.read(8))[0]
+
+    def read_compact_size(self) -> int:
+        n = self.read_u8()
+        if n == 0xFD:
+            return struct.unpack_from("<H", self.read(2))[0]
+        elif n == 0xFE:
+            return self.read_u32()
+        elif n == 0xFF:
+            return self.read_u64()
+        return n
+
+    def read_var_bytes(self) -> memoryview:
+        return self.read(self.read_compact_size())
+
+
+def sha256d(*chunks) -> bytes:
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk)
+    return hashlib.sha256(h.digest()).digest()
+
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def base58check_encode(payload) -> str:
+    data = bytes(payload) + sha256d(payload)[:4]
+    n = int.from_bytes(data, "big")
+    out = []
+    while n > 0:
+        n, r = divmod(n, 58)
+        out.append(BASE58_ALPHABET[r])
+    pad = len(data) - len(data.lstrip(b"\x00"))
+    return "1" * pad + "".join(reversed(out))
+
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2BC830A3
+
+
+BECH32_GENERATOR = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+# The generator terms to xor in for each value of the top 5 bits of the checksum.
+BECH32_GENERATOR_TABLE = [
+    functools.reduce(operator.xor, (g for i, g in enumerate(BECH32_GENERATOR) if (b >> i) & 1), 0)
+    for b in range(32)
+]
+
+
+def _bech32_polymod(values) -> int:
+    chk = 1
+    for v in values:
+        chk = ((chk & 0x1FFFFFF) << 5 ^ v) ^ BECH32_GENERATOR_TABLE[chk >> 25]
+    return chk
+
+
+def _convert_bits(data, frombits: int, tobits: int) -> list:
+    acc, bits, ret = 0, 0, []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            ret.append((acc >> bits) & maxv)
+    if bits:
+        ret.append((acc << (tobits - bits)) & maxv)
+    return ret
+
+
+def segwit_address(hrp: str, version: int, program) -> str:
+    """Encode a witness program as a bech32 (v0) or bech32m (v1+) address."""
+    return _segwit_address(hrp, version, bytes(program))
+
+
+@functools.lru_cache(maxsize=4096)
+def _segwit_address(hrp: str, version: int, program: bytes) -> str:
+    # Wallets reuse the same scripts a lot, hence the cache.
+    data = [version] + _convert_bits(program, 8, 5)
+    const = BECH32_CONST if version == 0 else BECH32M_CONST
+    values = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp] + data
+    polymod = _bech32_polymod(values + [0] * 6) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(BECH32_CHARSET[d] for d in data + checksum)
+
+
+OP_0 = 0x00
+OP_PUSHDATA1 = 0x4C
+OP_PUSHDATA2 = 0x4D
+OP_PUSHDATA4 = 0x4E
+OP_1NEGATE = 0x4F
+OP_1 = 0x51
+OP_16 = 0x60
+OP_RETURN = 0x6A
+OP_DUP = 0x76
+OP_EQUAL = 0x87
+OP_EQUALVERIFY = 0x88
+OP_HASH160 = 0xA9
+OP_CHECKSIG = 0xAC
+OP_CHECKMULTISIG = 0xAE
+
+OPCODE_NAMES = {
+    OP_0: "0", OP_PUSHDATA1: "OP_PUSHDATA1", OP_PUSHDATA2: "OP_PUSHDATA2", OP_PUSHDATA4: "OP_PUSHDATA4",
+    OP_1NEGATE: "-1", 0x50: "OP_RESERVED",
+    0x61: "OP_NOP", 0x62: "OP_VER", 0x63: "OP_IF", 0x64: "OP_NOTIF", 0x65: "OP_VERIF", 0x66: "OP_VERNOTIF",
+    0x67: "OP_ELSE", 0x68: "OP_ENDIF", 0x69: "OP_VERIFY", OP_RETURN: "OP_RETURN",
+    0x6B: "OP_TOALTSTACK", 0x6C: "OP_FROMALTSTACK", 0x6D: "OP_2DROP", 0x6E: "OP_2DUP", 0x6F: "OP_3DUP",
+    0x70: "OP_2OVER", 0x71: "OP_2ROT", 0x72: "OP_2SWAP", 0x73: "OP_IFDUP", 0x74: "OP_DEPTH", 0x75: "OP_DROP",
+    OP_DUP: "OP_DUP", 0x77: "OP_NIP", 0x78: "OP_OVER", 0x79: "OP_PICK", 0x7A: "OP_ROLL", 0x7B: "OP_ROT",
+    0x7C: "OP_SWAP", 0x7D: "OP_TUCK",
+    0x7E: "OP_CAT", 0x7F: "OP_SUBSTR", 0x80: "OP_LEFT", 0x81: "OP_RIGHT", 0x82: "OP_SIZE",
+    0x83: "OP_INVERT", 0x84: "OP_AND", 0x85: "OP_OR", 0x86: "OP_XOR", OP_EQUAL: "OP_EQUAL",
+    OP_EQUALVERIFY: "OP_EQUALVERIFY", 0x89: "OP_RESERVED1", 0x8A: "OP_RESERVED2",
+    0x8B: "OP_1ADD", 0x8C: "OP_1SUB", 0x8D: "OP_2MUL", 0x8E: "OP_2DIV", 0x8F: "OP_NEGATE", 0x90: "OP_ABS",
+    0x91: "OP_NOT", 0x92: "OP_0NOTEQUAL", 0x93: "OP_ADD", 0x94: "OP_SUB", 0x95: "OP_MUL", 0x96: "OP_DIV",
+    0x97: "OP_MOD", 0x98: "OP_LSHIFT", 0x99: "OP_RSHIFT", 0x9A: "OP_BOOLAND", 0x9B: "OP_BOOLOR",
+    0x9C: "OP_NUMEQUAL", 0x9D: "OP_NUMEQUALVERIFY", 0x9E: "OP_NUMNOTEQUAL", 0x9F: "OP_LESSTHAN",
+    0xA0: "OP_GREATERTHAN", 0xA1: "OP_LESSTHANOREQUAL", 0xA2: "OP_GREATERTHANOREQUAL", 0xA3: "OP_MIN",
+    0xA4: "OP_MAX", 0xA5: "OP_WITHIN",
+    0xA6: "OP_RIPEMD160", 0xA7: "OP_SHA1", 0xA8: "OP_SHA256", OP_HASH160: "OP_HASH160", 0xAA: "OP_HASH256",
+    0xAB: "OP_CODESEPARATOR", OP_CHECKSIG: "OP_CHECKSIG", 0xAD: "OP_CHECKSIGVERIFY",
+    OP_CHECKMULTISIG: "OP_CHECKMULTISIG", 0xAF: "OP_CHECKMULTISIGVERIFY",
+    0xB0: "OP_NOP1", 0xB1: "OP_CHECKLOCKTIMEVERIFY", 0xB2: "OP_CHECKSEQUENCEVERIFY", 0xB3: "OP_NOP4",
+    0xB4: "OP_NOP5", 0xB5: "OP_NOP6", 0xB6: "OP_NOP7", 0xB7: "OP_NOP8", 0xB8: "OP_NOP9", 0xB9: "OP_NOP10",
+    0xBA: "OP_CHECKSIGADD",
+}
+for _n in range(1, 17):
+    OPCODE_NAMES[OP_1 + _n - 1] = str(_n)
+
+
+def iter_script(script):
+    """Yield the (opcode, push data or None) of a script.
+
+    Raises DecodeError if a push goes past the end of the script.
+    """
+    reader = ByteReader(script)
+    while reader.remaining():
+        op = reader.read_u8()
+        if op < OP_PUSHDATA1:
+            yield op, reader.read(op)
+        elif op == OP_PUSHDATA1:
+            yield op, reader.read(reader.read_u8())
+        elif op == OP_PUSHDATA2:
+            yield op, reader.read(struct.unpack_from("<H", reader.read(2))[0])
+        elif op == OP_PUSHDATA4:
+            yield op, reader.read(reader.read_u32())
+        else:
+            yield op, None
+
+
+def script_to_asm(script) -> str:
+    """Disassemble a script the way bitcoind does."""
+    out = []
+    try:
+        for op, data in iter_script(script):
+            if data is None:
+                out.append(OPCODE_NAMES.get(op, "OP_UNKNOWN"))
+            elif not data:
+                # OP_0, or an empty OP_PUSHDATA.
+                out.append("0")
+            elif len(data) <= 4:
+                # Short pushes are shown as numbers.
+                n = int.from_bytes(data, "little")
+                if data[-1] & 0x80:
+                    n = -(n & ~(0x80 << (8 * (len(data) - 1))))
+                out.append(str(n))
+            else:
+                out.append(data.hex())
+    except DecodeError:
+        out.append("[error]")
+    return " ".join(out)
+
+
+def script_type(script) -> str:
+    """Classify a script like bitcoind's `scriptPubKey.type`."""
+    s = bytes(script)
+    n = len(s)
+    if n == 25 and s[:3] == bytes([OP_DUP, OP_HASH160, 20]) and s[23:] == bytes([OP_EQUALVERIFY, OP_CHECKSIG]):
+        return "pubkeyhash"
+    if n == 23 and s[:2] == bytes([OP_HASH160, 20]) and s[22] == OP_EQUAL:
+        return "scripthash"
+    if n >= 4 and s[0] in (OP_0,) + tuple(range(OP_1, OP_16 + 1)) and s[1] == n - 2 and 2 <= n - 2 <= 40:
+        version = 0 if s[0] == OP_0 else s[0] - OP_1 + 1
+        if version == 0 and n == 22:
+            return "witness_v0_keyhash"
+        if version == 0 and n == 34:
+            return "witness_v0_scripthash"
+        if version == 1 and n == 34:
+            return "witness_v1_taproot"
+        if version != 0:
+            return "witness_unknown"
+    if n in (35, 67) and s[0] == n - 2 and s[-1] == OP_CHECKSIG:
+        return "pubkey"
+    if n > 0 and s[0] == OP_RETURN:
+        return "nulldata"
+    if n > 0 and s[-1] == OP_CHECKMULTISIG and OP_1 <= s[0] <= OP_16 and OP_1 <= s[-2] <= OP_16:
+        return "multisig"
+    return "nonstandard"
+
+
+def script_address(script, kind: str, network: str = "main"):
+    """Return the address of a standard output script, or None."""
+    hrp, p2pkh, p2sh = NETWORKS[network]
+    s = memoryview(script)
+    if kind == "pubkeyhash":
+        return base58check_encode(bytes([p2pkh]) + s[3:23])
+    if kind == "scripthash":
+        return base58check_encode(bytes([p2sh]) + s[2:22])
+    if kind.startswith("witness_"):
+        version = 0 if s[0] == OP_0 else s[0] - OP_1 + 1
+        return segwit_address(hrp, version, s[2:])
+    return None
+
+
+def decode_script_pubkey(script, network: str = "main") -> dict:
+    kind = script_type(script)
+    out = {
+        "asm": script_to_asm(script),
+        "hex": script.hex(),
+    }
+    address = script_address(script, kind, network)
+    if address is not None:
+        out["address"] = address
+    out["type"] = kind
+    return out
+
+
+def decode_script(script) -> dict:
+    return {
+        "asm": script_to_asm(script),
+        "hex": script.hex(),
+        "type": script_type(script),
+    }
+
+
+def sats_to_btc(amount: int) -> float:
+    return amount / 100_000_000
+
+
+def _read_transaction(reader: ByteReader, network: str, allow_witness: bool = True) -> dict:
+    start = reader.pos
+    version = reader.read_i32()
+    segwit = False
+    # A segwit transaction has a 0x00 marker where the input count would be.
+    if allow_witness and reader.remaining() >= 2 and reader.view[reader.pos] == 0 and reader.view[reader.pos + 1] == 1:
+        segwit = True
+        reader.read(2)
+    body_start = reader.pos
+
+    vin = []
+    for _ in range(reader.read_compact_size()):
+        prev_txid = reader.read(32)
+        prev_vout = reader.read_u32()
+        script_sig = reader.read_var_bytes()
+        sequence = reader.read_u32()
+        if prev_vout == 0xFFFFFFFF and not any(prev_txid):
+            vin.append({"coinbase": script_sig.hex(), "sequence": sequence})
+        else:
+            vin.append({
+                "txid": prev_txid[::-1].hex(),
+                "vout": prev_vout,
+                "scriptSig": {"asm": script_to_asm(script_sig), "hex": script_sig.hex()},
+                "sequence": sequence,
+            })
+
+    vout = []
+    for n in range(reader.read_compact_size()):
+        value = reader.read_u64()
+        script = reader.read_var_bytes()
+        vout.append({
+            "value": sats_to_btc(value),
+            "n": n,
+            "scriptPubKey": decode_script_pubkey(script, network),
+        })
+    body_end = reader.pos
+
+    if segwit:
+        for txin in vin:
+            witness = [reader.read_var_bytes().hex() for _ in range(reader.read_compact_size())]
+            if witness:
+                txin["txinwitness"] = witness
+        # Keep the same key order as bitcoind.
+        for txin in vin:
+            if "txinwitness" in txin:
+                txin["sequence"] = txin.pop("sequence")
+    witness_end = reader.pos
+    locktime = reader.read_u32()
+
+    view = reader.view
+    if segwit:
+        txid = sha256d(view[start:start + 4], view[body_start:body_end], view[witness_end:reader.pos])
+    else:
+        txid = sha256d(view[start:reader.pos])
+    wtxid = sha256d(view[start:reader.pos])
+    size = reader.pos - start
+    base_size = size - (body_start - start - 4) - (witness_end - body_end)
+    weight = base_size * 3 + size
+
+    return {
+        "txid": txid[::-1].hex(),
+        "hash": wtxid[::-1].hex(),
+        "version": version,
+        "size": size,
+        "vsize": (weight + 3) // 4,
+        "weight": weight,
+        "locktime": locktime,
+        "vin": vin,
+        "vout": vout,
+    }
+
+
+def _as_bytes(data, encoding: str):
+    if isinstance(data, str):
+        try:
+            if encoding == "hex":
+                return bytes.fromhex(data.strip())
+            return base64.b64decode(data.strip(), validate=True)
+        except (ValueError, binascii.Error) as e:
+            raise DecodeError(f"Invalid {encoding} encoding: {e}")
+    return data
+
+
+def decode_transaction(rawtx, network: str = "main") -> dict:
+    """
+    Decode a serialized transaction, as bitcoind's `decoderawtransaction`.
+
+    :param rawtx: the transaction, hex encoded or as bytes-like object
+    :param network: one of 'main', 'testnet', 'signet', 'regtest', used for addresses
+    """
+    reader = ByteReader(_as_bytes(rawtx, "hex"))
+    tx = _read_transaction(reader, network)
+    if reader.remaining():
+        raise DecodeError(f"{reader.remaining()} trailing bytes after the transaction")
+    return tx
+
+
+def transaction_txid(rawtx) -> str:
+    """
+    Return the txid of a serialized transaction, hex encoded or as bytes-like object.
+
+    Only the structure of the transaction is walked to find the parts to hash.
+    """
+    reader = ByteReader(_as_bytes(rawtx, "hex"))
+    view = reader.view
+    reader.read(4)
+    segwit = reader.remaining() >= 2 and view[4] == 0 and view[5] == 1
+    if segwit:
+        reader.read(2)
+    body_start = reader.pos
+    n_inputs = reader.read_compact_size()
+    for _ in range(n_inputs):
+        reader.read(36)
+        reader.read_var_bytes()
+        reader.read(4)
+    for _ in range(reader.read_compact_size()):
+        reader.read(8)
+        reader.read_var_bytes()
+    body_end = reader.pos
+    if segwit:
+        for _ in range(n_inputs):
+            for _ in range(reader.read_compact_size()):
+                reader.read_var_bytes()
+    witness_end = reader.pos
+    reader.read(4)
+    if reader.remaining():
+        raise DecodeError(f"{reader.remaining()} trailing bytes after the transaction")
+    txid = sha256d(view[:4], view[body_start:body_end], view[witness_end:])
+    return txid[::-1].hex()
+
+
+def _read_map(reader: ByteReader):
+    """Yield the (key type, key data, value) of a PSBT map, up to its separator."""
+    while True:
+        key = reader.read_var_bytes()
+        if len(key) == 0:
+            return
+        value = reader.read_var_bytes()
+        yield key[0], key[1:], value
+
+
+def _keypath(value) -> dict:
+    path = ["m"]
+    for i in range(4, len(value), 4):
+        index = struct.unpack_from("<I", value, i)[0]
+        path.append(str(index & 0x7FFFFFFF) + ("'" if index & 0x80000000 else ""))
+    return {"master_fingerprint": value[:4].hex(), "path": "/".join(path)}
+
+
+def _witness_stack(value) -> list:
+    reader = ByteReader(value)
+    return [reader.read_var_bytes().hex() for _ in range(reader.read_compact_size())]
+
+
+SIGHASH_TYPES = {
+    0x00: "DEFAULT", 0x01: "ALL", 0x02: "NONE", 0x03: "SINGLE",
+    0x81: "ALL|ANYONECANPAY", 0x82: "NONE|ANYONECANPAY", 0x83: "SINGLE|ANYONECANPAY",
+}
+
+
+def _decode_input(reader: ByteReader, network: str) -> dict:
+    out = {}
+    unknown = {}
+    for key_type, key_data, value in _read_map(reader):
+        if key_type == 0x00:
+            out["non_witness_utxo"] = decode_transaction(value, network)
+        elif key_type == 0x01:
+            utxo = ByteReader(value)
+            amount = utxo.read_u64()
+            out["witness_utxo"] = {
+                "amount": sats_to_btc(amount),
+                "scriptPubKey": decode_script_pubkey(utxo.read_var_bytes(), network),
+            }
+        elif key_type == 0x02:
+            out.setdefault("partial_signatures", {})[key_data.hex()] = value.hex()
+        elif key_type == 0x03:
+            sighash = struct.unpack_from("<I", value)[0]
+            out["sighash"] = SIGHASH_TYPES.get(sighash, str(sighash))
+        elif key_type == 0x04:
+            out["redeem_script"] = decode_script(value)
+        elif key_type == 0x05:
+            out["witness_script"] = decode_script(value)
+        elif key_type == 0x06:
+            out.setdefault("bip32_derivs", []).append({"pubkey": key_data.hex(), **_keypath(value)})
+        elif key_type == 0x07:
+            out["final_scriptSig"] = {"asm": script_to_asm(value), "hex": value.hex()}
+        elif key_type == 0x08:
+            out["final_scriptwitness"] = _witness_stack(value)
+        elif key_type == 0x13:
+            out["taproot_key_path_sig"] = value.hex()
+        elif key_type == 0x17:
+            out["taproot_internal_key"] = value.hex()
+        elif key_type == 0x18:
+            out["taproot_merkle_root"] = value.hex()
+        else:
+            unknown[bytes([key_type]).hex() + key_data.hex()] = value.hex()
+    if unknown:
+        out["unknown"] = unknown
+    return out
+
+
+def _decode_output(reader: ByteReader) -> dict:
+    out = {}
+    unknown = {}
+    for key_type, key_data, value in _read_map(reader):
+        if key_type == 0x00:
+            out["redeem_script"] = decode_script(value)
+        elif key_type == 0x01:
+            out["witness_script"] = decode_script(value)
+        elif key_type == 0x02:
+            out.setdefault("bip32_derivs", []).append({"pubkey": key_data.hex(), **_keypath(value)})
+        elif key_type == 0x05:
+            out["taproot_internal_key"] = value.hex()
+        else:
+            unknown[bytes([key_type]).hex() + key_data.hex()] = value.hex()
+    if unknown:
+        out["unknown"] = unknown
+    return out
+
+
+def _input_amount(psbt_input: dict, prevout: dict):
+    if "witness_utxo" in psbt_input:
+        return round(psbt_input["witness_utxo"]["amount"] * 100_000_000)
+    if "non_witness_utxo" in psbt_input:
+        outputs = psbt_input["non_witness_utxo"]["vout"]
+        if prevout["vout"] >= len(outputs):
+            raise DecodeError(f"Output {prevout['vout']} of the non-witness UTXO does not exist")
+        return round(outputs[prevout["vout"]]["value"] * 100_000_000)
+    return None
+
+
+def _read_psbt_header(reader: ByteReader) -> None:
+    if reader.remaining() < len(PSBT_MAGIC) or reader.read(len(PSBT_MAGIC)) != PSBT_MAGIC:
+        raise DecodeError("Invalid PSBT magic bytes")
+
+
+def decode_psbt(psbt, network: str = "main") -> dict:
+    """
+    Decode a BIP-174 PSBT, as bitcoind's `decodepsbt`.
+
+    :param psbt: the PSBT, base64 encoded or as bytes-like object
+    :param network: one of 'main', 'testnet', 'signet', 'regtest', used for addresses
+    """
+    reader = ByteReader(_as_bytes(psbt, "base64"))
+    _read_psbt_header(reader)
+
+    tx = None
+    version = 0
+    global_xpubs = []
+    proprietary = []
+    unknown = {}
+    for key_type, key_data, value in _read_map(reader):
+        if key_type == 0x00:
+            tx_reader = ByteReader(value)
+            tx = _read_transaction(tx_reader, network, allow_witness=False)
+        elif key_type == 0x01:
+            global_xpubs.append({"xpub": base58check_encode(key_data), **_keypath(value)})
+        elif key_type == 0xFB:
+            version = struct.unpack_from("<I", value)[0]
+        elif key_type == 0xFC:
+            proprietary.append({"key": key_data.hex(), "value": value.hex()})
+        else:
+            unknown[bytes([key_type]).hex() + key_data.hex()] = value.hex()
+    if tx is None:
+        raise DecodeError("The PSBT has no unsigned transaction")
+
+    inputs = [_decode_input(reader, network) for _ in tx["vin"]]
+    outputs = [_decode_output(reader) for _ in tx["vout"]]
+    if reader.remaining():
+        raise DecodeError(f"{reader.remaining()} trailing bytes after the PSBT")
+
+    out = {
+        "tx": tx,
+        "global_xpubs": global_xpubs,
+        "psbt_version": version,
+        "proprietary": proprietary,
+        "unknown": unknown,
+        "inputs": inputs,
+        "outputs": outputs,
+    }
+    amounts = [_input_amount(i, prevout) for i, prevout in zip(inputs, tx["vin"])]
+    if None not in amounts:
+        spent = sum(amounts)
+        created = sum(round(o["value"] * 100_000_000) for o in tx["vout"])
+        out["fee"] = sats_to_btc(spent - created)
+    return out
+
+
+def psbt_txid(psbt) -> str:
+    """
+    Return the txid of the transaction of a PSBT, base64 encoded or as bytes-like object.
+
+    Only the unsigned transaction is read: its serialization is hashed in place.
+    """
+    reader = ByteReader(_as_bytes(psbt, "base64"))
+    _read_psbt_header(reader)
+    for key_type, _, value in _read_map(reader):
+        if key_type == 0x00:
+            return sha256d(value)[::-1].hex()
+    raise DecodeError("The PSBT has no unsigned transaction")
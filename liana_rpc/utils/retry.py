@@ -0,0 +1,93 @@
+"""
+Retries and circuit breaking of the calls to lianad.
+
+Only the methods of IDEMPOTENT_METHODS, which can be sent twice without harm, are
+retried after a connection failure, waiting an exponentially growing, randomly
+jittered delay between attempts. A CircuitBreaker shared by the connections to
+a lianad makes the calls fail fast once it looks down, instead of each of them
+waiting for its own connection attempt or timeout.
+"""
+
+import random
+import threading
+import time
+
+IDEMPOTENT_METHODS = frozenset([
+    "getinfo",
+    "listcoins",
+    "listspendtxs",
+    "listconfirmed",
+    "listtransactions",
+    "updatespend",
+    "delspendtx",
+])
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.05
+BACKOFF_MAX = 2.0
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """
+    Return the time to wait before the given retry (counted from 0), with "full jitter": a random delay up to an
+    exponentially growing bound, so that clients retrying at once spread out.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Tracks the consecutive connection failures to lianad.
+
+    The circuit is closed while calls succeed. After `failure_threshold` consecutive failures it opens: calls are
+    refused with a CircuitOpenError for `reset_timeout` seconds. It is then half-open: calls go through again, the
+    first success closes it and a failure opens it for another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return self.CLOSED
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return self.OPEN
+            return self.HALF_OPEN
+
+    def check(self) -> None:
+        """
+        Raise a CircuitOpenError if the circuit is open.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        if remaining > 0:
+            raise CircuitOpenError(f"lianad looks down after {self.failures} failed calls, "
+                                   f"not trying again for {remaining:.1f}s")
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # Also restarts the wait of a half-open circuit whose trial failed.
+                self.opened_at = time.monotonic()
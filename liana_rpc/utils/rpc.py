@@ -1,9 +1,28 @@
-import json
 import logging
 import os
+import select
 import socket
+import threading
+import time
+
+from liana_rpc.utils.codec import get_codec
+from liana_rpc.utils.instrumentation import CallStats
+from liana_rpc.utils.retry import IDEMPOTENT_METHODS, MAX_RETRIES, backoff_delay
+from liana_rpc.utils.stream import READ_SIZE, iter_result_array
 
 TIMEOUT = 20
+# Deadlines of the calls expected to be much faster or slower than TIMEOUT.
+METHOD_TIMEOUTS = {
+    "getinfo": 5,
+    "startrescan": 120,
+    "createrecovery": 120,
+}
+# Payloads up to this size fit in the socket buffer, larger ones are sent by a
+# helper thread while replies are read, lest lianad blocks on its replies and
+# stops reading our requests.
+INLINE_SEND_SIZE = 65536
+# Most systems don't accept more buffers in a single sendmsg.
+MAX_IOV = 1024
 
 """
 These classes have been taken from the test framework of Liana:
@@ -24,6 +43,25 @@ class RpcError(ValueError):
         self.error = error
 
 
+def parse_response(resp, this_id):
+    """Check a JSON-RPC response to the request `this_id` and return its result,
+    or `{'error': <error object>}` if lianad returned an error."""
+    if not isinstance(resp, dict):
+        raise ValueError(
+            f"Malformed response, response is not a dictionary: {resp}"
+        )
+    if "id" in resp and resp["id"] != this_id:
+        raise ValueError(
+            "Malformed response, id is not {}: {}.".format(this_id, resp)
+        )
+
+    if "error" in resp:
+        return {'error': resp['error']}
+    elif "result" not in resp:
+        raise ValueError('Malformed response, "result" missing.')
+    return resp["result"]
+
+
 class UnixSocket(object):
     """A wrapper for socket.socket that is specialized to unix sockets.
 
@@ -37,16 +75,17 @@ class UnixSocket(object):
 
     """
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, timeout: float = TIMEOUT):
         self.path = path
+        self.timeout = timeout
         self.sock = None
         self.connect()
 
     def connect(self) -> None:
         try:
             self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
             self.sock.connect(self.path)
-            self.sock.settimeout(TIMEOUT)
         except OSError as e:
             self.close()
 
@@ -64,15 +103,28 @@ class UnixSocket(object):
                 # Open an fd to our home directory, that we can then find
                 # through `/proc/self/fd` and access the contents.
                 dirfd = os.open(dirname, os.O_DIRECTORY | os.O_RDONLY)
-                short_path = "/proc/self/fd/%d/%s" % (dirfd, basename)
-                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                self.sock.connect(short_path)
+                try:
+                    short_path = "/proc/self/fd/%d/%s" % (dirfd, basename)
+                    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self.sock.settimeout(self.timeout)
+                    self.sock.connect(short_path)
+                finally:
+                    os.close(dirfd)
             else:
                 # There is no good way to recover from this.
                 raise
 
+    def shutdown(self) -> None:
+        """Wake up a thread blocked reading from the socket, without closing it."""
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
     def close(self) -> None:
         if self.sock is not None:
+            self.shutdown()
             self.sock.close()
         self.sock = None
 
@@ -82,44 +134,259 @@ class UnixSocket(object):
 
         self.sock.sendall(b)
 
+    def sendmsg_all(self, chunks: list) -> None:
+        """Send the concatenation of chunks, without concatenating them."""
+        if self.sock is None:
+            raise socket.error("not connected")
+
+        if len(chunks) == 1:
+            self.sock.sendall(chunks[0])
+            return
+        views = [memoryview(chunk) for chunk in chunks]
+        i = 0
+        while i < len(views):
+            sent = self.sock.sendmsg(views[i:i + MAX_IOV])
+            # Skip the fully sent chunks and trim the partially sent one.
+            while i < len(views) and sent >= len(views[i]):
+                sent -= len(views[i])
+                i += 1
+            if sent:
+                views[i] = views[i][sent:]
+
     def recv(self, length: int) -> bytes:
         if self.sock is None:
             raise socket.error("not connected")
 
         return self.sock.recv(length)
 
+    def recv_into(self, buffer, nbytes: int = 0) -> int:
+        if self.sock is None:
+            raise socket.error("not connected")
+
+        return self.sock.recv_into(buffer, nbytes)
+
+    def wait_readable(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for data (or the end of the stream) to read."""
+        if self.sock is None:
+            raise socket.error("not connected")
+
+        return bool(select.select([self.sock], [], [], max(timeout, 0))[0])
+
+    def is_alive(self) -> bool:
+        """Check without blocking that the peer did not close the connection
+        and did not send unsolicited data."""
+        if self.sock is None:
+            return False
+        try:
+            # Either the connection was closed or there is data nobody asked for.
+            self.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+            return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
     def __del__(self) -> None:
         self.close()
 
 
+class LineBuffer(object):
+    """A receive buffer that splits a byte stream into '\\n'-terminated frames.
+
+    lianad terminates each of its replies with a '\\n'. Bytes are received
+    directly into a preallocated bytearray, only the newly received bytes are
+    scanned for the delimiter and the bytes following a frame are kept for the
+    next one. The buffer grows geometrically when a frame does not fit in it, so
+    reading a frame of n bytes costs O(n) whatever the size of the reads.
+    """
+
+    def __init__(self, size: int = 65536, min_free: int = 4096):
+        self.initial_size = size
+        self.min_free = min_free
+        self.buf = bytearray(size)
+        # Unconsumed data lives in buf[start:end], and buf[start:scanned] is
+        # known not to contain any delimiter.
+        self.start = 0
+        self.end = 0
+        self.scanned = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def writable(self) -> memoryview:
+        """Return a view on the free space at the end of the buffer, making
+        room first if needed. Data must then be acknowledged with `commit`.
+
+        Frames previously returned by `pop_frame` may be overwritten.
+        """
+        if len(self.buf) - self.end < self.min_free:
+            pending = self.end - self.start
+            if len(self.buf) - pending >= max(self.min_free, len(self.buf) // 2):
+                # Enough room once the consumed bytes are dropped.
+                self.buf[:pending] = self.buf[self.start:self.end]
+            else:
+                new_buf = bytearray(max(2 * len(self.buf), pending + self.min_free))
+                new_buf[:pending] = self.buf[self.start:self.end]
+                self.buf = new_buf
+            self.scanned -= self.start
+            self.start, self.end = 0, pending
+        return memoryview(self.buf)[self.end:]
+
+    def commit(self, n: int) -> None:
+        """Acknowledge n bytes written in the view returned by `writable`."""
+        self.end += n
+
+    def feed(self, data: bytes) -> None:
+        """Append data to the buffer."""
+        view = memoryview(data)
+        while len(view) > 0:
+            dest = self.writable()
+            n = min(len(dest), len(view))
+            dest[:n] = view[:n]
+            self.commit(n)
+            view = view[n:]
+
+    def pop_frame(self):
+        """Return the next complete frame, without its delimiter, as a
+        memoryview or None if no full frame was received yet.
+
+        The returned view is only valid until the next call to `writable` or
+        `feed`.
+        """
+        while True:
+            pos = self.buf.find(b"\n", self.scanned, self.end)
+            if pos == -1:
+                self.scanned = self.end
+                return None
+            frame = memoryview(self.buf)[self.start:pos]
+            self.start = self.scanned = pos + 1
+            if self.start == self.end:
+                self.start = self.end = self.scanned = 0
+                if len(self.buf) > 16 * self.initial_size:
+                    # Don't hold on a huge buffer after a large reply.
+                    self.buf = bytearray(self.initial_size)
+            if len(frame) > 0:
+                return frame
+
+
+class PendingCall(object):
+    """A request sent to lianad, waiting for its reply."""
+
+    __slots__ = ("method", "resp", "done", "error", "stats")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.resp = None
+        self.done = False
+        # Set if the call failed before its reply arrived.
+        self.error = None
+        # The CallStats of the call if the client is instrumented.
+        self.stats = None
+
+
 class UnixDomainSocketRpc(object):
-    def __init__(self, socket_path, logger=None):
+    """A JSON-RPC client to lianad over its Unix socket.
+
+    The client can be shared between threads: each request gets its own id and
+    several of them can be in flight at once on the connection. At any time one
+    of the waiting threads reads from the socket and hands each reply to the
+    thread waiting for its id, then lets another waiting thread take over
+    reading once its own reply arrived. Replies to no pending request (e.g. to
+    a request that timed out) are logged and dropped.
+
+    Each call has a deadline, `timeout` seconds by default or the one of its
+    method in `timeouts` (see METHOD_TIMEOUTS). If the connection breaks, e.g.
+    because lianad restarted, the next call reconnects. The calls to idempotent
+    methods are retried up to `max_retries` times within their deadline,
+    after a jittered backoff. Calls fail fast while `breaker`, a
+    CircuitBreaker usually shared by the connections to a lianad, is open.
+
+    Set `instrumentation` to an `Instrumentation` to record statistics of the
+    calls, nothing is measured otherwise. Requests and replies are encoded
+    with `codec`, by default the one of the fastest JSON library installed
+    (see `liana_rpc.utils.codec`).
+    """
+
+    instrumentation = None
+    codec = get_codec()
+
+    def __init__(self, socket_path, logger=None, instrumentation=None, timeout: float = TIMEOUT,
+                 timeouts: dict = None, max_retries: int = MAX_RETRIES, breaker=None, codec=None):
         self.socket_path = socket_path
         if not logger:
             self.logger = logging.getLogger()
         else:
             self.logger = logger
         self.next_id = 0
-        self.sock = UnixSocket(self.socket_path)
-        
+        self.sock = None
+        self.recv_buffer = LineBuffer()
+        self._send_lock = threading.Lock()
+        # Protects next_id, the pending calls and the reader role.
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._reading = False
+        self._broken = None
+        self._closed = False
+        self.timeout = timeout
+        self.timeouts = dict(METHOD_TIMEOUTS, **(timeouts or {}))
+        self.max_retries = max_retries
+        self.breaker = breaker
+        if codec is not None:
+            self.codec = codec
+        self.instrumentation = instrumentation
+        # Reads measures of the instrumented reader, see _readobj_instrumented.
+        self._first_byte_at = None
+        self._last_recv_at = None
+        self._frame_stats = None
+        self.sock = UnixSocket(self.socket_path, timeout)
+
     def __del__(self):
-        self.close()
+        if getattr(self, "sock", None) is not None:
+            self.close()
+
+    def _wait_readable(self, deadline: float) -> None:
+        if not self.sock.wait_readable(deadline - time.monotonic()):
+            raise socket.timeout("Timed out waiting for lianad")
 
-    def _readobj(self):
-        """Read a JSON object"""
-        buff = b""
+    def _readobj(self, deadline: float = None):
+        """Read a '\\n'-terminated JSON object"""
+        if self.instrumentation is not None:
+            return self._readobj_instrumented(deadline)
         while True:
-            n_to_read = max(2048, len(buff))
-            chunk = self.sock.recv(n_to_read)
-            buff += chunk
-            if len(chunk) != n_to_read:
-                try:
-                    return json.loads(buff)
-                except json.JSONDecodeError:
-                    # There is more to read, continue
-                    # FIXME: this is a workaround for large reads taken from lianad.
-                    # We should use the '\n' marker instead since lianad uses that.
-                    continue
+            frame = self.recv_buffer.pop_frame()
+            if frame is not None:
+                return self.codec.loads(frame)
+            if deadline is not None:
+                self._wait_readable(deadline)
+            n = self.sock.recv_into(self.recv_buffer.writable())
+            if n == 0:
+                raise ConnectionError("Connection closed by lianad")
+            self.recv_buffer.commit(n)
+
+    def _readobj_instrumented(self, deadline: float = None):
+        """Same as _readobj, also measuring the reads of the frame in _frame_stats."""
+        recv_calls = 0
+        while True:
+            frame = self.recv_buffer.pop_frame()
+            if frame is not None:
+                size = len(frame)
+                start = time.perf_counter()
+                resp = self.codec.loads(frame)
+                parse = time.perf_counter() - start
+                self._frame_stats = (self._first_byte_at, recv_calls, size, parse)
+                # The beginning of the next frame may have come with this one.
+                self._first_byte_at = self._last_recv_at if len(self.recv_buffer) else None
+                return resp
+            if deadline is not None:
+                self._wait_readable(deadline)
+            n = self.sock.recv_into(self.recv_buffer.writable())
+            if n == 0:
+                raise ConnectionError("Connection closed by lianad")
+            self.recv_buffer.commit(n)
+            recv_calls += 1
+            self._last_recv_at = time.perf_counter()
+            if self._first_byte_at is None:
+                self._first_byte_at = self._last_recv_at
 
     def __getattr__(self, name):
         """Intercept any call that is not explicitly defined and call @call.
@@ -127,6 +394,8 @@ class UnixDomainSocketRpc(object):
         We might still want to define the actual methods in the subclasses for
         documentation purposes.
         """
+        if name.startswith("_"):
+            raise AttributeError(name)
 
         def wrapper(*args, **kwargs):
             if len(args) != 0 and len(kwargs) != 0:
@@ -137,44 +406,345 @@ class UnixDomainSocketRpc(object):
 
         return wrapper
 
-    def call(self, method, params={}):
+    def _register(self, method: str):
+        """Allocate a request id and register it as waiting for a reply.
+        Must be called with the lock."""
+        if self._broken is not None:
+            raise ConnectionError(f"Connection to lianad is broken: {self._broken}")
+        this_id = self.next_id
+        self.next_id += 1
+        pending = PendingCall(method)
+        self._pending[this_id] = pending
+        return this_id, pending
+
+    def _route(self, resp) -> None:
+        """Hand a reply to the call waiting for it. Must be called with the lock."""
+        resp_id = resp.get("id") if isinstance(resp, dict) else None
+        pending = self._pending.pop(resp_id, None)
+        if pending is None:
+            self.logger.warning(f"Received a response to no pending request: {resp}")
+            return
+        pending.resp = resp
+        pending.done = True
+        stats = pending.stats
+        if stats is not None and self._frame_stats is not None:
+            first_byte_at, stats.recv_calls, stats.response_bytes, stats.parse = self._frame_stats
+            if first_byte_at is not None and stats.sent_at is not None:
+                stats.first_byte = max(0.0, first_byte_at - stats.sent_at)
+            stats.total = time.perf_counter() - stats.started_at
+
+    def _wait(self, pending: PendingCall, deadline: float):
+        """Wait until the deadline for the reply to a pending call, reading from
+        the socket if no other thread is doing so."""
+        with self._cond:
+            while not pending.done:
+                if self._broken is not None:
+                    raise ConnectionError(f"Connection to lianad is broken: {self._broken}")
+                if not self._reading:
+                    self._reading = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout(f"No reply to {pending.method} in time")
+                self._cond.wait(remaining)
+            else:
+                if pending.error is not None:
+                    raise pending.error
+                return pending.resp
+
+        try:
+            while True:
+                try:
+                    resp = self._readobj(deadline)
+                except socket.timeout:
+                    raise socket.timeout(f"No reply to {pending.method} in time")
+                with self._cond:
+                    self._route(resp)
+                    if pending.done:
+                        return pending.resp
+                    self._cond.notify_all()
+        except socket.timeout:
+            raise
+        except (OSError, ValueError) as e:
+            # The stream can't be trusted anymore.
+            with self._cond:
+                self._broken = e
+            raise
+        finally:
+            with self._cond:
+                self._reading = False
+                if self._closed and self.sock is not None:
+                    # Closed while reading, see close().
+                    self.sock.close()
+                    self.sock = None
+                self._cond.notify_all()
+
+    def _encode(self, this_id: int, method: str, params) -> list:
+        return self.codec.encode_request(this_id, method, params)
+
+    def _send(self, chunks: list) -> None:
+        try:
+            with self._send_lock:
+                self.sock.sendmsg_all(chunks)
+        except OSError as e:
+            with self._cond:
+                self._broken = e
+                self._cond.notify_all()
+            raise
+
+    def _ensure_connected(self) -> None:
+        """Reconnect if the connection broke, failing the calls still waiting on it."""
+        with self._cond:
+            if self._closed:
+                raise ConnectionError("The connection to lianad was closed")
+            if self._broken is None and self.sock is not None:
+                return
+            if self._reading:
+                # A thread is still reading the broken connection, it will give up shortly.
+                raise ConnectionError(f"Connection to lianad is broken: {self._broken}")
+            error = ConnectionError(f"Connection to lianad is broken: {self._broken}")
+            for pending in self._pending.values():
+                pending.error = error
+                pending.done = True
+            self._pending.clear()
+            self._cond.notify_all()
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            self.logger.debug(f"Reconnecting to {self.socket_path}")
+            self.sock = UnixSocket(self.socket_path, self.timeout)
+            self.recv_buffer = LineBuffer()
+            self._first_byte_at = None
+            self._broken = None
+
+    def _timeout(self, method: str) -> float:
+        return self.timeouts.get(method, self.timeout)
+
+    def _with_retries(self, methods: list, timeout: float, attempt):
+        """Run attempt(deadline), reconnecting first if needed and retrying it
+        after a connection failure if all the methods are idempotent."""
+        deadline = time.monotonic() + timeout
+        idempotent = all(method in IDEMPOTENT_METHODS for method in methods)
+        retries = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.check()
+            try:
+                self._ensure_connected()
+                ret = attempt(deadline)
+            except socket.timeout:
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                raise
+            except OSError as e:
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                delay = backoff_delay(retries)
+                if self._closed or not idempotent or retries >= self.max_retries \
+                        or time.monotonic() + delay >= deadline:
+                    raise
+                self.logger.debug(f"Retrying {methods[0]} in {delay:.3f}s after: {e}")
+                time.sleep(delay)
+                retries += 1
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return ret
+
+    def call(self, method, params={}, timeout: float = None):
+        """Call a method of lianad and return its result, or `{'error': <error
+        object>}` if lianad returned an error.
+
+        :param timeout: deadline of the call in seconds, defaults to the one of
+        the method
+        """
+        if timeout is None:
+            timeout = self._timeout(method)
+        if self.instrumentation is not None:
+            return self._with_retries([method], timeout,
+                                      lambda deadline: self._call_instrumented(method, params, deadline))
+        return self._with_retries([method], timeout, lambda deadline: self._call_once(method, params, deadline))
+
+    def _call_once(self, method, params, deadline: float):
         self.logger.debug(f"Calling {method} with params {params}")
 
-        msg = json.dumps(
-            {
-                "jsonrpc": "2.0",
-                "id": 0,
-                "method": method,
-                "params": params,
-            }
-        )
-        self.sock.sendall(msg.encode() + b"\n")
-        this_id = self.next_id
-        resp = self._readobj()
+        with self._cond:
+            this_id, pending = self._register(method)
+        try:
+            self._send(self._encode(this_id, method, params))
+            resp = self._wait(pending, deadline)
+        finally:
+            with self._cond:
+                self._pending.pop(this_id, None)
 
         self.logger.debug(f"Received response for {method} call: {resp}")
-        if "id" in resp and resp["id"] != this_id:
-            raise ValueError(
-                "Malformed response, id is not {}: {}.".format(this_id, resp)
-            )
+        return parse_response(resp, this_id)
+
+    def _call_instrumented(self, method, params, deadline: float):
+        self.instrumentation.before_call(method, params)
+        stats = CallStats(method)
+        self.logger.debug(f"Calling {method} with params {params}")
+        try:
+            with self._cond:
+                this_id, pending = self._register(method)
+                pending.stats = stats
+            try:
+                payload = self._encode(this_id, method, params)
+                stats.request_bytes = sum(map(len, payload))
+                stats.sent_at = time.perf_counter()
+                stats.encode = stats.sent_at - stats.started_at
+                self._send(payload)
+                now = time.perf_counter()
+                stats.send, stats.sent_at = now - stats.sent_at, now
+                resp = self._wait(pending, deadline)
+            finally:
+                with self._cond:
+                    self._pending.pop(this_id, None)
+            self.logger.debug(f"Received response for {method} call: {resp}")
+            stats.error = isinstance(resp, dict) and "error" in resp
+            return parse_response(resp, this_id)
+        except BaseException:
+            stats.error = True
+            raise
+        finally:
+            if stats.total is None:
+                stats.total = time.perf_counter() - stats.started_at
+            self.instrumentation.record(stats)
+
+    def call_many(self, calls, timeout: float = None) -> list:
+        """Send several requests at once and return their results in order.
+
+        All the requests are written in a single write and their replies
+        collected as they arrive, so the whole batch costs about one round
+        trip. A request lianad answered with an error gets an
+        `{'error': <error object>}` result, as with `call`.
+
+        :param calls: iterable of `(method, params)` tuples
+        :param timeout: deadline of the whole batch in seconds, defaults to
+        the longest one of its methods
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        methods = [method for method, _ in calls]
+        if timeout is None:
+            timeout = max(self._timeout(method) for method in set(methods))
+        return self._with_retries(methods, timeout, lambda deadline: self._call_many_once(calls, deadline))
+
+    def _call_many_once(self, calls: list, deadline: float) -> list:
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            for method, params in calls:
+                instrumentation.before_call(method, params)
+        with self._cond:
+            registered = [self._register(method) for method, _ in calls]
+            if instrumentation is not None:
+                for (_, pending), (method, _) in zip(registered, calls):
+                    pending.stats = CallStats(method)
+        try:
+            if instrumentation is None:
+                payload = [chunk for (this_id, _), (method, params) in zip(registered, calls)
+                           for chunk in self._encode(this_id, method, params)]
+            else:
+                payload = [chunk for (this_id, pending), (_, params) in zip(registered, calls)
+                           for chunk in self._encode_measured(this_id, pending.stats, params)]
+                sent_at = time.perf_counter()
+            self.logger.debug(f"Calling {len(calls)} methods in a batch")
+            if sum(map(len, payload)) <= INLINE_SEND_SIZE:
+                self._send(payload)
+                if instrumentation is not None:
+                    self._mark_sent([pending for _, pending in registered], sent_at)
+                resps = [self._wait(pending, deadline) for _, pending in registered]
+            else:
+                send_errors = []
+
+                def send():
+                    try:
+                        self._send(payload)
+                        if instrumentation is not None:
+                            self._mark_sent([pending for _, pending in registered], sent_at)
+                    except OSError as e:
+                        send_errors.append(e)
+
+                sender = threading.Thread(target=send, daemon=True)
+                sender.start()
+                try:
+                    resps = [self._wait(pending, deadline) for _, pending in registered]
+                finally:
+                    sender.join()
+                if send_errors:
+                    raise send_errors[0]
+        finally:
+            with self._cond:
+                for this_id, _ in registered:
+                    self._pending.pop(this_id, None)
+            if instrumentation is not None:
+                for _, pending in registered:
+                    stats = pending.stats
+                    stats.error = not pending.done or not isinstance(pending.resp, dict) or "error" in pending.resp
+                    if stats.total is None:
+                        stats.total = time.perf_counter() - stats.started_at
+                    instrumentation.record(stats)
+
+        return [parse_response(resp, this_id) for (this_id, _), resp in zip(registered, resps)]
+
+    def stream(self, method: str, key: str, params={}, timeout: float = None, filter=None):
+        """Call a method and iterate over the elements of the array `key` of its
+        result as the reply is received, instead of decoding it all at once.
+
+        The call is made on a connection of its own, opened for the duration of
+        the iteration. Raise an RpcError if lianad returned an error.
+
+        :param timeout: how long to wait for each chunk of the reply, defaults to
+        the timeout of the method
+        :param filter: if set, only the elements for which it returns True are
+        yielded
+        """
+        if timeout is None:
+            timeout = self._timeout(method)
+        if self.breaker is not None:
+            self.breaker.check()
+        self.logger.debug(f"Streaming {method} with params {params}")
+        try:
+            sock = UnixSocket(self.socket_path, timeout)
+        except OSError:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        try:
+            sock.sendmsg_all(self.codec.encode_request(0, method, params))
+            error = yield from iter_result_array(lambda: sock.recv(READ_SIZE), key, filter)
+        finally:
+            sock.close()
+        if error is not None:
+            raise RpcError(method, params, error)
+
+    def _encode_measured(self, this_id: int, stats: CallStats, params) -> list:
+        start = time.perf_counter()
+        payload = self._encode(this_id, stats.method, params)
+        stats.encode = time.perf_counter() - start
+        stats.request_bytes = sum(map(len, payload))
+        return payload
+
+    @staticmethod
+    def _mark_sent(pendings: list, sent_at: float) -> None:
+        """Record the time the payload of a batch took to send, shared by all its calls."""
+        now = time.perf_counter()
+        for pending in pendings:
+            pending.stats.send, pending.stats.sent_at = now - sent_at, now
 
-        if not isinstance(resp, dict):
-            raise ValueError(
-                f"Malformed response, response is not a dictionary: {resp}"
-            )
-        elif "error" in resp:
-            
-            out = {
-                'error': resp['error'],
-            }
-            return out
-            
-        elif "result" not in resp:
-            raise ValueError('Malformed response, "result" missing.')
-        return resp["result"]
-    
     def close(self):
-        if self.sock is not None:
-            self.sock.close()
-            self.sock = None
+        with self._cond:
+            self._closed = True
+            if self.sock is None:
+                return
+            if self._reading:
+                # Another thread is reading from the socket: only shut it down so that it fails with a connection
+                # error, it closes the socket once done.
+                self._broken = ConnectionError("The connection to lianad was closed")
+                self._cond.notify_all()
+                self.sock.shutdown()
+                return
+            sock, self.sock = self.sock, None
+        sock.close()
         
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Incremental parsing of the replies of lianad.
+
+Some replies, e.g. the one to `listcoins` of a large wallet, are made of a
+large array in the result. `iter_result_array` parses such a reply as it is
+received and yields the elements of the array one at a time, so that neither
+the reply nor the whole array are ever held in memory.
+"""
+
+import codecs
+import json
+import re
+
+READ_SIZE = 65536
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class ReplyStream(object):
+    """A JSON document read from a socket a chunk at a time.
+
+    Only the unparsed end of the received data is kept, values are decoded one
+    at a time with the standard library. `recv` is called to read the next
+    chunk, the document ends at the first '\\n'.
+    """
+
+    def __init__(self, recv):
+        self.recv = recv
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        # Whether the end of the document was received.
+        self.complete = False
+
+    def _fill(self) -> None:
+        if self.complete:
+            raise ValueError("Malformed response, truncated JSON")
+        data = self.recv()
+        if not data:
+            raise ConnectionError("Connection closed by lianad")
+        end = data.find(b"\n")
+        if end != -1:
+            data = data[:end]
+            self.complete = True
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=self.complete)
+        self.pos = 0
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            self._fill()
+
+    def _next(self) -> str:
+        char = self._peek()
+        self.pos += 1
+        return char
+
+    def _expect(self, char: str) -> None:
+        if self._next() != char:
+            raise ValueError(f"Malformed response, expected '{char}'")
+
+    def value(self):
+        """Decode the next value."""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.complete:
+                    raise ValueError(f"Malformed response: {e}")
+                self._fill()
+                continue
+            if end == len(self.buf) and not self.complete:
+                # A number may go on in the next chunk.
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def members(self):
+        """Iterate over the keys of the next object. The value of each key must
+        be consumed before getting the next one."""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Malformed response, object key is not a string")
+            self._expect(":")
+            yield key
+            char = self._next()
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError("Malformed response, expected ',' or '}'")
+
+    def elements(self):
+        """Iterate over the elements of the next array."""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self._next()
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Malformed response, expected ',' or ']'")
+
+
+def iter_result_array(recv, key: str, filter=None):
+    """
+    Iterate over the elements of the array `key` of the result of a JSON-RPC reply, as it is received.
+
+    :param recv: function returning the next chunk of the reply
+    :param key: the key of the array in the result
+    :param filter: if set, only the elements for which it returns True are yielded
+
+    return the error object if lianad returned an error, None otherwise
+    """
+    stream = ReplyStream(recv)
+    found = False
+    for name in stream.members():
+        if name == "result":
+            for result_key in stream.members():
+                if result_key != key:
+                    stream.value()
+                    continue
+                found = True
+                for element in stream.elements():
+                    if filter is None or filter(element):
+                        yield element
+        elif name == "error":
+            return stream.value()
+        else:
+            stream.value()
+    if not found:
+        raise ValueError(f'Malformed response, "{key}" missing.')
+    return None
@@ -0,0 +1,265 @@
+"""
+Notification of the changes to the coins of a wallet.
+
+A `WalletWatcher` polls lianad for its block height, a cheap `getinfo` call,
+and only lists the coins again when the height changed, or every
+`mempool_interval` seconds to notice the transactions in the mempool. The coins
+are compared to the ones of the previous poll by outpoint and each change is
+reported as an event:
+
+ - `CoinReceived`: a new coin, confirmed or not,
+ - `CoinConfirmed`: a coin got confirmed,
+ - `SpendBroadcast`: a transaction spending coins of the wallet was seen, one
+   event for all the coins it spends,
+ - `CoinSpent`: the transaction spending a coin got confirmed.
+
+A poll that found no new block only costs a `getinfo`. A mempool poll only
+lists the unconfirmed coins and the ones being spent, and a poll after a new
+block the coins not spent yet: the spent coins, which make most of the history
+of a wallet, are never listed again, only the few that got spent since the
+previous poll are fetched by outpoint.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+log = logging.getLogger()
+
+# The statuses of the coins listed after a new block, all but the spent ones.
+UNSPENT_STATUSES = ["unconfirmed", "confirmed", "spending"]
+# The statuses of the coins that can change without a new block, or that a confirmed coin can move to.
+MEMPOOL_STATUSES = ["unconfirmed", "spending"]
+
+
+class WalletEvent(object):
+    """
+    A change to a coin of the wallet.
+    """
+
+    __slots__ = ("coin",)
+    kind = None
+
+    def __init__(self, coin: dict):
+        """
+        :param coin: the coin as returned by `list_coins`, after the change
+        """
+        self.coin = coin
+
+    @property
+    def outpoint(self) -> str:
+        return self.coin['outpoint']
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.coin == self.coin
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.outpoint})"
+
+
+class CoinReceived(WalletEvent):
+    __slots__ = ()
+    kind = "coin_received"
+
+
+class CoinConfirmed(WalletEvent):
+    __slots__ = ()
+    kind = "coin_confirmed"
+
+    @property
+    def block_height(self) -> int:
+        return self.coin['block_height']
+
+
+class CoinSpent(WalletEvent):
+    __slots__ = ()
+    kind = "coin_spent"
+
+    @property
+    def txid(self) -> str:
+        return self.coin['spend_info']['txid']
+
+
+class SpendBroadcast(WalletEvent):
+    """
+    A transaction spending coins of the wallet, unconfirmed when it was seen. `coin` is the first of its `coins`.
+    """
+
+    __slots__ = ("txid", "coins")
+    kind = "spend_broadcast"
+
+    def __init__(self, txid: str, coins: list):
+        super().__init__(coins[0])
+        self.txid = txid
+        self.coins = coins
+
+    def __eq__(self, other):
+        return type(other) is type(self) and (other.txid, other.coins) == (self.txid, self.coins)
+
+    def __repr__(self):
+        return f"SpendBroadcast({self.txid}, {[c['outpoint'] for c in self.coins]})"
+
+
+def _state(coin: dict) -> tuple:
+    """The fields of a coin that the events are about."""
+    spend_info = coin['spend_info'] or {}
+    return coin['block_height'], spend_info.get('txid'), spend_info.get('height')
+
+
+class WalletWatcher(object):
+    """
+    Polls a wallet and reports the changes to its coins as `WalletEvent`s, to callbacks or through `events()`.
+
+    The first poll takes a snapshot of the coins without reporting them.
+    """
+
+    def __init__(self, liana, poll_interval: float = 5.0, mempool_interval: float = 30.0, callbacks=None):
+        """
+        :param liana: the LianaRPC of the wallet to watch
+        :param poll_interval: the time between two checks of the block height by `run` and `events`, in seconds
+        :param mempool_interval: the time between two listings of the unconfirmed coins when the block height did
+        not change, in seconds. If None the coins are only listed after a new block.
+        :param callbacks: functions called with each event
+        """
+        self.liana = liana
+        self.poll_interval = poll_interval
+        self.mempool_interval = mempool_interval
+        self.callbacks = list(callbacks or [])
+        self.lock = threading.Lock()
+
+        # The state of the coins not spent by a confirmed transaction, by outpoint.
+        self.snapshot = None
+        self.block_height = None
+        self.fetched_at = None
+
+    def subscribe(self, callback) -> None:
+        """
+        :param callback: function called with each event, in the thread polling
+        """
+        self.callbacks.append(callback)
+
+    def poll(self, force: bool = False):
+        """
+        Check for changes to the coins of the wallet since the previous poll, and call the callbacks with them.
+
+        :param force: list the coins whatever the block height
+
+        return the list of events, or an `{'error': ...}` dict if lianad returned an error
+        """
+        with self.lock:
+            events = self._poll(force)
+        if isinstance(events, dict):
+            return events
+        for event in events:
+            for callback in self.callbacks:
+                try:
+                    callback(event)
+                except Exception:
+                    log.exception(f"Callback failed on {event!r}")
+        return events
+
+    def _poll(self, force: bool):
+        info = self.liana.get_info()
+        if 'error' in info.keys():
+            return {'error': info['error']}
+        now = time.monotonic()
+        if self.snapshot is None or force or info['block_height'] != self.block_height:
+            statuses = UNSPENT_STATUSES
+        elif self.mempool_interval is not None and now - self.fetched_at >= self.mempool_interval:
+            statuses = MEMPOOL_STATUSES
+        else:
+            return []
+
+        coins = self.liana.list_coins(statuses=statuses)
+        if type(coins) is not list:
+            return coins
+        if self.snapshot is None:
+            self.snapshot = {coin['outpoint']: _state(coin) for coin in coins}
+            self.block_height, self.fetched_at = info['block_height'], now
+            return []
+
+        fetched = {coin['outpoint']: coin for coin in coins}
+        # The coins of the snapshot that moved to a status that was not listed, fetched on their own.
+        if statuses is UNSPENT_STATUSES:
+            missing = [outpoint for outpoint in self.snapshot if outpoint not in fetched]
+        else:
+            missing = [outpoint for outpoint, (height, spend_txid, _) in self.snapshot.items()
+                       if (height is None or spend_txid is not None) and outpoint not in fetched]
+        if missing:
+            coins = self.liana.list_coins(outpoints=missing)
+            if type(coins) is not list:
+                return coins
+            fetched.update((coin['outpoint'], coin) for coin in coins)
+            for outpoint in missing:
+                if outpoint not in fetched:
+                    # Dropped from the wallet, e.g. by a reorg or a replacement of the transaction.
+                    del self.snapshot[outpoint]
+
+        events = self._diff(fetched)
+        self.block_height, self.fetched_at = info['block_height'], now
+        return events
+
+    def _diff(self, fetched: dict) -> list:
+        """Update the snapshot with the fetched coins, return the events for the ones that changed."""
+        events, spent = [], []
+        broadcasts = {}
+        for outpoint, coin in fetched.items():
+            new = _state(coin)
+            old = self.snapshot.get(outpoint)
+            if new == old:
+                continue
+            height, spend_txid, spend_height = new
+            if old is None:
+                events.append(CoinReceived(coin))
+                old = (None, None, None)
+            if old[0] is None and height is not None:
+                events.append(CoinConfirmed(coin))
+            if spend_txid is not None and spend_txid != old[1]:
+                broadcasts.setdefault(spend_txid, []).append(coin)
+            if spend_height is not None and (old[2] is None or spend_txid != old[1]):
+                spent.append(CoinSpent(coin))
+            if spend_height is not None:
+                # Won't change anymore, barring a reorg.
+                self.snapshot.pop(outpoint, None)
+            else:
+                self.snapshot[outpoint] = new
+        events.extend(SpendBroadcast(txid, coins) for txid, coins in broadcasts.items())
+        events.extend(spent)
+        return events
+
+    def run(self, stop_event: threading.Event = None) -> None:
+        """
+        Poll every `poll_interval` seconds until stop_event is set, calling the callbacks with the events.
+
+        :param stop_event: set it, e.g. from another thread, to stop polling
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                ret = self.poll()
+            except (OSError, ValueError) as e:
+                # lianad restarting, a timeout, an open circuit: tried again on the next poll.
+                ret = {'error': f"{type(e).__name__}: {e}"}
+            if isinstance(ret, dict):
+                log.warning(f"Polling the wallet failed: {ret['error']}")
+            stop_event.wait(self.poll_interval)
+
+    async def events(self):
+        """
+        Poll every `poll_interval` seconds and yield the events, e.g. `async for event in watcher.events()`.
+
+        The calls to lianad run in the default executor of the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                ret = await loop.run_in_executor(None, self.poll)
+            except (OSError, ValueError) as e:
+                ret = {'error': f"{type(e).__name__}: {e}"}
+            if isinstance(ret, dict):
+                log.warning(f"Polling the wallet failed: {ret['error']}")
+            else:
+                for event in ret:
+                    yield event
+            await asyncio.sleep(self.poll_interval)
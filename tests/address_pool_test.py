@@ -0,0 +1,80 @@
+import time
+
+from liana_rpc.address_pool import AddressPool
+from liana_rpc.liana_rpc import LianaRPC
+from tests.mock_lianad import MockRpcError
+
+
+def getnewaddress(lianad):
+    def handler(params):
+        return {"address": f"tb1q{len([r for r in lianad.requests if r['method'] == 'getnewaddress'])}"}
+    return handler
+
+
+def calls(lianad) -> int:
+    return len([r for r in lianad.requests if r["method"] == "getnewaddress"])
+
+
+def test_address_pool(lianad):
+    lianad.handlers["getnewaddress"] = getnewaddress(lianad)
+    with AddressPool(LianaRPC(lianad.socket_path), low=5, high=20, batch_size=8) as pool:
+        assert pool.wait(20, timeout=5)
+        # Filled up to the high watermark, in batches.
+        time.sleep(0.05)
+        assert len(pool) == 20 and calls(lianad) == 20
+        handed = [pool.get() for _ in range(15)]
+        assert handed == [f"tb1q{i}" for i in range(1, 16)]
+        assert calls(lianad) == 20
+        # Below the low watermark: refilled up to the high one.
+        pool.get()
+        assert pool.wait(20, timeout=5)
+        assert calls(lianad) == 36
+        assert len(set(pool.get() for _ in range(20))) == 20
+
+
+def test_address_pool_empty(lianad):
+    lianad.handlers["getnewaddress"] = getnewaddress(lianad)
+    with AddressPool(LianaRPC(lianad.socket_path), low=0, high=0) as pool:
+        assert pool.get() == "tb1q1"
+
+    def failing(params):
+        raise MockRpcError(-32603, "Database error")
+
+    lianad.handlers["getnewaddress"] = failing
+    with AddressPool(LianaRPC(lianad.socket_path), low=5, high=10) as pool:
+        assert not pool.wait(timeout=0.2)
+        assert "error" in pool.get()
+        assert pool.failures > 0
+
+
+def test_address_pool_persistence(lianad, tmp_path):
+    lianad.handlers["getnewaddress"] = getnewaddress(lianad)
+    path = str(tmp_path / "addresses")
+    with AddressPool(LianaRPC(lianad.socket_path), low=5, high=10, path=path) as pool:
+        assert pool.wait(10, timeout=5)
+        handed = [pool.get() for _ in range(3)]
+    unused = [f"tb1q{i}" for i in range(4, 11)]
+
+    # Restarted: the unused addresses are handed out without calling lianad, none twice.
+    lianad.handlers.pop("getnewaddress")
+    with AddressPool(LianaRPC(lianad.socket_path), low=0, high=0, path=path) as pool:
+        assert len(pool) == 7
+        assert [pool.get() for _ in range(2)] == unused[:2]
+    with open(path) as f:
+        assert f.read() == "".join(f"+{a}\n" for a in unused) + "".join(f"-{a}\n" for a in unused[:2])
+    with AddressPool(LianaRPC(lianad.socket_path), low=0, high=0, path=path) as pool:
+        assert [pool.get() for _ in range(5)] == unused[2:]
+        assert not set(handed) & set(unused)
+    assert calls(lianad) == 10
+
+
+def test_address_pool_closed(lianad, tmp_path):
+    lianad.handlers["getnewaddress"] = getnewaddress(lianad)
+    path = str(tmp_path / "addresses")
+    pool = AddressPool(LianaRPC(lianad.socket_path), low=5, high=5, path=path)
+    assert pool.wait(5, timeout=5)
+    pool.close()
+    # Not handed out from the pool once its file is closed, it would be handed out again on restart.
+    assert pool.get() == "tb1q6"
+    with AddressPool(LianaRPC(lianad.socket_path), low=0, high=0, path=path) as pool:
+        assert [pool.get() for _ in range(5)] == [f"tb1q{i}" for i in range(1, 6)]
@@ -0,0 +1,80 @@
+import asyncio
+import copy
+
+import pytest
+
+from liana_rpc.async_liana_rpc import AsyncLianaRPC
+from liana_rpc.utils.async_rpc import AsyncUnixDomainSocketRpc
+
+
+def test_async_pipelined_calls(lianad):
+    lianad.handlers["getnewaddress"] = lambda params: {"address": "tb1q" + str(len(lianad.requests))}
+
+    async def run():
+        async with AsyncLianaRPC(lianad.socket_path) as liana:
+            return await asyncio.gather(*[liana.get_new_address() for _ in range(200)])
+
+    addresses = asyncio.run(run())
+    assert sorted(addresses) == sorted(f"tb1q{i}" for i in range(1, 201))
+    assert len(lianad.connections) == 1
+    assert len(set(r["id"] for r in lianad.requests)) == 200
+
+
+def test_async_error_shape(lianad):
+    async def run():
+        async with AsyncLianaRPC(lianad.socket_path) as liana:
+            return await liana.list_coins()
+
+    assert asyncio.run(run())["error"]["code"] == -32601
+
+
+def test_async_private_attributes():
+    rpc = AsyncUnixDomainSocketRpc("/nonexistent")
+    assert not hasattr(rpc, "_anything")
+    with pytest.raises(AttributeError):
+        rpc.__deepcopy__
+    assert copy.deepcopy(rpc).socket_path == "/nonexistent"
+
+
+def test_async_out_of_order_replies():
+    async def run():
+        rpc = AsyncUnixDomainSocketRpc("/nonexistent")
+        loop = asyncio.get_running_loop()
+        first, second = loop.create_future(), loop.create_future()
+        rpc._pending = {0: first, 1: second}
+        rpc._dispatch({"id": 1, "result": "b"})
+        rpc._dispatch({"id": 0, "result": "a"})
+        rpc._dispatch({"id": 7, "result": "orphan"})
+        return first.result(), second.result(), rpc._pending
+
+    assert asyncio.run(run()) == ({"id": 0, "result": "a"}, {"id": 1, "result": "b"}, {})
+
+
+def test_async_connection_lost(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+
+    async def run():
+        rpc = AsyncUnixDomainSocketRpc(lianad.socket_path)
+        await rpc.call("getinfo")
+        lianad.drop_connections()
+        await asyncio.sleep(0.05)
+        # The next call reconnects.
+        ret = await rpc.call("getinfo")
+        await rpc.close()
+        return ret
+
+    assert asyncio.run(run()) == {"block_height": 1}
+
+
+def test_async_pending_fail_on_close(lianad):
+    async def run():
+        rpc = AsyncUnixDomainSocketRpc(lianad.socket_path)
+        await rpc.call("getinfo")
+        fut = asyncio.get_running_loop().create_future()
+        rpc._pending[42] = fut
+        lianad.drop_connections()
+        with pytest.raises(ConnectionError):
+            await fut
+        await rpc.close()
+
+    asyncio.run(run())
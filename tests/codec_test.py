@@ -0,0 +1,94 @@
+import base64
+import json
+import socket
+import threading
+
+import pytest
+
+from liana_rpc.utils import codec as codec_module
+from liana_rpc.utils.codec import RAW_STRING_SIZE, get_codec
+from liana_rpc.utils.rpc import UnixDomainSocketRpc, UnixSocket
+
+PSBT = base64.b64encode(bytes(range(256)) * 40).decode()
+
+CODECS = [name for name, module in (("json", json), ("orjson", codec_module.orjson),
+                                    ("ujson", codec_module.ujson)) if module is not None]
+
+
+def decode(chunks: list):
+    payload = b"".join(chunks)
+    assert payload.endswith(b"\n") and payload.count(b"\n") == 1
+    return json.loads(payload)
+
+
+@pytest.mark.parametrize("name", CODECS)
+@pytest.mark.parametrize("params", [
+    {},
+    [],
+    {"psbt": PSBT},
+    {"psbt": PSBT, "other": PSBT[:-4], "feerate": 2},
+    {"feerate": 2, "destinations": {"bc1q": 1000}},
+    # Long strings JSON must escape.
+    {"label": "é\"\\\n" * RAW_STRING_SIZE},
+    ("txid",),
+])
+def test_encode_request(name, params):
+    codec = get_codec(name)
+    for this_id in (0, 12345):
+        request = decode(codec.encode_request(this_id, "updatespend", params))
+        assert request == {"jsonrpc": "2.0", "id": this_id, "method": "updatespend",
+                           "params": json.loads(json.dumps(params))}
+
+
+def test_raw_params():
+    codec = get_codec("json")
+    chunks = codec.encode_request(1, "updatespend", {"psbt": PSBT})
+    # The PSBT is sent as a chunk of its own.
+    assert PSBT.encode() in chunks
+    chunks = codec.encode_request(1, "updatespend", {"psbt": PSBT[:100]})
+    assert len(chunks) == 3
+
+
+@pytest.mark.parametrize("name", CODECS)
+def test_loads(name):
+    codec = get_codec(name)
+    data = b'{"id": 0, "result": {"coins": []}}'
+    assert codec.loads(data) == codec.loads(memoryview(data)) == {"id": 0, "result": {"coins": []}}
+
+
+def test_get_codec():
+    # The fastest one installed.
+    assert get_codec().name == ("orjson" if "orjson" in CODECS else "ujson" if "ujson" in CODECS else "json")
+    with pytest.raises(ValueError):
+        get_codec("simplejson")
+
+
+def test_sendmsg_all():
+    a, b = socket.socketpair()
+    sock = UnixSocket.__new__(UnixSocket)
+    sock.sock = a
+    # Larger than the socket buffer, so that sendmsg sends it in parts.
+    chunks = [b"x" * 1000, b"y" * 3_000_000, b"", b"z"] + [b"w"] * 2000
+    received = bytearray()
+
+    def read():
+        expected = sum(map(len, chunks))
+        while len(received) < expected:
+            received.extend(b.recv(65536))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    sock.sendmsg_all(chunks)
+    reader.join()
+    assert received == b"".join(chunks)
+    sock.sock = None
+    a.close()
+    b.close()
+
+
+@pytest.mark.parametrize("name", CODECS)
+def test_codecs_against_lianad(lianad, name):
+    lianad.handlers["updatespend"] = lambda params: {"psbt": params["psbt"]}
+    rpc = UnixDomainSocketRpc(lianad.socket_path, codec=get_codec(name))
+    assert rpc.call("updatespend", {"psbt": PSBT}) == {"psbt": PSBT}
+    assert rpc.call_many([("updatespend", {"psbt": PSBT})] * 3) == [{"psbt": PSBT}] * 3
@@ -0,0 +1,63 @@
+from liana_rpc.liana_rpc import LianaRPC
+
+
+def coin(txid, vout, amount, height, spent=False):
+    return {
+        "amount": amount,
+        "block_height": height,
+        "outpoint": f"{txid * 64}:{vout}",
+        "spend_info": {"txid": "f" * 64, "height": None} if spent else None,
+    }
+
+
+def wallet(lianad):
+    state = {
+        "height": 100,
+        "coins": [coin("a", 0, 1000, 90), coin("a", 1, 2000, 95), coin("b", 0, 3000, 99, spent=True),
+                  coin("c", 0, 4000, None)],
+    }
+    lianad.handlers["getinfo"] = lambda params: {"block_height": state["height"]}
+    lianad.handlers["listcoins"] = lambda params: {"coins": state["coins"]}
+    lianad.handlers["broadcastspend"] = lambda params: {}
+    return state
+
+
+def listcoins_calls(lianad):
+    return len([r for r in lianad.requests if r["method"] == "listcoins"])
+
+
+def test_coin_index_lookups(lianad):
+    wallet(lianad)
+    liana = LianaRPC(lianad.socket_path)
+    index = liana.coin_index
+    assert index.refresh() is None
+    assert index.get("a" * 64 + ":1")["amount"] == 2000
+    assert [c["amount"] for c in index.by_txid("a" * 64)] == [1000, 2000]
+    assert [c["amount"] for c in index.unspent_confirmed_before(95)] == [1000]
+    assert [c["amount"] for c in index.unspent_confirmed_between(90, 95)] == [1000, 2000]
+    assert [c["amount"] for c in index.unconfirmed_coins()] == [4000]
+    assert [c["amount"] for c in index.spent_coins()] == [3000]
+
+
+def test_coin_index_refetch_on_height_change(lianad):
+    state = wallet(lianad)
+    liana = LianaRPC(lianad.socket_path)
+    assert liana.list_unspent_coins(cached=True) == liana.list_unspent_coins()
+    calls = listcoins_calls(lianad)
+    liana.list_unspent_coins(cached=True)
+    liana.list_spent_coins(cached=True)
+    assert listcoins_calls(lianad) == calls
+
+    state["height"] += 1
+    state["coins"] = state["coins"][:1]
+    assert len(liana.list_unspent_coins(cached=True)) == 1
+    assert listcoins_calls(lianad) == calls + 1
+
+    liana.broadcast_psbt("f" * 64)
+    liana.list_unspent_coins(cached=True)
+    assert listcoins_calls(lianad) == calls + 2
+
+
+def test_coin_index_error(lianad):
+    liana = LianaRPC(lianad.socket_path)
+    assert "error" in liana.list_unspent_coins(cached=True)
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.coin_selection import (SelectionError, branch_and_bound, input_weight, script_pubkey_size,
+                                            select_coins)
+
+DESCRIPTOR = "wsh(or_i(and_v(v:pkh([c6fb74e6/48'/1'/1'/2']tpubDFJBUNcNBTvAZYp5CteCpbCBfs8GhescLJPfTvcH7jugvFAffTr67BjvZ28g2fqt2bkHYTNTwaC95hx6byTFi8kVQa/<0;1>/*),older(20)),or_d(multi(2,[c4fb74e6/48'/1'/0'/2']tpubDE4XEBLMec4eRURN3QGNFGJZcvPT7r1AGELL7P5fbiBp2txJCRfAmNHnjCF1YZsbzkQYZKVpTvRGWLbwYGgFHp6Sb8atSWKyzKsv4dUp1vY/<0;1>/*,[a5c6b76e/48'/1'/0'/2']tpubDF5861hj6vR3iJr3aPjGJz4rNbqDCRujQ21mczzKT5SiedaQqNVgHC8HT9ceyxvMFRoPMx4P6HAcL3NZrUPhRUbwCyj3TKSa64bAfnE3sLh/<0;1>/*),and_v(v:pkh([a5c6b76e/48'/1'/1'/2']tpubDFhfKfRZcoXt9uMAWCEmtbv5sFaZ3o9bUyQ74Gj1UxxS5MHENpBhMXmc6gfkMXoJnDTfso1Gzyb2DpwpPVeJsgGee1qXAAQ1AhBNqFG6Mwt/<0;1>/*),older(10)))))#t4nta0mn"
+ADDRESS = "tb1qlmdc720pler50uhrf88xdt6chrqtuzrldfkw9727hqdr3e25r4csqc0m9x"
+
+
+def coins(amounts):
+    return [{"amount": a, "block_height": 1, "outpoint": f"{i:064x}:0", "spend_info": None}
+            for i, a in enumerate(amounts)]
+
+
+def test_input_weight():
+    # Outpoint, scriptSig and sequence, then the witness: 2 signatures, the or_i selector and the witness script.
+    assert input_weight(DESCRIPTOR) == 41 * 4 + 1 + (1 + 2 * 73) + 1 + 1 + 132
+    assert input_weight("wpkh(xpub/0/*)") == 41 * 4 + 1 + 73 + 34
+    assert input_weight("tr(xpub/0/*)") == 41 * 4 + 1 + 66
+    # The recovery leaf is heavier, but not usable by `createspend`.
+    tr = "tr(K,{pk(A),and_v(v:multi_a(1,B,C),older(100))})"
+    assert input_weight(tr) < input_weight(tr, primary_path=False)
+    with pytest.raises(SelectionError):
+        input_weight("wsh(unknown(A))")
+
+
+def test_script_pubkey_size():
+    assert script_pubkey_size("bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4") == 22
+    assert script_pubkey_size(ADDRESS) == 34
+    assert script_pubkey_size("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa") == 25
+    assert script_pubkey_size("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy") == 23
+
+
+def test_branch_and_bound():
+    values = [8, 7, 5, 3, 2]
+    assert sum(values[i] for i in branch_and_bound(values, 10, 0)) == 10
+    assert branch_and_bound([8, 7, 5], 11, 0) is None
+    # The least excess wins.
+    assert sorted(branch_and_bound([8, 7, 5], 11, 2)) == [1, 2]
+
+
+def test_select_coins_changeless():
+    wallet = coins([100000, 60000, 40000, 25000, 7000])
+    # 60000 sats minus 100 sats for the input pays 59800 sats and 54 sats for the rest of the transaction.
+    selection = select_coins(wallet, {ADDRESS: 59800}, 1, input_weight=400)
+    assert selection["algorithm"] == "bnb"
+    assert selection["change"] == 0
+    assert selection["outpoints"] == [wallet[1]["outpoint"]]
+    assert selection["fee"] == 200
+
+
+def test_select_coins_fallbacks():
+    rng = random.Random(0)
+    wallet = coins([rng.randint(10000, 20000) * 1000 for _ in range(50)])
+    selection = select_coins(wallet, {ADDRESS: 1234567}, 2, rng=rng)
+    assert selection["algorithm"] == "knapsack"
+    assert selection["change"] >= 5000
+    assert sum(c["amount"] for c in selection["coins"]) == 1234567 + selection["fee"] + selection["change"]
+
+    selection = select_coins(wallet, {ADDRESS: 1234567}, 2, time_budget=0)
+    assert selection["algorithm"] == "largest_first"
+    assert selection["coins"] == [max(wallet, key=lambda c: c["amount"])]
+
+    with pytest.raises(SelectionError):
+        select_coins(wallet, {ADDRESS: 10 ** 12}, 2)
+
+
+def test_create_psbt_auto(lianad):
+    wallet = coins([100000, 60000, 40000])
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1,
+                                                 "descriptors": {"main": {"multi_desc": DESCRIPTOR}}}
+    lianad.handlers["listcoins"] = lambda params: {"coins": wallet}
+    lianad.handlers["createspend"] = lambda params: {"psbt": "cHNidP8B"}
+    liana = LianaRPC(lianad.socket_path)
+    assert liana.create_psbt_auto({ADDRESS: 59600}, 2) == "cHNidP8B"
+    createspend = [r for r in lianad.requests if r["method"] == "createspend"][0]
+    assert createspend["params"]["outpoints"] == [wallet[1]["outpoint"]]
+    assert "error" in liana.create_psbt_auto({ADDRESS: 10 ** 9}, 2)
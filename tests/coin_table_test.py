@@ -0,0 +1,108 @@
+import bisect
+import random
+
+import pytest
+
+from liana_rpc.coin_table import CoinTable, numpy
+from liana_rpc.liana_rpc import LianaRPC
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+BACKENDS = [False, pytest.param(True, marks=pytest.mark.skipif(numpy is None, reason="NumPy is not installed"))]
+
+
+def random_coins(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    coins = []
+    for i in range(n):
+        spend_info = None
+        if rng.random() < 0.3:
+            spend_info = {"txid": rng.randbytes(32).hex(), "height": rng.choice([None, rng.randrange(100, 200)])}
+        height = rng.randrange(1, 200)
+        coins.append({
+            "amount": int(10 ** rng.uniform(2, 8)),
+            "block_height": None if rng.random() < 0.1 else height,
+            "outpoint": f"{rng.randbytes(32).hex()}:{rng.randrange(0, 2 ** 32)}",
+            "spend_info": spend_info,
+        })
+    return coins
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_rows(use_numpy):
+    coins = random_coins(200)
+    table = CoinTable(coins, use_numpy=use_numpy)
+    assert len(table) == 200
+    assert table.to_list() == coins
+    assert table[-1] == coins[-1]
+    assert table[3].outpoint == coins[3]["outpoint"]
+    assert table[3].vout == int(coins[3]["outpoint"].split(":")[1])
+    with pytest.raises(IndexError):
+        table[200]
+    with pytest.raises(AttributeError):
+        table[0].label = "x"
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_balances(use_numpy):
+    coins = random_coins(1000)
+    table = CoinTable(coins, use_numpy=use_numpy)
+    unspent = [c for c in coins if not c["spend_info"]]
+    assert table.balance() == sum(c["amount"] for c in unspent)
+    assert table.confirmed_balance() == sum(c["amount"] for c in unspent if c["block_height"] is not None)
+    assert table.unconfirmed_balance() == sum(c["amount"] for c in unspent if c["block_height"] is None)
+    assert table.unspent().to_list() == unspent
+    assert table.spent_coins().to_list() == [c for c in coins if c["spend_info"]]
+    assert CoinTable(use_numpy=use_numpy).balance() == 0
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_filters(use_numpy):
+    coins = random_coins(1000)
+    table = CoinTable(coins, use_numpy=use_numpy)
+    assert table.dust(5000).to_list() == [c for c in coins if c["amount"] < 5000]
+    assert table.without_dust(5000).to_list() == [c for c in coins if c["amount"] >= 5000]
+
+    def confs(c, tip):
+        return 0 if c["block_height"] is None else max(tip - c["block_height"] + 1, 0)
+
+    assert list(table.confirmations(150)) == [confs(c, 150) for c in coins]
+    assert table.mature(150, 20).to_list() == [c for c in coins if confs(c, 150) >= 20]
+    assert table.immature(150, 20).to_list() == [c for c in coins if confs(c, 150) < 20]
+    # Filters chain.
+    assert table.unspent().mature(150, 1).balance() == table.confirmed_balance() - sum(
+        c["amount"] for c in coins if not c["spend_info"] and (c["block_height"] or 0) > 150)
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_histograms(use_numpy):
+    coins = random_coins(1000)
+    table = CoinTable(coins, use_numpy=use_numpy)
+
+    expected = {}
+    for c in coins:
+        if c["block_height"] is not None:
+            start = c["block_height"] // 10 * 10
+            count, amount = expected.get(start, (0, 0))
+            expected[start] = (count + 1, amount + c["amount"])
+    histogram = table.histogram_by_height(10)
+    assert histogram == expected
+    assert list(histogram) == sorted(expected)
+
+    bounds = [1000, 10000, 100000, 1000000]
+    expected = [(0, 0)] * 5
+    for c in coins:
+        i = bisect.bisect_right(bounds, c["amount"])
+        expected[i] = (expected[i][0] + 1, expected[i][1] + c["amount"])
+    assert table.histogram_by_value(bounds) == expected
+
+
+def test_coin_table(tmp_path):
+    wallet = SyntheticWallet(coins=500, spent=0.4)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        table = liana.coin_table()
+        fields = ("amount", "block_height", "outpoint", "spend_info")
+        assert table.to_list() == [{f: c[f] for f in fields} for c in wallet.coins]
+        assert table.balance() == sum(c["amount"] for c in liana.list_unspent_coins())
+        lianad.handlers.pop("listcoins")
+        assert "error" in liana.coin_table()
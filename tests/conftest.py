@@ -19,4 +19,12 @@ def pytest_collection_modifyitems(config, items):
 
     if not get_liana_instances():
         skip_live_rpc_test(items, "SKIP - lianad not running")
-        
\ No newline at end of file
+        
+
+@pytest.fixture
+def lianad(tmp_path):
+    from tests.mock_lianad import MockLianad
+    server = MockLianad(str(tmp_path / "lianad_rpc"))
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,50 @@
+import os
+
+from liana_rpc.utils.discovery import LianadDiscovery, socket_from_cmdline
+from tests.mock_lianad import MockLianad
+
+
+def make_process(proc, pid, argv, cwd):
+    os.makedirs(proc / pid)
+    (proc / pid / "cmdline").write_bytes(b"\0".join(a.encode() for a in argv) + b"\0")
+    os.symlink(cwd, proc / pid / "cwd")
+
+
+def test_socket_from_cmdline(tmp_path):
+    conf = tmp_path / "config.toml"
+    conf.write_text('data_dir = "/data/liana"\n\n[bitcoin_config]\nnetwork = "signet"\n')
+    expected = "/data/liana/signet/lianad_rpc"
+    assert socket_from_cmdline(["lianad", "--conf", str(conf)]) == expected
+    assert socket_from_cmdline(["lianad", f"--conf={conf}"]) == expected
+    assert socket_from_cmdline(["lianad", "--conf", "config.toml"], cwd=str(tmp_path)) == expected
+    # Without data_dir, the socket is looked for next to the configuration.
+    conf.write_text('[bitcoin_config]\nnetwork = "signet"\n')
+    assert socket_from_cmdline(["lianad", "--conf", str(conf)]) == str(tmp_path / "lianad_rpc")
+    assert socket_from_cmdline(["lianad"]) is None
+
+
+def test_discovery(tmp_path):
+    data_dir = tmp_path / "liana"
+    os.makedirs(data_dir / "signet")
+    conf = tmp_path / "config.toml"
+    conf.write_text(f'data_dir = "{data_dir}"\n\n[bitcoin_config]\nnetwork = "signet"\n')
+    proc = tmp_path / "proc"
+    make_process(proc, "10", ["/usr/bin/python3", "lianad", "--conf", str(conf)], tmp_path)
+    make_process(proc, "11", ["/usr/local/bin/lianad", "--conf", "config.toml"], tmp_path)
+    os.makedirs(proc / "self")
+
+    discovery = LianadDiscovery(proc=str(proc))
+    socket_path = str(data_dir / "signet" / "lianad_rpc")
+    # lianad is starting: no socket yet, and nothing cached.
+    assert discovery.find() == []
+    assert discovery.pids is None
+
+    with MockLianad(socket_path):
+        assert discovery.find() == [socket_path]
+        # Nothing changed in /proc, the configuration is not read again.
+        conf.unlink()
+        assert discovery.find() == [socket_path]
+        assert discovery.find(refresh=True) == []
+
+    make_process(proc, "12", ["lianad", f"--conf={tmp_path / 'missing.toml'}"], tmp_path)
+    assert discovery.find() == []
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from liana_rpc.fleet import LianaFleet
+from tests.mock_lianad import MockLianad, MockRpcError, SyntheticWallet
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    servers = []
+    for i in range(3):
+        wallet = SyntheticWallet(coins=20, spent=0.5, block_height=100 + i, seed=i)
+        servers.append(MockLianad(str(tmp_path / f"lianad_rpc_{i}"), wallet.handlers()).start())
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_fleet_queries(fleet):
+    with LianaFleet({f"vault{i}": s.socket_path for i, s in enumerate(fleet)}) as liana:
+        assert liana.wallets == ["vault0", "vault1", "vault2"]
+
+        ret = liana.get_info()
+        assert ret['errors'] == {}
+        assert {name: info['block_height'] for name, info in ret['wallets'].items()} == \
+            {"vault0": 100, "vault1": 101, "vault2": 102}
+
+        ret = liana.list_coins()
+        assert ret['errors'] == {}
+        assert len(ret['coins']) == 60
+        for i in range(3):
+            assert len([c for c in ret['coins'] if c['wallet'] == f"vault{i}"]) == 20
+
+        unspent = liana.list_unspent_coins()['coins']
+        assert all(not c['spend_info'] for c in unspent)
+        balances = liana.balances()
+        assert balances['confirmed'] + balances['unconfirmed'] == sum(c['amount'] for c in unspent)
+        assert set(balances['wallets']) == {"vault0", "vault1", "vault2"}
+
+        ret = liana.list_confirmed_tx(0, 2 ** 32, 1000)
+        assert ret['errors'] == {}
+        times = [tx['time'] for tx in ret['transactions']]
+        assert times == sorted(times)
+        assert {tx['wallet'] for tx in ret['transactions']} == {"vault0", "vault1", "vault2"}
+
+
+def test_fleet_failures(fleet, tmp_path):
+    def getinfo(params):
+        raise MockRpcError(-32000, "Database error")
+
+    fleet[1].handlers["getinfo"] = getinfo
+    del fleet[2].handlers["listcoins"]
+    paths = [s.socket_path for s in fleet] + [str(tmp_path / "missing")]
+    with LianaFleet(paths) as liana:
+        ret = liana.get_info()
+        assert set(ret['wallets']) == {fleet[0].socket_path, fleet[2].socket_path}
+        assert set(ret['errors']) == {fleet[1].socket_path, str(tmp_path / "missing")}
+        assert ret['errors'][fleet[1].socket_path]['message'] == "Database error"
+        assert "FileNotFoundError" in ret['errors'][str(tmp_path / "missing")]
+
+        ret = liana.list_coins()
+        assert ret['errors'][fleet[2].socket_path]['code'] == -32601
+        assert {c['wallet'] for c in ret['coins']} == {fleet[0].socket_path, fleet[1].socket_path}
+
+        # A wallet coming back is queried again.
+        server = MockLianad(str(tmp_path / "missing"), {"getinfo": lambda params: {"block_height": 1}}).start()
+        try:
+            assert liana.get_info()['wallets'][str(tmp_path / "missing")] == {"block_height": 1}
+        finally:
+            server.stop()
+
+
+def test_fleet_concurrency(fleet):
+    for server in fleet:
+        server.handlers["getinfo"] = lambda params: time.sleep(0.2) or {"block_height": 1}
+    with LianaFleet([s.socket_path for s in fleet]) as liana:
+        start = time.monotonic()
+        assert len(liana.get_info()['wallets']) == 3
+        assert time.monotonic() - start < 0.5
+
+
+def test_fleet_timeout(fleet):
+    fleet[0].handlers["getinfo"] = lambda params: time.sleep(0.5) or {"block_height": 1}
+    with LianaFleet([s.socket_path for s in fleet], timeout=0.2) as liana:
+        start = time.monotonic()
+        ret = liana.get_info()
+        assert time.monotonic() - start < 0.4
+        assert list(ret['errors']) == [fleet[0].socket_path]
+        assert len(ret['wallets']) == 2
+
+
+def test_fleet_timeout_frees_worker(fleet):
+    hang = {"delay": 1.0}
+    fleet[0].handlers["getinfo"] = lambda params: time.sleep(hang["delay"]) or {"block_height": 1}
+    with LianaFleet([s.socket_path for s in fleet], timeout=0.2, max_workers=2) as liana:
+        assert list(liana.get_info()['errors']) == [fleet[0].socket_path]
+        # The hung connection was dropped, and the worker it held is free again.
+        assert fleet[0].socket_path not in liana.clients
+        hang["delay"] = 0
+        ret = liana.get_info()
+        assert ret['errors'] == {}
+        assert len(ret['wallets']) == 3
+        assert all(c.rpc.timeouts["getinfo"] <= 0.2 for c in liana.clients.values())
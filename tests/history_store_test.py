@@ -0,0 +1,97 @@
+from liana_rpc.history_store import GENESIS_TIME, HistoryStore
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.psbt import transaction_txid
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+FIELDS = ("outpoint", "amount", "block_height", "address", "derivation_index", "is_change", "spend_info")
+
+
+def confirmed(wallet) -> list:
+    return sorted((tx["time"], transaction_txid(tx["tx"])) for tx in wallet.confirmed)
+
+
+def listconfirmed_params(lianad) -> list:
+    return [r["params"] for r in lianad.requests if r["method"] == "listconfirmed"]
+
+
+def test_history_store(tmp_path):
+    wallet = SyntheticWallet(coins=300, spent=0.3, block_height=1000)
+    path = str(tmp_path / "history.sqlite")
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        liana.update_psbts([wallet.createspend({"outpoints": [c["outpoint"]], "destinations": {"tb1qaddr": 1000}})
+                            ["psbt"] for c in wallet.coins[:3]])
+        with HistoryStore(liana, path, page_size=50) as store:
+            assert store.block_height is None
+            assert store.sync() == {"transactions": len(wallet.confirmed), "coins": 300, "spend_txs": 3}
+            assert store.block_height == 1000
+
+        # A new process queries the store without calling lianad.
+        calls = len(lianad.requests)
+        with HistoryStore(None, path) as store:
+            txs = store.transactions()
+            assert [(tx["time"], tx["txid"]) for tx in txs] == confirmed(wallet)
+            assert txs[0]["txid"] == transaction_txid(txs[0]["tx"])
+            assert store.transaction(txs[5]["txid"]) == txs[5]
+            assert store.transactions(start=txs[10]["time"], limit=3) == txs[10:13]
+            assert store.transactions(min_height=900) == [tx for tx in txs if tx["height"] >= 900]
+            assert store.coins() == sorted(({f: c[f] for f in FIELDS} for c in wallet.coins),
+                                           key=lambda c: (c["block_height"] is None, c["block_height"] or 0,
+                                                          c["outpoint"]))
+            assert len(store.coins(spent=False)) == 300
+            assert store.coin(wallet.coins[7]["outpoint"])["amount"] == wallet.coins[7]["amount"]
+            assert len(store.spend_txs()) == 3
+        assert len(lianad.requests) == calls
+
+        # Incremental sync: a new block with a payment, a coin spent in it, a spend transaction deleted.
+        with HistoryStore(liana, path, page_size=50) as store:
+            wallet.block_height += 1
+            coin = wallet.receive(5000, height=wallet.block_height)
+            spent = next(c for c in wallet.coins if c["block_height"] is not None and not c["spend_info"])
+            wallet.update_coin(spent["outpoint"], spend_info={"txid": "ab" * 32, "height": wallet.block_height})
+            wallet.spend_txs.pop(next(iter(wallet.spend_txs)))
+            assert store.sync() == {"transactions": 1, "coins": 2, "spend_txs": 0}
+            assert listconfirmed_params(lianad)[-1]["start"] > GENESIS_TIME
+            assert store.coin(coin["outpoint"])["block_height"] == wallet.block_height
+            assert store.coin(spent["outpoint"])["spend_info"]["height"] == wallet.block_height
+            assert spent not in store.coins(spent=False)
+            assert len(store.spend_txs()) == 2
+            assert len(store.transactions()) == len(wallet.confirmed)
+
+            # The block is reorganized: its transaction is replaced by another one.
+            wallet.confirmed.remove(wallet.txs.pop(coin["outpoint"].split(":")[0]))
+            wallet.coins.remove(coin)
+            del wallet.by_outpoint[coin["outpoint"]]
+            wallet.update_coin(spent["outpoint"], spend_info={"txid": "ab" * 32, "height": None})
+            other = wallet.receive(6000, height=wallet.block_height)
+            assert store.sync()["transactions"] == 1
+            assert store.coin(coin["outpoint"]) is None
+            assert store.coin(other["outpoint"]) is not None
+            assert store.coin(spent["outpoint"])["spend_info"]["height"] is None
+            assert [(tx["time"], tx["txid"]) for tx in store.transactions()] == confirmed(wallet)
+
+            lianad.handlers.pop("listspendtxs")
+            assert "error" in store.sync()
+            assert store.coin(other["outpoint"]) is not None
+
+
+def test_history_store_other_wallet(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    wallet = SyntheticWallet(coins=10)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        with HistoryStore(LianaRPC(lianad.socket_path), path) as store:
+            assert "error" not in store.sync()
+        lianad.handlers["getinfo"] = lambda params: dict(wallet.getinfo(params), descriptors={"main": "other"})
+        with HistoryStore(LianaRPC(lianad.socket_path), path) as store:
+            assert "another wallet" in store.sync()["error"]
+
+
+def test_history_store_undecodable_transaction(tmp_path):
+    wallet = SyntheticWallet(coins=10, block_height=1000)
+    wallet.confirmed.append({"tx": "0200", "height": 1000, "time": wallet.confirmed[-1]["time"]})
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        with HistoryStore(LianaRPC(lianad.socket_path)) as store:
+            # Skipped, without failing the sync.
+            assert store.sync()["transactions"] == len(wallet.confirmed) - 1
+            assert "0200" not in [tx["tx"] for tx in store.transactions()]
+            assert "error" not in store.sync()
@@ -0,0 +1,40 @@
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.rpc import RpcError
+
+# 7 transactions in the same block, to overflow a page.
+TXS = [{"tx": f"{i:04x}", "height": i, "time": 1000 + i * 10} for i in range(50)]
+TXS += [{"tx": f"ff{i:02x}", "height": 100, "time": 1200} for i in range(7)]
+
+
+def listconfirmed(descending):
+    def handler(params):
+        txs = [tx for tx in TXS if params["start"] <= tx["time"] <= params["end"]]
+        txs.sort(key=lambda tx: (tx["time"], tx["tx"]), reverse=descending)
+        return {"transactions": txs[:params["limit"]]}
+    return handler
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_confirmed_txs(lianad, descending, prefetch):
+    lianad.handlers["listconfirmed"] = listconfirmed(descending)
+    liana = LianaRPC(lianad.socket_path)
+    txs = list(liana.iter_confirmed_txs(start=1, end=2000, page_size=5, prefetch=prefetch))
+    assert sorted(tx["tx"] for tx in txs) == sorted(tx["tx"] for tx in TXS)
+    times = [tx["time"] for tx in txs]
+    assert times == sorted(times, reverse=descending)
+
+
+def test_iter_confirmed_txs_window(lianad):
+    lianad.handlers["listconfirmed"] = listconfirmed(True)
+    liana = LianaRPC(lianad.socket_path)
+    txs = list(liana.iter_confirmed_txs(start=1100, end=1150, page_size=2))
+    assert [tx["time"] for tx in txs] == [1150, 1140, 1130, 1120, 1110, 1100]
+
+
+def test_iter_confirmed_txs_error(lianad):
+    liana = LianaRPC(lianad.socket_path)
+    with pytest.raises(RpcError):
+        next(liana.iter_confirmed_txs())
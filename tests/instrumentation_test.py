@@ -0,0 +1,57 @@
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.instrumentation import Histogram, Instrumentation
+from liana_rpc.utils.rpc import UnixDomainSocketRpc
+from tests.mock_lianad import MockRpcError
+
+
+def test_histogram():
+    h = Histogram((1, 10, 100))
+    for value in (0.5, 5, 5, 50, 500):
+        h.observe(value)
+    assert h.quantile(0.5) == 10
+    assert h.quantile(0.99) == float("inf")
+    snapshot = h.snapshot()
+    assert snapshot["buckets"] == [(1, 1), (10, 3), (100, 4), (float("inf"), 5)]
+    assert snapshot["count"] == 5 and snapshot["sum"] == 560.5
+
+
+def test_instrumented_calls(lianad):
+    def fail(params):
+        raise MockRpcError(-32000, "nope")
+
+    coins = [{"amount": i, "outpoint": f"{i:064x}:0"} for i in range(5000)]
+    lianad.handlers.update({"getinfo": lambda params: {"block_height": 1}, "listcoins": lambda params: {"coins": coins},
+                            "stop": fail})
+    before, after = [], []
+    instrumentation = Instrumentation(pre_hooks=[lambda method, params: before.append(method)],
+                                      post_hooks=[after.append])
+    liana = LianaRPC(lianad.socket_path, instrumentation=instrumentation)
+    liana.get_info()
+    liana.get_info()
+    assert len(liana.list_coins()) == 5000
+    assert "error" in liana.stop_lianad()
+    liana.rpc.call_many([("getinfo", {}), ("stop", {})])
+
+    assert before == ["getinfo", "getinfo", "listcoins", "stop", "getinfo", "stop"]
+    assert [s.method for s in after] == before
+    stats = after[2]
+    assert stats.response_bytes > 65536 and stats.recv_calls > 1
+    assert 0 < stats.parse < stats.total and stats.first_byte is not None
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot["getinfo"]["calls"] == 3 and snapshot["getinfo"]["errors"] == 0
+    assert snapshot["stop"]["errors"] == 2
+    assert snapshot["getinfo"]["phases"]["total"]["count"] == 3
+    assert snapshot["listcoins"]["response_bytes"]["sum"] == stats.response_bytes
+
+    text = instrumentation.to_prometheus()
+    assert "# TYPE liana_rpc_phase_seconds histogram" in text
+    assert 'liana_rpc_phase_seconds_count{method="getinfo",phase="parse"} 3' in text
+    assert 'liana_rpc_errors_total{method="stop"} 2' in text
+
+
+def test_no_instrumentation(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    assert rpc.call("getinfo") == {"block_height": 1}
+    assert rpc._frame_stats is None
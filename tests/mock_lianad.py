@@ -0,0 +1,321 @@
+import argparse
+import base64
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+
+from liana_rpc.utils.psbt import psbt_txid, segwit_address, sha256d
+
+
+class MockLianad(object):
+    """A stand-in for lianad listening on a Unix socket.
+
+    It speaks the same newline-delimited JSON-RPC as lianad: each request is
+    answered by calling `handlers[method](params)`, a handler raising
+    `MockRpcError` is answered with an error object. A handler may return
+    bytes, the JSON encoding of the result, to save encoding a large result on
+    every call. If `concurrent` is set,
+    the requests received on a connection are handled in parallel and their
+    replies sent as soon as they are ready, possibly out of order. `latency`
+    seconds are waited every time lianad wakes up to read requests, to mimic the
+    cost of a round trip.
+    """
+
+    def __init__(self, socket_path: str, handlers: dict = None, concurrent: bool = False,
+                 latency: float = 0):
+        self.socket_path = socket_path
+        self.handlers = handlers if handlers is not None else {}
+        self.concurrent = concurrent
+        self.latency = latency
+        self.server = None
+        self.thread = None
+        self.connections = []
+        self.requests = []
+
+    def start(self) -> "MockLianad":
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        self.server.listen(128)
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+            self.server = None
+        self.drop_connections()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def drop_connections(self) -> None:
+        """Close all the client connections, as a restarting lianad would."""
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.connections = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except (OSError, AttributeError):
+                return
+            self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        send_lock = threading.Lock()
+        buff = b""
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            if self.latency:
+                time.sleep(self.latency)
+            buff += chunk
+            while b"\n" in buff:
+                line, buff = buff.split(b"\n", 1)
+                if self.concurrent:
+                    threading.Thread(target=self._reply, args=(conn, send_lock, line), daemon=True).start()
+                elif not self._reply(conn, send_lock, line):
+                    return
+
+    def _reply(self, conn, send_lock, line: bytes) -> bool:
+        resp = self.respond(json.loads(line))
+        try:
+            with send_lock:
+                conn.sendall(resp + b"\n")
+            return True
+        except OSError:
+            return False
+
+    def respond(self, request: dict) -> bytes:
+        self.requests.append(request)
+        method = request["method"]
+        resp = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            if method not in self.handlers:
+                raise MockRpcError(-32601, f"Method not found: {method}")
+            result = self.handlers[method](request.get("params"))
+        except MockRpcError as e:
+            resp["error"] = {"code": e.code, "message": e.message}
+            return json.dumps(resp).encode()
+        if isinstance(result, bytes):
+            return json.dumps(resp)[:-1].encode() + b', "result": ' + result + b"}"
+        resp["result"] = result
+        return json.dumps(resp).encode()
+
+
+class MockRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super(Exception, self).__init__(message)
+        self.code = code
+        self.message = message
+
+
+DESCRIPTOR = "wsh(or_d(multi(2,[c4fb74e6/48'/1'/0'/2']tpubDE4XEBLMec4eRURN3QGNFGJZcvPT7r1AGELL7P5fbiBp2txJCRfAmNHnjCF1YZsbzkQYZKVpTvRGWLbwYGgFHp6Sb8atSWKyzKsv4dUp1vY/<0;1>/*,[a5c6b76e/48'/1'/0'/2']tpubDF5861hj6vR3iJr3aPjGJz4rNbqDCRujQ21mczzKT5SiedaQqNVgHC8HT9ceyxvMFRoPMx4P6HAcL3NZrUPhRUbwCyj3TKSa64bAfnE3sLh/<0;1>/*),and_v(v:pkh([a5c6b76e/48'/1'/1'/2']tpubDFhfKfRZcoXt9uMAWCEmtbv5sFaZ3o9bUyQ74Gj1UxxS5MHENpBhMXmc6gfkMXoJnDTfso1Gzyb2DpwpPVeJsgGee1qXAAQ1AhBNqFG6Mwt/<0;1>/*),older(10))))"
+
+
+def _varint(n: int) -> bytes:
+    if n < 0xFD:
+        return bytes([n])
+    return b"\xfd" + struct.pack("<H", n) if n <= 0xFFFF else b"\xfe" + struct.pack("<I", n)
+
+
+def _raw_transaction(prevout: bytes, amounts: list, rng) -> bytes:
+    """A non-segwit serialized transaction paying P2WSH outputs."""
+    outputs = b"".join(struct.pack("<q", a) + b"\x22\x00\x20" + rng.randbytes(32) for a in amounts)
+    return (b"\x02\x00\x00\x00\x01" + prevout + b"\x00\xfd\xff\xff\xff" + _varint(len(amounts)) + outputs
+            + b"\x00\x00\x00\x00")
+
+
+def coin_status(coin: dict) -> str:
+    if coin["spend_info"]:
+        return "spending" if coin["spend_info"]["height"] is None else "spent"
+    return "unconfirmed" if coin["block_height"] is None else "confirmed"
+
+
+class SyntheticWallet(object):
+    """A wallet of generated coins and transactions, served through the handlers of a MockLianad.
+
+    Each transaction pays `outputs_per_tx` outputs to the wallet, which are its
+    coins: raise it to make the transactions, and so the `listtransactions`
+    replies and the PSBTs embedding them, larger. A fraction `spent` of the
+    coins is marked as spent.
+    """
+
+    def __init__(self, coins: int = 1000, outputs_per_tx: int = 2, spent: float = 0.2, block_height: int = 200000,
+                 seed: int = 0):
+        rng = random.Random(seed)
+        self.block_height = block_height
+        self.txs = {}
+        self.coins = []
+        self.spend_txs = {}
+        self.address_index = 0
+        # Encoding an address per coin would be slow for large wallets, they are reused.
+        addresses = [segwit_address("tb", 0, rng.randbytes(32)) for _ in range(min(coins, 1000))]
+        for i in range(0, coins, outputs_per_tx):
+            amounts = [int(10 ** rng.uniform(3, 7)) for _ in range(min(outputs_per_tx, coins - i))]
+            raw = _raw_transaction(rng.randbytes(32) + b"\x00" * 4, amounts, rng)
+            txid = sha256d(raw)[::-1].hex()
+            height = block_height - rng.randrange(block_height // 2) if rng.random() < 0.98 else None
+            self.txs[txid] = {"tx": raw.hex(), "height": height,
+                              "time": None if height is None else 1600000000 + height * 600}
+            for vout, amount in enumerate(amounts):
+                spend = {"txid": rng.randbytes(32).hex(), "height": None} if rng.random() < spent else None
+                self.coins.append({
+                    "address": addresses[len(self.coins) % len(addresses)],
+                    "amount": amount,
+                    "derivation_index": len(self.coins),
+                    "outpoint": f"{txid}:{vout}",
+                    "block_height": height,
+                    "spend_info": spend,
+                    "is_immature": False,
+                    "is_change": False,
+                })
+        self.by_outpoint = {c["outpoint"]: c for c in self.coins}
+        self.confirmed = sorted((tx for tx in self.txs.values() if tx["time"] is not None), key=lambda tx: tx["time"])
+        self._coins_json = None
+
+    def handlers(self) -> dict:
+        return {
+            "getinfo": self.getinfo,
+            "getnewaddress": self.getnewaddress,
+            "listcoins": self.listcoins,
+            "listtransactions": self.listtransactions,
+            "listconfirmed": self.listconfirmed,
+            "createspend": self.createspend,
+            "updatespend": self.updatespend,
+            "listspendtxs": self.listspendtxs,
+            "delspendtx": self.delspendtx,
+            "broadcastspend": self.broadcastspend,
+        }
+
+    def getinfo(self, params):
+        return {
+            "version": "5.0.0",
+            "network": "signet",
+            "block_height": self.block_height,
+            "sync": 1.0,
+            "descriptors": {"main": {"multi_desc": DESCRIPTOR}},
+            "rescan_progress": None,
+        }
+
+    def getnewaddress(self, params):
+        self.address_index += 1
+        return {"address": segwit_address("tb", 0, sha256d(struct.pack("<I", self.address_index)))}
+
+    def listcoins(self, params):
+        if params and (params.get("statuses") or params.get("outpoints")):
+            statuses, outpoints = params.get("statuses"), params.get("outpoints")
+            return {"coins": [c for c in self.coins if (not statuses or coin_status(c) in statuses)
+                              and (not outpoints or c["outpoint"] in outpoints)]}
+        if self._coins_json is None:
+            self._coins_json = json.dumps({"coins": self.coins}).encode()
+        return self._coins_json
+
+    def receive(self, amount: int, height: int = None) -> dict:
+        """Add a coin paid by a new transaction."""
+        raw = _raw_transaction(sha256d(struct.pack("<I", len(self.coins))) + b"\x00" * 4, [amount],
+                               random.Random(len(self.coins)))
+        txid = sha256d(raw)[::-1].hex()
+        self.txs[txid] = {"tx": raw.hex(), "height": height,
+                          "time": None if height is None else 1600000000 + height * 600}
+        coin = {"address": self.coins[0]["address"] if self.coins else segwit_address("tb", 0, bytes(32)),
+                "amount": amount, "derivation_index": len(self.coins), "outpoint": f"{txid}:0",
+                "block_height": height, "spend_info": None, "is_immature": False, "is_change": False}
+        self.coins.append(coin)
+        self.by_outpoint[coin["outpoint"]] = coin
+        if height is not None:
+            self.confirmed.append(self.txs[txid])
+            self.confirmed.sort(key=lambda tx: tx["time"])
+        self._coins_json = None
+        return coin
+
+    def update_coin(self, outpoint: str, **fields) -> None:
+        """Change fields of a coin, e.g. its block_height or spend_info."""
+        self.by_outpoint[outpoint].update(fields)
+        self._coins_json = None
+
+    def listtransactions(self, params):
+        return {"transactions": [self.txs[txid] for txid in params["txids"] if txid in self.txs]}
+
+    def listconfirmed(self, params):
+        txs = [tx for tx in self.confirmed if params["start"] <= tx["time"] <= params["end"]]
+        return {"transactions": txs[:params["limit"]]}
+
+    def createspend(self, params):
+        """A PSBT spending the outpoints, with the previous transactions as their non-witness UTXOs."""
+        inputs, maps = b"", b""
+        for outpoint in params["outpoints"]:
+            if outpoint not in self.by_outpoint:
+                raise MockRpcError(-32602, f"Unknown outpoint: {outpoint}")
+            txid, vout = outpoint.split(":")
+            inputs += bytes.fromhex(txid)[::-1] + struct.pack("<I", int(vout)) + b"\x00\xfd\xff\xff\xff"
+            prev_tx = bytes.fromhex(self.txs[txid]["tx"])
+            maps += b"\x01\x00" + _varint(len(prev_tx)) + prev_tx + b"\x00"
+        outputs = b"".join(struct.pack("<q", amount) + b"\x22\x00\x20" + sha256d(address.encode())
+                           for address, amount in params["destinations"].items())
+        tx = (b"\x02\x00\x00\x00" + _varint(len(params["outpoints"])) + inputs
+              + _varint(len(params["destinations"])) + outputs + b"\x00\x00\x00\x00")
+        psbt = b"psbt\xff\x01\x00" + _varint(len(tx)) + tx + b"\x00" + maps + b"\x00" * len(params["destinations"])
+        return {"psbt": base64.b64encode(psbt).decode()}
+
+    def updatespend(self, params):
+        self.spend_txs[psbt_txid(params["psbt"])] = {"psbt": params["psbt"], "updated_at": int(time.time())}
+        return {}
+
+    def listspendtxs(self, params):
+        return {"spend_txs": list(self.spend_txs.values())}
+
+    def delspendtx(self, params):
+        self.spend_txs.pop(params["txid"], None)
+        return {}
+
+    def broadcastspend(self, params):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stand-in lianad serving a synthetic wallet.")
+    parser.add_argument("socket_path")
+    parser.add_argument("--coins", type=int, default=1000)
+    parser.add_argument("--outputs-per-tx", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0)
+    args = parser.parse_args()
+
+    wallet = SyntheticWallet(args.coins, args.outputs_per_tx)
+    with MockLianad(args.socket_path, wallet.handlers(), latency=args.latency):
+        print(f"Serving {len(wallet.coins)} coins on {args.socket_path}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -20,4 +20,38 @@ def test_multi_lianad():
 def test_no_lianad():
     socket = []
     with patch('liana_rpc.liana_rpc.get_liana_instances', return_value=socket):
-        LianaRPC()
\ No newline at end of file
+        LianaRPC()
+
+
+def test_batch_wrappers(lianad):
+    lianad.handlers["getnewaddress"] = lambda params: {"address": f"tb1q{len(lianad.requests)}"}
+    lianad.handlers["delspendtx"] = lambda params: {}
+    txs = {"aa": {"tx": "01", "height": 1, "time": 2}}
+    lianad.handlers["listtransactions"] = lambda params: {
+        "transactions": [txs[txid] for txid in params["txids"] if txid in txs]
+    }
+    liana = LianaRPC(lianad.socket_path)
+    assert liana.get_new_addresses(3) == ["tb1q1", "tb1q2", "tb1q3"]
+    assert liana.del_psbts(["aa", "bb"]) == [{"ok": True}, {"ok": True}]
+    assert liana.fetch_txs(["aa", "bb"]) == [txs["aa"], {"error": "Transaction not found: bb"}]
+    assert "error" in liana.broadcast_psbts(["aa"])[0]
+
+
+def test_synthetic_wallet(tmp_path):
+    from liana_rpc.utils.psbt import decode_psbt, transaction_txid
+    from tests.mock_lianad import MockLianad, SyntheticWallet
+
+    wallet = SyntheticWallet(coins=101, outputs_per_tx=10)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        coins = liana.list_coins()
+        assert coins == wallet.coins
+        assert len(coins) == 101
+        txids = list(wallet.txs)
+        assert [transaction_txid(tx["tx"]) for tx in liana.list_txs(txids)] == txids
+
+        outpoints = [coins[0]["outpoint"], coins[15]["outpoint"]]
+        psbt = decode_psbt(liana.create_psbt(outpoints, {"tb1qaddr": 1000}, 1), network="signet")
+        assert [f"{i['txid']}:{i['vout']}" for i in psbt["tx"]["vin"]] == outpoints
+        assert psbt["inputs"][0]["non_witness_utxo"]["txid"] == txids[0]
+        assert "error" in liana.create_psbt(["00" * 32 + ":0"], {"tb1qaddr": 1000}, 1)
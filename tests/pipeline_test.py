@@ -0,0 +1,92 @@
+import socket
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.pipeline import PsbtPipeline
+from liana_rpc.utils.psbt import psbt_txid
+from tests.mock_lianad import MockLianad, MockRpcError, SyntheticWallet
+
+
+def signed_psbts(wallet: SyntheticWallet, n: int) -> list:
+    return [wallet.createspend({"outpoints": [coin["outpoint"]], "destinations": {"tb1qaddr": 1000}})["psbt"]
+            for coin in wallet.coins[:n]]
+
+
+def calls(lianad, method: str) -> int:
+    return len([r for r in lianad.requests if r["method"] == method])
+
+
+def test_pipeline(tmp_path):
+    wallet = SyntheticWallet(coins=100)
+    psbts = signed_psbts(wallet, 95)
+    rejected = psbt_txid(psbts[10])
+
+    def broadcastspend(params):
+        if params["txid"] == rejected:
+            raise MockRpcError(-32603, "Missing signatures")
+        return {}
+
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers(), concurrent=True) as lianad:
+        lianad.handlers["broadcastspend"] = broadcastspend
+        liana = LianaRPC(lianad.socket_path, pool_size=4)
+        results = PsbtPipeline(liana, batch_size=10, concurrency=4).run(iter(psbts + ["not a psbt"]))
+
+        assert [r.psbt for r in results] == psbts + ["not a psbt"]
+        assert [r.txid for r in results[:-1]] == [psbt_txid(psbt) for psbt in psbts]
+        assert all(r.ok and r.stage == "delete" for i, r in enumerate(results[:-1]) if i != 10)
+        assert results[10].to_dict() == {"txid": rejected, "stage": "update",
+                                          "error": {"code": -32603, "message": "Missing signatures"}, "retries": 0}
+        assert results[-1].stage is None and "Cannot decode psbt" in results[-1].error
+
+        assert calls(lianad, "updatespend") == 95
+        assert calls(lianad, "broadcastspend") == 95
+        # The rejected PSBT is kept in the database of lianad.
+        assert calls(lianad, "delspendtx") == 94
+        assert list(wallet.spend_txs) == [rejected]
+
+
+def test_pipeline_retries(lianad):
+    wallet = SyntheticWallet(coins=10)
+    lianad.handlers.update(wallet.handlers())
+    liana = LianaRPC(lianad.socket_path)
+    failures = {"broadcast": 2}
+    broadcast_psbts = liana.broadcast_psbts
+
+    def flaky_broadcast(txids):
+        if failures["broadcast"]:
+            failures["broadcast"] -= 1
+            raise ConnectionRefusedError("Connection refused")
+        return broadcast_psbts(txids)
+
+    liana.broadcast_psbts = flaky_broadcast
+    results = PsbtPipeline(liana, delete=False, concurrency=1).run(signed_psbts(wallet, 5))
+    assert [(r.ok, r.stage, r.retries) for r in results] == [(True, "broadcast", 2)] * 5
+    # Only the stage that failed is run again.
+    assert calls(lianad, "updatespend") == 5
+    assert calls(lianad, "broadcastspend") == 5
+    assert calls(lianad, "delspendtx") == 0
+
+    failures["broadcast"] = 3
+    results = PsbtPipeline(liana, max_attempts=3).run(signed_psbts(wallet, 2))
+    assert [(r.stage, r.error, r.retries) for r in results] == \
+        [("update", "ConnectionRefusedError: Connection refused", 3)] * 2
+    assert calls(lianad, "delspendtx") == 0
+
+
+def test_pipeline_broadcast_timeout(lianad):
+    wallet = SyntheticWallet(coins=10)
+    lianad.handlers.update(wallet.handlers())
+    liana = LianaRPC(lianad.socket_path)
+    broadcast_psbts = liana.broadcast_psbts
+
+    def timed_out_broadcast(txids):
+        # The PSBTs were broadcast, but the replies were not received in time.
+        broadcast_psbts(txids)
+        raise socket.timeout("timed out")
+
+    liana.broadcast_psbts = timed_out_broadcast
+    results = PsbtPipeline(liana).run(signed_psbts(wallet, 5))
+    # Not broadcast again, and kept in lianad since it is unknown whether they were.
+    assert [r.to_dict()["broadcast_unknown"] for r in results] == [True] * 5
+    assert [(r.stage, r.error, r.retries) for r in results] == [("update", "TimeoutError: timed out", 1)] * 5
+    assert calls(lianad, "broadcastspend") == 5
+    assert calls(lianad, "delspendtx") == 0
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.pool import UnixDomainSocketRpcPool
+
+
+def slow_getinfo(params):
+    time.sleep(0.1)
+    return {"block_height": 1}
+
+
+def test_pool_concurrent_calls(lianad):
+    lianad.handlers["getinfo"] = slow_getinfo
+    liana = LianaRPC(lianad.socket_path, pool_size=4)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(liana.get_info())) for _ in range(8)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [{"block_height": 1}] * 8
+    # 8 calls of 100ms over 4 connections.
+    assert time.monotonic() - start < 0.6
+    assert len(lianad.connections) == 4
+
+
+def test_pool_lazy_connect_and_reuse(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    pool = UnixDomainSocketRpcPool(lianad.socket_path, size=2)
+    assert len(lianad.connections) == 0
+    pool.call("getinfo")
+    pool.call("getinfo")
+    assert len(lianad.connections) == 1
+
+
+def test_pool_checkout_timeout(lianad):
+    pool = UnixDomainSocketRpcPool(lianad.socket_path, size=1)
+    rpc = pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+    pool.checkin(rpc)
+    assert pool.checkout(timeout=0.05) is rpc
+
+
+def test_pool_replaces_broken_connection(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    pool = UnixDomainSocketRpcPool(lianad.socket_path, size=1, health_check_interval=0)
+    pool.call("getinfo")
+    lianad.drop_connections()
+    time.sleep(0.01)
+    assert pool.call("getinfo") == {"block_height": 1}
+
+
+def test_pool_idle_eviction(lianad):
+    pool = UnixDomainSocketRpcPool(lianad.socket_path, size=1, idle_timeout=0.01)
+    rpc = pool.checkout()
+    pool.checkin(rpc)
+    time.sleep(0.02)
+    assert pool.checkout() is not rpc
+    assert rpc.sock is None
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.proxy import LianaProxy
+from liana_rpc.utils.rpc import UnixDomainSocketRpc
+
+
+@pytest.fixture
+def proxy(lianad, tmp_path):
+    lianad.concurrent = True
+    state = {"block_height": 1}
+    lianad.handlers["getinfo"] = lambda params: {"block_height": state["block_height"]}
+    lianad.handlers["listcoins"] = lambda params: time.sleep(0.1) or {"coins": [{"amount": state["block_height"]}]}
+    lianad.handlers["broadcastspend"] = lambda params: {}
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    proxy = LianaProxy(lianad.socket_path, str(tmp_path / "proxy_rpc"), max_age=10, height_check_interval=0.05)
+    asyncio.run_coroutine_threadsafe(proxy.start(), loop).result()
+    proxy.state = state
+    yield proxy
+    asyncio.run_coroutine_threadsafe(proxy.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def upstream_calls(lianad, method: str) -> int:
+    return len([r for r in lianad.requests if r["method"] == method])
+
+
+def test_proxy_coalesces_calls(lianad, proxy):
+    results = []
+
+    def client():
+        results.append(LianaRPC(proxy.listen_path).list_coins())
+
+    threads = [threading.Thread(target=client) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [[{"amount": 1}]] * 20
+    assert upstream_calls(lianad, "listcoins") == 1
+
+    # Served from the cache.
+    assert LianaRPC(proxy.listen_path).list_coins() == [{"amount": 1}]
+    assert upstream_calls(lianad, "listcoins") == 1
+    assert proxy.stats["coalesced"] + proxy.stats["cache_hits"] == 20
+
+
+def test_proxy_invalidation(lianad, proxy):
+    liana = LianaRPC(proxy.listen_path)
+    assert liana.list_coins() == [{"amount": 1}]
+    assert liana.get_info() == {"block_height": 1}
+
+    proxy.state["block_height"] = 2
+    time.sleep(0.1)
+    assert liana.list_coins() == [{"amount": 2}]
+    assert liana.get_info() == {"block_height": 2}
+    assert upstream_calls(lianad, "listcoins") == 2
+
+    # A call that may modify the wallet drops the cache.
+    assert liana.broadcast_psbt("00" * 32) == {'ok': True}
+    assert liana.list_coins() == [{"amount": 2}]
+    assert upstream_calls(lianad, "listcoins") == 3
+
+
+def test_proxy_errors(lianad, proxy):
+    rpc = UnixDomainSocketRpc(proxy.listen_path)
+    assert rpc.call("unknown")["error"]["code"] == -32601
+    assert rpc.call("listspendtxs")["error"]["code"] == -32601
+    # Errors are not cached.
+    lianad.handlers["listspendtxs"] = lambda params: {"spend_txs": []}
+    assert rpc.call("listspendtxs") == {"spend_txs": []}
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(proxy.listen_path)
+    sock.sendall(b'not json\n{"id": 3}\n')
+    replies = sock.makefile("rb")
+    assert json.loads(replies.readline())["error"]["code"] == -32700
+    assert json.loads(replies.readline()) == {"jsonrpc": "2.0", "id": 3,
+                                              "error": {"code": -32600, "message": "Invalid request"}}
+    sock.close()
+
+    # Results that are not objects are relayed, not left unanswered.
+    lianad.handlers["listconfirmed"] = lambda params: None
+    assert rpc.call("listconfirmed", timeout=2) is None
+    lianad.handlers["getnewaddress"] = lambda params: None
+    assert rpc.call("getnewaddress", timeout=2) is None
+
+    lianad.stop()
+    ret = rpc.call("getnewaddress")
+    assert ret["error"]["code"] == -32603
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.recovery import RecoveryPlanner, recovery_timelocks
+from liana_rpc.utils.coin_selection import BASE_WEIGHT, DUST, SelectionError, input_weight, output_weight
+from tests.coin_selection_test import ADDRESS, DESCRIPTOR
+
+
+def coin(i: int, amount: int, height, spent: bool = False) -> dict:
+    return {"amount": amount, "block_height": height, "outpoint": f"{i:064x}:0",
+            "spend_info": {"txid": "aa" * 32, "height": None} if spent else None}
+
+
+def test_recovery_timelocks():
+    assert recovery_timelocks(DESCRIPTOR) == [10, 20]
+    assert recovery_timelocks("tr(K,{pk(A),{and_v(v:multi_a(1,B,C),older(100)),and_v(v:pk(D),older(52560))}})") \
+        == [100, 52560]
+    assert recovery_timelocks("wpkh(xpub/0/*)") == []
+    with pytest.raises(SelectionError):
+        recovery_timelocks("wsh(or_d(")
+
+
+def test_plan():
+    coins = [coin(0, 100000, 90), coin(1, 200000, 95), coin(2, 300000, 95), coin(3, 50000, None),
+             coin(4, 70000, 80, spent=True), coin(5, 1000, 99)]
+    planner = RecoveryPlanner(coins, 100, DESCRIPTOR)
+    assert planner.timelocks == [10, 20]
+
+    # Coins confirmed at height h are recoverable with older(10) from height h + 9.
+    assert planner.recoverable() == [coins[0]]
+    assert planner.recoverable(block_height=104) == coins[:3]
+    assert planner.recoverable(20) == []
+    assert planner.recoverable_at(coins[1]) == 104
+
+    fee = planner.fee(1, 10, ADDRESS)
+    assert fee == -(-10 * (BASE_WEIGHT + input_weight(DESCRIPTOR, primary_path=False) + output_weight(ADDRESS)) // 4)
+    assert planner.plan(10, address=ADDRESS) == {
+        "timelock": 10, "coins": 1, "amount": 100000, "fee": fee, "sweep_amount": 100000 - fee, "possible": True,
+        "pending_coins": 3, "pending_amount": 501000, "next_height": 104,
+    }
+    assert [(p["timelock"], p["coins"], p["possible"], p["next_height"]) for p in planner.plans(10)] == \
+        [(10, 1, True, 104), (20, 0, False, 109)]
+    # Not worth it at a high feerate.
+    assert not planner.plan(1000)["possible"]
+    assert planner.schedule() == [(104, 2, 500000), (108, 1, 1000)]
+    assert planner.schedule(20, block_height=114) == [(118, 1, 1000)]
+
+    with pytest.raises(ValueError):
+        RecoveryPlanner(coins, 100, timelocks=[]).plan(1)
+
+
+def test_plan_many_coins():
+    rng = random.Random(0)
+    coins = [coin(i, rng.randrange(DUST, 10 ** 7), rng.randrange(1, 100000)) for i in range(20000)]
+    planner = RecoveryPlanner(coins, 100000, timelocks=list(range(1000, 60000, 3000)))
+    for plan in planner.plans(5):
+        expected = [c for c in coins if c["block_height"] + plan["timelock"] <= 100001]
+        assert plan["coins"] == len(expected)
+        assert plan["amount"] == sum(c["amount"] for c in expected)
+
+
+def test_create_recovery_psbt_check(lianad):
+    coins = [coin(0, 100000, 90), coin(1, 200000, 95)]
+    state = {"block_height": 100}
+    lianad.handlers["getinfo"] = lambda params: {"block_height": state["block_height"],
+                                                 "descriptors": {"main": {"multi_desc": DESCRIPTOR}}}
+    lianad.handlers["listcoins"] = lambda params: {"coins": coins}
+    lianad.handlers["createrecovery"] = lambda params: {"psbt": "cHNidP8="}
+    liana = LianaRPC(lianad.socket_path)
+
+    ret = liana.create_recovery_psbt(ADDRESS, 10, timelock=20, check=True)
+    assert "more coins will be recoverable from block 109" in ret["error"]
+    assert not [r for r in lianad.requests if r["method"] == "createrecovery"]
+    assert [r["params"] for r in lianad.requests if r["method"] == "listcoins"] == [{"statuses": ["confirmed"]}]
+
+    assert liana.create_recovery_psbt(ADDRESS, 10, check=True) == "cHNidP8="
+    state["block_height"] = 114
+    assert liana.create_recovery_psbt(ADDRESS, 10, timelock=20, check=True) == "cHNidP8="
+    assert liana.recovery_planner().plan(10)["coins"] == 2
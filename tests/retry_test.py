@@ -0,0 +1,138 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.pool import UnixDomainSocketRpcPool
+from liana_rpc.utils.retry import CircuitBreaker, CircuitOpenError, backoff_delay
+from liana_rpc.utils.rpc import UnixDomainSocketRpc
+
+
+def slow(result, delay):
+    def handler(params):
+        time.sleep(delay)
+        return result
+    return handler
+
+
+def test_method_timeout(lianad):
+    lianad.handlers["getinfo"] = slow({"block_height": 1}, 0.5)
+    lianad.handlers["startrescan"] = slow({}, 0.3)
+    rpc = UnixDomainSocketRpc(lianad.socket_path, timeouts={"getinfo": 0.1})
+    start = time.monotonic()
+    with pytest.raises(socket.timeout):
+        rpc.call("getinfo")
+    assert time.monotonic() - start < 0.4
+    # The late reply to getinfo is dropped, the connection still works.
+    assert rpc.call("startrescan", {"timestamp": 0}) == {}
+
+
+def test_call_timeout(lianad):
+    lianad.handlers["getinfo"] = slow({"block_height": 1}, 0.3)
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    with pytest.raises(socket.timeout):
+        rpc.call("getinfo", timeout=0.05)
+    with pytest.raises(socket.timeout):
+        rpc.call_many([("getinfo", {})] * 2, timeout=0.05)
+    # Behind the replies to the calls that timed out.
+    assert rpc.call("getinfo", timeout=2) == {"block_height": 1}
+
+
+def test_concurrent_timeouts(lianad):
+    lianad.handlers["getinfo"] = slow({"block_height": 1}, 0.5)
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    errors = []
+
+    def call():
+        try:
+            rpc.call("getinfo", timeout=0.1)
+        except socket.timeout as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+    assert len(errors) == 4
+
+
+def test_reconnect_after_restart(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    liana = LianaRPC(lianad.socket_path)
+    assert liana.get_info() == {"block_height": 1}
+    lianad.drop_connections()
+    assert liana.get_info() == {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path, max_retries=10)
+    lianad.stop()
+    threading.Timer(0.1, lianad.start).start()
+    # Retried until lianad is back.
+    assert rpc.call("getinfo", timeout=10) == {"block_height": 1}
+
+
+def test_no_retry_of_non_idempotent_method(lianad):
+    lianad.handlers["broadcastspend"] = lambda params: {}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    assert rpc.call("broadcastspend", {"txid": "00" * 32}) == {}
+    lianad.drop_connections()
+    with pytest.raises(ConnectionError):
+        rpc.call("broadcastspend", {"txid": "00" * 32})
+    assert len([r for r in lianad.requests if r["method"] == "broadcastspend"]) == 1
+    # But the next call reconnects.
+    assert rpc.call("broadcastspend", {"txid": "00" * 32}) == {}
+
+
+def test_closed_client_does_not_reconnect(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    rpc.close()
+    with pytest.raises(ConnectionError):
+        rpc.call("getinfo")
+
+
+def test_backoff_delay():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=0.1, cap=1) <= min(1, 0.1 * 2 ** attempt)
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    time.sleep(0.1)
+    assert breaker.state == "half_open"
+    breaker.check()
+    # A failed trial opens it again.
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.1)
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_pool_circuit_breaker(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    pool = UnixDomainSocketRpcPool(lianad.socket_path, size=2, breaker=breaker, max_retries=0)
+    assert pool.call("getinfo") == {"block_height": 1}
+    lianad.stop()
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.call("getinfo")
+    assert breaker.state == "open"
+    # Refused without trying to connect.
+    with pytest.raises(CircuitOpenError):
+        pool.call("getinfo")
+    lianad.start()
+    time.sleep(0.2)
+    assert pool.call("getinfo") == {"block_height": 1}
+    assert breaker.state == "closed"
+    pool.close()
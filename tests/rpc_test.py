@@ -0,0 +1,128 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from liana_rpc.utils.rpc import LineBuffer, UnixDomainSocketRpc
+from tests.mock_lianad import MockLianad
+
+
+def test_line_buffer_keeps_leftover():
+    buff = LineBuffer(size=16, min_free=4)
+    buff.feed(b'{"a": 1}\n{"b"')
+    assert json.loads(buff.pop_frame().tobytes()) == {"a": 1}
+    assert buff.pop_frame() is None
+    buff.feed(b': 2}\n\n{"c": 3}\n')
+    assert json.loads(buff.pop_frame().tobytes()) == {"b": 2}
+    assert json.loads(buff.pop_frame().tobytes()) == {"c": 3}
+    assert buff.pop_frame() is None
+    assert len(buff) == 0
+
+
+def test_readobj_large_reply(lianad):
+    coins = [{"amount": i, "block_height": i, "outpoint": f"{i:064x}:0", "spend_info": None}
+             for i in range(50000)]
+    lianad.handlers["listcoins"] = lambda params: {"coins": coins}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    assert rpc.call("listcoins")["coins"] == coins
+    assert rpc.call("listcoins")["coins"] == coins
+
+
+def test_readobj_split_replies():
+    a, b = socket.socketpair()
+    rpc = UnixDomainSocketRpc.__new__(UnixDomainSocketRpc)
+    rpc.sock = a
+    rpc._cond = threading.Condition()
+    rpc._reading = False
+    rpc.recv_buffer = LineBuffer(size=8, min_free=2)
+    b.sendall(b'{"id": 0, "result": {"x": "' + b"y" * 1000 + b'"}}\n{"id": 0, ')
+    assert rpc._readobj()["result"]["x"] == "y" * 1000
+    b.sendall(b'"result": {}}\n')
+    assert rpc._readobj() == {"id": 0, "result": {}}
+    rpc.close()
+    b.close()
+
+
+def test_concurrent_calls_one_socket(tmp_path):
+    def echo(params):
+        time.sleep(params["delay"])
+        return {"n": params["n"]}
+
+    with MockLianad(str(tmp_path / "lianad_rpc"), {"echo": echo}, concurrent=True) as lianad:
+        rpc = UnixDomainSocketRpc(lianad.socket_path)
+        results = {}
+
+        def worker(n):
+            # Later calls get their replies first.
+            results[n] = rpc.call("echo", {"n": n, "delay": (20 - n) * 0.01})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == {n: {"n": n} for n in range(20)}
+        assert len(lianad.connections) == 1
+        assert sorted(r["id"] for r in lianad.requests) == list(range(20))
+
+
+def test_orphan_reply_dropped(lianad, caplog):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    rpc.sock.sendall(b'{"jsonrpc": "2.0", "id": 1000, "method": "getinfo", "params": {}}\n')
+    assert rpc.call("getinfo") == {"block_height": 1}
+    assert "no pending request" in caplog.text
+
+
+def test_broken_connection(lianad):
+    lianad.handlers["getinfo"] = lambda params: {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path, max_retries=0)
+    rpc.call("getinfo")
+    lianad.drop_connections()
+    with pytest.raises(ConnectionError):
+        rpc.call("getinfo")
+    # The next call reconnects.
+    assert rpc.call("getinfo") == {"block_height": 1}
+
+
+def test_close_during_call(lianad):
+    lianad.handlers["getinfo"] = lambda params: time.sleep(1) or {"block_height": 1}
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    errors = []
+
+    def call():
+        try:
+            rpc.call("getinfo")
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    time.sleep(0.1)
+    rpc.close()
+    thread.join(0.5)
+    assert not thread.is_alive()
+    assert [type(e) for e in errors] == [ConnectionError]
+    assert rpc.sock is None
+    with pytest.raises(ConnectionError):
+        rpc.call("getinfo")
+
+
+def test_call_many(lianad):
+    lianad.handlers["echo"] = lambda params: params
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    calls = [("echo", {"n": n}) for n in range(10)] + [("unknown", {})]
+    rets = rpc.call_many(calls)
+    assert rets[:10] == [{"n": n} for n in range(10)]
+    assert rets[10]["error"]["code"] == -32601
+    assert rpc.call_many([]) == []
+
+
+def test_call_many_large_batch(lianad):
+    # Both the requests and the replies overflow the socket buffers.
+    lianad.handlers["echo"] = lambda params: params
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    calls = [("echo", {"n": n, "pad": "x" * 500}) for n in range(5000)]
+    assert [ret["n"] for ret in rpc.call_many(calls)] == list(range(5000))
@@ -0,0 +1,71 @@
+import base64
+
+import liana_rpc.spend_tx_store
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.spend_tx_store import SpendTxStore
+from liana_rpc.utils.psbt import decode_psbt, psbt_txid
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+
+def signed_psbts(wallet: SyntheticWallet, n: int) -> list:
+    return [wallet.createspend({"outpoints": [coin["outpoint"]], "destinations": {"tb1qaddr": 1000}})["psbt"]
+            for coin in wallet.coins[:n]]
+
+
+def with_proprietary_field(psbt: str) -> str:
+    """The same PSBT, with an unknown field added to its last output."""
+    raw = base64.b64decode(psbt)
+    return base64.b64encode(raw[:-1] + b"\x02\xfc\x00\x01\x01\x00").decode()
+
+
+def test_spend_tx_store(tmp_path, monkeypatch):
+    wallet = SyntheticWallet(coins=20)
+    psbts = signed_psbts(wallet, 10)
+    txids = [psbt_txid(psbt) for psbt in psbts]
+    decoded = []
+    monkeypatch.setattr(liana_rpc.spend_tx_store, "psbt_txid", lambda raw: decoded.append(raw) or psbt_txid(raw))
+
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        liana.update_psbts(psbts)
+        store = SpendTxStore(liana)
+        assert store.refresh() == {"added": txids, "updated": [], "removed": [], "invalid": 0}
+        assert len(store) == 10 and txids[3] in store
+        assert store.get(txids[3]).psbt == psbts[3]
+        assert len(store.get(txids[3]).raw) == len(base64.b64decode(psbts[3]))
+        assert store.get(txids[3]).decode("signet") == decode_psbt(psbts[3], "signet")
+        assert store.get_many([txids[1], "00" * 32]) == [store.get(txids[1]), None]
+        assert len(decoded) == 10
+
+        # Unchanged PSBTs are not decoded again.
+        assert store.refresh() == {"added": [], "updated": [], "removed": [], "invalid": 0}
+        assert len(decoded) == 10
+
+        updated = with_proprietary_field(psbts[4])
+        assert psbt_txid(updated) == txids[4]
+        liana.upate_psbt(updated)
+        assert store.refresh() == {"added": [], "updated": [txids[4]], "removed": [], "invalid": 0}
+        assert len(decoded) == 11
+        assert store.get(txids[4]).decode()["outputs"][-1]["unknown"] == {"fc00": "01"}
+
+        assert store.delete([txids[0], txids[1]]) == [{"ok": True}, {"ok": True}]
+        assert txids[0] not in store and len(store) == 8
+        wallet.spend_txs.pop(txids[2])
+        assert store.refresh() == {"added": [], "updated": [], "removed": [txids[2]], "invalid": 0}
+        assert sorted(store.txids) == sorted(txids[3:])
+
+        # A PSBT that can't be decoded is reported, not silently dropped.
+        wallet.spend_txs["garbage"] = {"psbt": "cHNidP8BAAo=", "updated_at": 1}
+        assert store.refresh() == {"added": [], "updated": [], "removed": [], "invalid": 1}
+        assert store.invalid == [{"psbt": "cHNidP8BAAo=", "updated_at": 1, "error": store.invalid[0]["error"]}]
+        assert store.invalid[0]["error"].startswith("Cannot decode psbt")
+        assert len(store) == 7
+        decoded.clear()
+        assert store.refresh()["invalid"] == 1
+        assert not decoded
+        wallet.spend_txs.pop("garbage")
+        assert store.refresh()["invalid"] == 0 and store.invalid == []
+
+        lianad.handlers.pop("listspendtxs")
+        assert "error" in store.refresh()
+        assert len(store) == 7
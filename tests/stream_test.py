@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.utils.rpc import RpcError, UnixDomainSocketRpc
+from liana_rpc.utils.stream import iter_result_array
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+COINS = [
+    {"amount": 12345678901, "block_height": 1, "outpoint": "aa" * 32 + ":0", "spend_info": None},
+    {"amount": -1.5e-3, "block_height": None, "outpoint": "bb" * 32 + ":1",
+     "spend_info": {"txid": "cc" * 32, "height": 2}, "label": "é ☃ \"\\n"},
+    {"amount": 7, "block_height": 3, "outpoint": "dd" * 32 + ":2", "spend_info": None},
+]
+
+
+def chunks(data: bytes, size: int):
+    parts = [data[i:i + size] for i in range(0, len(data), size)]
+    return lambda: parts.pop(0) if parts else b""
+
+
+def stream(data: bytes, size: int = 1, key: str = "coins", filter=None):
+    gen = iter_result_array(chunks(data, size), key, filter)
+    elements = []
+    while True:
+        try:
+            elements.append(next(gen))
+        except StopIteration as e:
+            return elements, e.value
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_iter_result_array(size):
+    reply = json.dumps({"jsonrpc": "2.0", "result": {"before": [1, {"a": 2}], "coins": COINS, "after": 3},
+                        "id": 0}, ensure_ascii=False).encode() + b"\n" + b"garbage"
+    assert stream(reply, size) == (COINS, None)
+    assert stream(json.dumps({"result": {"coins": []}}).encode() + b"\n", size) == ([], None)
+    spaced = json.dumps({"result": {"coins": COINS}}, indent=1).replace("\n", " ").encode() + b"\n"
+    assert stream(spaced, size) == (COINS, None)
+
+
+def test_iter_result_array_filter():
+    reply = json.dumps({"result": {"coins": COINS}}).encode() + b"\n"
+    assert stream(reply, filter=lambda coin: not coin["spend_info"]) == ([COINS[0], COINS[2]], None)
+
+
+def test_iter_result_array_error():
+    reply = b'{"jsonrpc": "2.0", "error": {"code": -32601, "message": "Method not found"}, "id": 0}\n'
+    assert stream(reply) == ([], {"code": -32601, "message": "Method not found"})
+
+
+@pytest.mark.parametrize("reply", [
+    b'{"result": {"other": []}}\n',
+    b'{"result": {"coins": [1, 2}}\n',
+    b'{"result": {"coins": [1, 2]\n',
+    b'{"result": {"coins" [1, 2]}}\n',
+    b'["result"]\n',
+])
+def test_iter_result_array_malformed(reply):
+    with pytest.raises(ValueError):
+        stream(reply)
+
+
+def test_iter_result_array_truncated():
+    with pytest.raises(ConnectionError):
+        stream(b'{"result": {"coins": [1, 2')
+
+
+def test_iter_coins(tmp_path):
+    wallet = SyntheticWallet(coins=1000, spent=0.3)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        assert list(liana.iter_coins()) == wallet.coins
+        assert list(liana.iter_coins(spent=False)) == liana.list_unspent_coins()
+        assert list(liana.iter_coins(spent=True)) == liana.list_spent_coins()
+        assert list(liana.iter_coins(min_amount=50000)) == [c for c in wallet.coins if c["amount"] >= 50000]
+        assert list(liana.iter_coins(filter=lambda c: c["block_height"] is None, spent=False)) == \
+            [c for c in wallet.coins if c["block_height"] is None and not c["spend_info"]]
+
+        # Abandoning the iteration closes its connection.
+        coins = liana.iter_coins()
+        next(coins)
+        coins.close()
+
+        pooled = LianaRPC(lianad.socket_path, pool_size=2)
+        assert list(pooled.iter_coins(spent=False)) == liana.list_unspent_coins()
+        assert pooled.get_info()["block_height"] == wallet.block_height
+
+
+def test_iter_coins_memory(tmp_path):
+    # Served from another process, so that only the memory of the client is measured.
+    socket_path = str(tmp_path / "lianad_rpc")
+    server = subprocess.Popen([sys.executable, "-m", "tests.mock_lianad", socket_path, "--coins", "20000"],
+                              stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(__file__)))
+    try:
+        server.stdout.readline()
+        liana = LianaRPC(socket_path)
+
+        tracemalloc.start()
+        count = sum(1 for _ in liana.iter_coins())
+        _, streamed = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == 20000
+
+        tracemalloc.start()
+        coins = liana.list_coins()
+        _, loaded = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(coins) == 20000
+        assert streamed * 10 < loaded
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_stream_error(lianad):
+    rpc = UnixDomainSocketRpc(lianad.socket_path)
+    with pytest.raises(RpcError):
+        list(rpc.stream("listcoins", "coins"))
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.tx_cache import TxCache
+from liana_rpc.utils.psbt import transaction_txid
+
+# Minimal transactions differing by their locktime.
+RAWTXS = [f"010000000000{i:08x}" for i in range(10)]
+TXIDS = [transaction_txid(raw) for raw in RAWTXS]
+
+
+def test_tx_cache_lru():
+    fetched = []
+
+    def fetch(txids):
+        fetched.append(list(txids))
+        return [{"tx": RAWTXS[TXIDS.index(txid)], "height": 1, "time": 1} for txid in txids]
+
+    cache = TxCache(fetch, maxsize=3, chunk_size=2)
+    assert list(cache.get_many(TXIDS[:3] + [TXIDS[0]])) == TXIDS[:3]
+    assert fetched == [TXIDS[:2], TXIDS[2:3]]
+    cache.get_many([TXIDS[0]])
+    cache.get_many([TXIDS[3]])
+    # TXIDS[1] was the least recently used.
+    assert list(cache.entries) == [TXIDS[2], TXIDS[0], TXIDS[3]]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_tx_cache_unconfirmed_dropped_on_new_block():
+    height = {"value": 1}
+    cache = TxCache(lambda txids: [{"tx": RAWTXS[0], "height": None, "time": None}],
+                    get_block_height=lambda: height["value"])
+    cache.get_many([TXIDS[0]])
+    cache.get_many([TXIDS[0]])
+    assert cache.stats()["misses"] == 1
+    height["value"] = 2
+    cache.get_many([TXIDS[0]])
+    assert cache.stats()["misses"] == 2
+
+
+def test_tx_cache_concurrent_misses_deduplicated():
+    calls = []
+
+    def fetch(txids):
+        calls.append(txids)
+        time.sleep(0.05)
+        return [{"tx": RAWTXS[0], "height": 1, "time": 1}]
+
+    cache = TxCache(fetch)
+    threads = [threading.Thread(target=cache.get_many, args=([TXIDS[0]],)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+
+def test_liana_tx_cache(lianad):
+    txs = {txid: {"tx": raw, "height": 1, "time": 1} for txid, raw in zip(TXIDS, RAWTXS)}
+    lianad.handlers["listtransactions"] = lambda params: {
+        "transactions": [txs[txid] for txid in params["txids"] if txid in txs]
+    }
+    liana = LianaRPC(lianad.socket_path, tx_cache_size=100)
+    assert liana.fetch_tx(TXIDS[0]) == txs[TXIDS[0]]
+    assert liana.fetch_tx(TXIDS[0]) == txs[TXIDS[0]]
+    assert liana.fetch_txs([TXIDS[1], "00" * 32]) == [txs[TXIDS[1]], {"error": f"Transaction not found: {'00' * 32}"}]
+    assert len([r for r in lianad.requests if r["method"] == "listtransactions"]) == 2
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+from liana_rpc.liana_rpc import LianaRPC
+from liana_rpc.watcher import CoinConfirmed, CoinReceived, CoinSpent, SpendBroadcast, WalletWatcher
+from tests.mock_lianad import MockLianad, SyntheticWallet
+
+
+def listcoins_params(lianad) -> list:
+    return [r.get("params") for r in lianad.requests if r["method"] == "listcoins"]
+
+
+def test_watcher_events(tmp_path):
+    wallet = SyntheticWallet(coins=200, spent=0.3)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        received = []
+        watcher = WalletWatcher(LianaRPC(lianad.socket_path), mempool_interval=None, callbacks=[received.append])
+        assert watcher.poll() == []
+        assert len(watcher.snapshot) == len(wallet.coins)
+        # No new block: only getinfo.
+        assert watcher.poll() == []
+        assert len(listcoins_params(lianad)) == 1
+
+        coin = wallet.receive(5000)
+        assert watcher.poll() == []
+        assert watcher.poll(force=True) == [CoinReceived(coin)]
+
+        wallet.block_height += 1
+        wallet.update_coin(coin["outpoint"], block_height=wallet.block_height)
+        new = wallet.receive(7000, height=wallet.block_height)
+        assert watcher.poll() == [CoinConfirmed(coin), CoinReceived(new), CoinConfirmed(new)]
+
+        spend_info = {"txid": "ab" * 32, "height": None}
+        wallet.update_coin(coin["outpoint"], spend_info=spend_info)
+        wallet.update_coin(new["outpoint"], spend_info=spend_info)
+        wallet.block_height += 1
+        events = watcher.poll()
+        assert events == [SpendBroadcast("ab" * 32, [coin, new])]
+        assert events[0].coins[1]["amount"] == 7000
+
+        # Spent coins are not listed anymore, the ones that got spent since the last poll are fetched by outpoint.
+        wallet.block_height += 1
+        for c in (coin, new):
+            wallet.update_coin(c["outpoint"], spend_info={"txid": "ab" * 32, "height": wallet.block_height})
+        assert watcher.poll() == [CoinSpent(coin), CoinSpent(new)]
+        assert listcoins_params(lianad)[-1] == {"outpoints": [coin["outpoint"], new["outpoint"]]}
+        assert coin["outpoint"] not in watcher.snapshot
+        assert all(p.get("statuses") != ["spent"] for p in listcoins_params(lianad))
+
+        assert [e.kind for e in received] == ["coin_received", "coin_confirmed", "coin_received", "coin_confirmed",
+                                              "spend_broadcast", "coin_spent", "coin_spent"]
+
+
+def test_watcher_mempool(tmp_path):
+    wallet = SyntheticWallet(coins=100, spent=0.2)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        watcher = WalletWatcher(LianaRPC(lianad.socket_path), mempool_interval=0)
+        watcher.poll()
+        confirmed = next(c for c in wallet.coins if c["block_height"] is not None and not c["spend_info"])
+        wallet.update_coin(confirmed["outpoint"], spend_info={"txid": "cd" * 32, "height": None})
+        coin = wallet.receive(1000)
+        assert watcher.poll() == [CoinReceived(coin), SpendBroadcast("cd" * 32, [confirmed])]
+        assert listcoins_params(lianad)[-1] == {"statuses": ["unconfirmed", "spending"]}
+
+        # A transaction dropped from the mempool.
+        wallet.coins.remove(coin)
+        del wallet.by_outpoint[coin["outpoint"]]
+        assert watcher.poll() == []
+        assert coin["outpoint"] not in watcher.snapshot
+
+        lianad.handlers.pop("getinfo")
+        assert "error" in watcher.poll()
+
+
+def test_watcher_async(tmp_path):
+    wallet = SyntheticWallet(coins=10)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()):
+        watcher = WalletWatcher(LianaRPC(str(tmp_path / "lianad_rpc")), poll_interval=0.01, mempool_interval=0)
+
+        async def first_event():
+            events = watcher.events()
+            watcher.poll()
+            coin = wallet.receive(1000)
+            event = await events.__anext__()
+            await events.aclose()
+            return coin, event
+
+        coin, event = asyncio.run(first_event())
+        assert event == CoinReceived(coin)
+
+
+def test_watcher_survives_failures(tmp_path):
+    wallet = SyntheticWallet(coins=10)
+    with MockLianad(str(tmp_path / "lianad_rpc"), wallet.handlers()) as lianad:
+        liana = LianaRPC(lianad.socket_path)
+        received = []
+        watcher = WalletWatcher(liana, poll_interval=0.01, mempool_interval=0, callbacks=[received.append])
+        watcher.poll()
+        get_info, failures = liana.get_info, [ConnectionRefusedError("Connection refused"), ValueError("Bad reply")]
+
+        def flaky_get_info():
+            if failures:
+                raise failures.pop(0)
+            return get_info()
+
+        liana.get_info = flaky_get_info
+        coin = wallet.receive(1000)
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        thread.join()
+        assert not failures
+        assert received == [CoinReceived(coin)]
+
+        failures.append(ConnectionRefusedError("Connection refused"))
+        other = wallet.receive(2000)
+
+        async def first_event():
+            events = watcher.events()
+            event = await events.__anext__()
+            await events.aclose()
+            return event
+
+        assert asyncio.run(first_event()) == CoinReceived(other)
+        assert not failures